@@ -0,0 +1,129 @@
+"""
+Herramientas para changelists del admin sobre tablas de millones de filas.
+
+- EstimatedCountPaginator: el admin hace un COUNT(*) exacto por página.
+  Sin filtros se usa la estimación del motor (pg_class.reltuples,
+  information_schema en MySQL, sqlite_stat1 tras ANALYZE); con filtros,
+  o sin estimación disponible, se cuenta hasta ADMIN_COUNT_CAP filas
+  (SELECT COUNT(*) FROM (... LIMIT cap)), así el costo no crece con la tabla.
+- IndexedDateHierarchyMixin: la navegación de date_hierarchy usa
+  DISTINCT sobre la fecha truncada (recorre todo el año o mes elegido);
+  aquí cada año/mes/día se obtiene con un salto por el índice de la
+  columna (ORDER BY fecha LIMIT 1 desde el inicio del período siguiente).
+"""
+from __future__ import annotations
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+
+def estimated_row_count(model, using: str = "default"):
+    """Filas estimadas de la tabla según las estadísticas del motor, o None."""
+    connection = connections[using]
+    table = model._meta.db_table
+    vendor = connection.vendor
+    with connection.cursor() as cursor:
+        if vendor == "postgresql":
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)", [table])
+        elif vendor == "mysql":
+            cursor.execute(
+                "SELECT table_rows FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s",
+                [table],
+            )
+        elif vendor == "sqlite":
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if cursor.fetchone() is None:
+                return None  # nunca se corrió ANALYZE
+            # stat: "<filas> <filas por valor> ..." por índice; el primero es el total
+            cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s", [table])
+            counts = [int(row[0].split()[0]) for row in cursor.fetchall() if row[0]]
+            return max(counts) if counts else None
+        else:
+            return None
+        row = cursor.fetchone()
+    if row is None or row[0] is None or row[0] < 0:  # reltuples = -1: sin VACUUM/ANALYZE aún
+        return None
+    return int(row[0])
+
+
+def _is_unfiltered(queryset) -> bool:
+    """True si el queryset no filtra más que el manager por defecto (p. ej. soft delete)."""
+    base = queryset.model._default_manager.all().query
+    return queryset.query.where == base.where and not queryset.query.distinct
+
+
+class EstimatedCountPaginator(Paginator):
+    @cached_property
+    def count(self):
+        cap = getattr(settings, "ADMIN_COUNT_CAP", 10_000)
+        queryset = self.object_list
+        if _is_unfiltered(queryset):
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate >= cap:
+                return estimate
+        return queryset.order_by()[:cap].count()
+
+
+def _period_start(value, kind: str):
+    if kind == "year":
+        return value.replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
+    if kind == "month":
+        return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _next_period(start, kind: str):
+    if kind == "year":
+        return start.replace(year=start.year + 1)
+    if kind == "month":
+        return start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+    return start + timedelta(days=1)
+
+
+class _IndexedDatesQuerySetMixin:
+    MAX_PERIODS = 400
+
+    def datetimes(self, field_name, kind, order="ASC", tzinfo=None):
+        if kind not in ("year", "month", "day"):
+            return super().datetimes(field_name, kind, order, tzinfo)
+        ordered = self.order_by(field_name).values_list(field_name, flat=True)
+        periods, since = [], None
+        for _ in range(self.MAX_PERIODS):
+            value = (ordered.filter(**{f"{field_name}__gte": since}) if since else ordered).first()
+            if value is None:
+                break
+            if timezone.is_aware(value):
+                value = timezone.localtime(value)
+            start = _period_start(value, kind)
+            periods.append(start)
+            since = _next_period(start, kind)
+        else:
+            return super().datetimes(field_name, kind, order, tzinfo)
+        return periods if order == "ASC" else periods[::-1]
+
+
+_indexed_classes = {}
+
+
+def with_indexed_dates(queryset):
+    """Copia del queryset cuyo datetimes() salta por el índice (ver IndexedDateHierarchyMixin)."""
+    cls = queryset.__class__
+    if not issubclass(cls, _IndexedDatesQuerySetMixin):
+        if cls not in _indexed_classes:
+            _indexed_classes[cls] = type(f"IndexedDates{cls.__name__}", (_IndexedDatesQuerySetMixin, cls), {})
+        queryset = queryset._chain()
+        queryset.__class__ = _indexed_classes[cls]
+    return queryset
+
+
+class IndexedDateHierarchyMixin:
+    """ModelAdmin con date_hierarchy sobre una columna indexada y conteo estimado."""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False  # evita el segundo COUNT(*) de la tabla entera
+
+    def get_queryset(self, request):
+        return with_indexed_dates(super().get_queryset(request))
@@ -0,0 +1,11 @@
+# core/auth.py
+"""Autenticación por token para clientes máquina (Prometheus, ingesta)."""
+import hmac
+
+
+def bearer_token_matches(request, token) -> bool:
+    """True si la request trae "Authorization: Bearer <token>" (comparación en tiempo constante)."""
+    header = request.META.get("HTTP_AUTHORIZATION", "")
+    if not token or not header.startswith("Bearer "):
+        return False
+    return hmac.compare_digest(header[7:].encode(), str(token).encode())
@@ -0,0 +1,257 @@
+"""
+Métricas en formato de exposición de Prometheus (texto 0.0.4).
+
+Contadores e histogramas en memoria del proceso, cada uno con su propio
+lock de sección corta (un dict update), sin dependencias externas.
+
+Con varios procesos (gunicorn/uwsgi) cada worker tendría sus propios
+números. Con METRICS_MULTIPROC_DIR cada proceso vuelca su estado en
+<dir>/<pid>.json cada METRICS_FLUSH_INTERVAL segundos (y al salir), con
+escritura atómica (archivo temporal + os.replace), y /metrics suma los
+archivos de todos los procesos: nadie escribe el archivo de otro, así que
+no hay locks entre procesos. Los archivos de procesos muertos se siguen
+sumando (los contadores no retroceden); al reusar un pid el contador se
+reinicia, lo que Prometheus interpreta como reset.
+
+Los collectors (REGISTRY.add_collector) calculan series al momento del
+scrape, p. ej. la profundidad de la cola de alertas desde la base.
+"""
+from __future__ import annotations
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Tuple
+
+from django.conf import settings
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, "_Metric"] = {}
+        self._collectors = []
+        self._flush_lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def register(self, metric: "_Metric") -> None:
+        if metric.name in self._metrics:
+            raise ValueError(f"Métrica duplicada: {metric.name}")
+        self._metrics[metric.name] = metric
+
+    def add_collector(self, collector: Callable[[dict], Iterable[tuple]]) -> None:
+        """
+        collector(snapshot) -> [(nombre, tipo, ayuda, [(labels dict, valor)])].
+        snapshot es el estado ya sumado entre procesos ({nombre: {labels: valor}}).
+        """
+        self._collectors.append(collector)
+
+    def snapshot(self) -> dict:
+        """Estado de este proceso: {nombre: {labels tuple: valor}}."""
+        return {name: m.snapshot() for name, m in self._metrics.items()}
+
+    def reset(self) -> None:
+        for m in self._metrics.values():
+            m.reset()
+
+    # ---- modo multiproceso ----
+    def _path(self, directory, pid=None) -> str:
+        return os.path.join(directory, f"{pid or os.getpid()}.json")
+
+    def maybe_flush(self) -> None:
+        """Vuelca a disco si pasó el intervalo; nunca espera a otro hilo."""
+        if time.monotonic() - self._last_flush < getattr(settings, "METRICS_FLUSH_INTERVAL", 5):
+            return
+        if self._flush_lock.acquire(blocking=False):
+            try:
+                self.flush()
+            finally:
+                self._flush_lock.release()
+
+    def flush(self) -> None:
+        self._last_flush = time.monotonic()
+        directory = getattr(settings, "METRICS_MULTIPROC_DIR", None)
+        if not directory:
+            return
+        os.makedirs(directory, exist_ok=True)
+        payload = {
+            name: [[list(labels), value] for labels, value in values.items()]
+            for name, values in self.snapshot().items()
+        }
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            json.dump(payload, fh)
+        os.replace(tmp, self._path(directory))
+
+    def collect(self) -> dict:
+        """Estado sumado: este proceso en vivo más los archivos de los demás."""
+        merged = self.snapshot()
+        directory = getattr(settings, "METRICS_MULTIPROC_DIR", None)
+        if not directory:
+            return merged
+        own = self._path(directory)
+        for entry in os.scandir(directory):
+            if not entry.name.endswith(".json") or entry.path == own:
+                continue
+            try:
+                with open(entry.path, encoding="utf-8") as fh:
+                    data = json.load(fh)
+            except (OSError, ValueError):
+                continue  # archivo a medio reemplazar o ilegible: se toma en el próximo scrape
+            for name, rows in data.items():
+                metric = self._metrics.get(name)
+                if metric is None:
+                    continue
+                values = merged.setdefault(name, {})
+                for labels, value in rows:
+                    labels = tuple(labels)
+                    values[labels] = metric.merge(values.get(labels), value)
+        return merged
+
+    # ---- exposición ----
+    def render(self) -> str:
+        merged = self.collect()
+        lines = []
+        for name, metric in self._metrics.items():
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.type}")
+            for labels, value in sorted(merged.get(name, {}).items()):
+                lines.extend(metric.expose(dict(zip(metric.labelnames, labels)), value))
+        for collector in self._collectors:
+            for name, kind, documentation, samples in collector(merged):
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                lines.extend(_sample(name, labels, value) for labels, value in samples)
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def _flush_at_exit():
+    try:
+        REGISTRY.flush()
+    except Exception:
+        pass
+
+
+atexit.register(_flush_at_exit)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _sample(name: str, labels: dict, value) -> str:
+    if labels:
+        inner = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+        return f"{name}{{{inner}}} {_number(value)}"
+    return f"{name} {_number(value)}"
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), registry: Registry = REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._registry = registry
+        registry.register(self)
+
+    def _key(self, labels: dict) -> Tuple[str, ...]:
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {k: self._copy(v) for k, v in self._values.items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    def _copy(self, value):
+        return value
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+        self._registry.maybe_flush()
+
+    def inc_many(self, amounts: Dict[tuple, float]) -> None:
+        """Suma varios conjuntos de labels (tuplas en el orden de labelnames) con un solo lock."""
+        with self._lock:
+            for labels, amount in amounts.items():
+                key = tuple(str(v) for v in labels)
+                self._values[key] = self._values.get(key, 0) + amount
+        self._registry.maybe_flush()
+
+    def merge(self, current, other):
+        return (current or 0) + other
+
+    def expose(self, labels: dict, value):
+        return [_sample(self.name, labels, value)]
+
+
+class Histogram(_Metric):
+    """Buckets no acumulados + [suma, cantidad]; se acumulan al exponer."""
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=REGISTRY):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        i = bisect_left(self.buckets, value)  # primer bucket con value <= le
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+        self._registry.maybe_flush()
+
+    @contextmanager
+    def time(self, **labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def _copy(self, value):
+        return list(value)
+
+    def merge(self, current, other):
+        if current is None:
+            return list(other)
+        return [a + b for a, b in zip(current, other)]
+
+    def expose(self, labels: dict, value):
+        lines, cumulative = [], 0
+        for bound, n in zip(self.buckets + (float("inf"),), value[:-2]):
+            cumulative += n
+            lines.append(_sample(f"{self.name}_bucket", dict(labels, le=_number(bound)), cumulative))
+        lines.append(_sample(f"{self.name}_sum", labels, value[-2]))
+        lines.append(_sample(f"{self.name}_count", labels, value[-1]))
+        return lines
@@ -0,0 +1,138 @@
+# core/middleware.py
+"""
+Estadísticas de SQL por request (QUERY_STATS_ENABLED).
+
+Cuenta las consultas, suma su tiempo y guarda las más lentas usando
+connection.execute_wrapper, así que funciona también con DEBUG=False.
+Los resultados van en la cabecera X-Query-Stats (y Server-Timing, que el
+navegador muestra en la pestaña de red) y al logger "core.query_stats":
+INFO por request, WARNING si pasa QUERY_STATS_WARN_COUNT consultas o
+QUERY_STATS_WARN_MS milisegundos de SQL.
+
+Con METRICS_ENABLED también alimenta el histograma de tiempo SQL por vista
+de /metrics (aunque QUERY_STATS_ENABLED esté apagado).
+
+Respuestas en streaming (exportes, series): las consultas del cuerpo corren
+mientras el servidor lo itera, después de que la vista retornó. El contador
+se reengancha en cada trozo y el log y las métricas se emiten al terminar
+(o cortarse) la iteración; las cabeceras no se agregan porque se envían
+antes del cuerpo y quedarían incompletas. Los cuerpos async (live_feed)
+consultan desde otros hilos: solo se cuenta la parte de la vista.
+"""
+from __future__ import annotations
+import heapq
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from .metrics import Counter, Histogram
+
+logger = logging.getLogger("core.query_stats")
+
+VIEW_DB_SECONDS = Histogram("ecoenergy_view_db_seconds", "Tiempo SQL por request, por vista.", ["view"])
+VIEW_DB_QUERIES = Counter("ecoenergy_view_db_queries_total", "Consultas SQL ejecutadas, por vista.", ["view"])
+
+
+class QueryStats:
+    def __init__(self, keep_slowest: int = 3):
+        self.count = 0
+        self.total = 0.0
+        self.keep_slowest = keep_slowest
+        self._slowest = []  # heap de (duración, n, sql)
+
+    def __call__(self, execute, sql, params, many, context):
+        t0 = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - t0
+            self.count += 1
+            self.total += elapsed
+            item = (elapsed, self.count, sql)
+            if len(self._slowest) < self.keep_slowest:
+                heapq.heappush(self._slowest, item)
+            else:
+                heapq.heappushpop(self._slowest, item)
+
+    @property
+    def slowest(self):
+        """[(ms, sql)] de mayor a menor."""
+        return [(round(d * 1000, 2), sql) for d, _, sql in sorted(self._slowest, reverse=True)]
+
+    @property
+    def total_ms(self) -> float:
+        return round(self.total * 1000, 2)
+
+
+class QueryStatsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, "QUERY_STATS_ENABLED", False)
+        self.metrics = getattr(settings, "METRICS_ENABLED", False)
+        self.keep_slowest = getattr(settings, "QUERY_STATS_SLOWEST", 3)
+        self.warn_count = getattr(settings, "QUERY_STATS_WARN_COUNT", 30)
+        self.warn_ms = getattr(settings, "QUERY_STATS_WARN_MS", 200)
+
+    def __call__(self, request):
+        if not (self.enabled or self.metrics):
+            return self.get_response(request)
+
+        stats = QueryStats(self.keep_slowest)
+        with _capturing(stats):
+            response = self.get_response(request)
+
+        if response.streaming and not response.is_async:
+            response.streaming_content = self._stream(response.streaming_content, request, stats)
+            return response
+        self._finish(request, response, stats)
+        return response
+
+    def _stream(self, content, request, stats):
+        """Itera el cuerpo contando sus consultas; cierra las estadísticas al final."""
+        content = iter(content)
+        try:
+            while True:
+                with _capturing(stats):
+                    chunk = next(content, _END)
+                if chunk is _END:
+                    return
+                yield chunk
+        finally:
+            self._finish(request, None, stats)
+
+    def _finish(self, request, response, stats):
+        """Métricas, cabeceras (si hay respuesta sin enviar) y log del request."""
+        if self.metrics:
+            match = getattr(request, "resolver_match", None)
+            view = match.view_name if match else "<sin ruta>"
+            VIEW_DB_SECONDS.observe(stats.total, view=view)
+            VIEW_DB_QUERIES.inc(stats.count, view=view)
+        if not self.enabled:
+            return
+
+        request.query_stats = stats
+        if response is not None:
+            response["X-Query-Stats"] = f"count={stats.count}; time_ms={stats.total_ms}"
+            response["Server-Timing"] = f'db;dur={stats.total_ms};desc="{stats.count} consultas"'
+
+        level = logging.WARNING if (stats.count > self.warn_count or stats.total_ms > self.warn_ms) else logging.INFO
+        if logger.isEnabledFor(level):
+            logger.log(
+                level, "%s %s: %d consultas, %.2f ms SQL; más lentas: %s",
+                request.method, request.path, stats.count, stats.total_ms,
+                " | ".join(f"{ms} ms {sql[:200]}" for ms, sql in stats.slowest),
+            )
+
+
+_END = object()
+
+
+def _capturing(stats: QueryStats) -> ExitStack:
+    """Engancha stats a todas las conexiones mientras dure el bloque."""
+    stack = ExitStack()
+    for conn in connections.all():
+        stack.enter_context(conn.execute_wrapper(stats))
+    return stack
@@ -1,18 +1,37 @@
 # core/models.py
 from django.db import models
+from django.dispatch import Signal
 from django.utils import timezone
 
+# Se envía tras cualquier borrado, soft o físico, individual o en lote, con
+# sender=modelo, pks=[...] y hard=bool. El soft delete en lote es un UPDATE
+# y no dispara post_save/post_delete; los pks solo se leen si hay receptores.
+rows_deleted = Signal()
+
+
+def _pks_if_listened(qs):
+    return list(qs.values_list("pk", flat=True)) if rows_deleted.has_listeners(qs.model) else None
+
+
 # ---------------------------
 # QuerySet con soft delete
 # ---------------------------
 class SoftDeleteQuerySet(models.QuerySet):
     def delete(self):
         # Soft delete en lote
-        return super().update(deleted_at=timezone.now(), estado="INACTIVO")
+        pks = _pks_if_listened(self.alive())
+        updated = super().update(deleted_at=timezone.now(), estado="INACTIVO")
+        if pks:
+            rows_deleted.send(sender=self.model, pks=pks, hard=False)
+        return updated
 
     def hard_delete(self):
         # Borrado físico 
-        return super().delete()
+        pks = _pks_if_listened(self)
+        result = super().delete()
+        if pks:
+            rows_deleted.send(sender=self.model, pks=pks, hard=True)
+        return result
 
     def alive(self):
         return self.filter(deleted_at__isnull=True)
@@ -68,10 +87,14 @@ class BaseModel(models.Model):
         self.deleted_at = timezone.now()
         self.estado = "INACTIVO"
         self.save(update_fields=["deleted_at", "estado", "updated_at"])
+        rows_deleted.send(sender=type(self), pks=[self.pk], hard=False)
 
     # Borrado físico individual
     def hard_delete(self, using=None, keep_parents=False):
-        return super().delete(using=using, keep_parents=keep_parents)
+        pk = self.pk
+        result = super().delete(using=using, keep_parents=keep_parents)
+        rows_deleted.send(sender=type(self), pks=[pk], hard=True)
+        return result
 
 
 # ---------------------------
@@ -0,0 +1,39 @@
+# core/testing.py
+"""Utilidades de test compartidas por las apps."""
+from __future__ import annotations
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver
+
+
+def url_names(urlpatterns, namespace: str = "") -> set:
+    """Nombres ('ns:name') de todas las rutas con nombre de un urlconf."""
+    names = set()
+    for pattern in urlpatterns:
+        if isinstance(pattern, URLResolver):
+            ns = pattern.namespace or namespace
+            names |= url_names(pattern.url_patterns, ns)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            names.add(f"{namespace}:{pattern.name}" if namespace else pattern.name)
+    return names
+
+
+class QueryBudgetMixin:
+    """
+    assertQueryBudget(n, url): hace el request y falla si ejecuta más de n
+    consultas, listándolas. Usar con datos de varias filas para que un N+1
+    se note en el conteo.
+    """
+
+    def assertQueryBudget(self, budget: int, url: str, method: str = "get", data=None,
+                          status: int = 200, **extra):
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(self.client, method)(url, data, **extra)
+            if response.streaming:
+                # las consultas de una respuesta en streaming corren al consumirla
+                response.streamed = b"".join(response.streaming_content)
+        self.assertEqual(response.status_code, status, f"{method.upper()} {url}")
+        if len(ctx) > budget:
+            listing = "\n".join(f"  {i}. {q['sql']}" for i, q in enumerate(ctx.captured_queries, 1))
+            self.fail(f"{method.upper()} {url}: {len(ctx)} consultas (presupuesto {budget})\n{listing}")
+        return response
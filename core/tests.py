@@ -1,3 +1,117 @@
-from django.test import TestCase
+import logging
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+
+@override_settings(QUERY_STATS_ENABLED=True, QUERY_STATS_WARN_COUNT=1)
+class QueryStatsMiddlewareTest(TestCase):
+    def test_header_and_log(self):
+        user = get_user_model().objects.create_user(username="op", password="x")
+        self.client.force_login(user)
+        with self.assertLogs("core.query_stats", logging.WARNING) as logs:
+            resp = self.client.get(reverse("dispositivos:alert_list"))
+        stats = resp.wsgi_request.query_stats
+        self.assertGreaterEqual(stats.count, 3)  # sesión, usuario, eventos
+        self.assertEqual(resp["X-Query-Stats"], f"count={stats.count}; time_ms={stats.total_ms}")
+        self.assertIn("db;dur=", resp["Server-Timing"])
+        self.assertIn("/dispositivos/alerts/", logs.output[0])
+        self.assertLessEqual(len(stats.slowest), 3)
+
+    @override_settings(QUERY_STATS_SLOWEST=50)
+    def test_streaming_body_is_counted_when_consumed(self):
+        user = get_user_model().objects.create_user(username="op", password="x")
+        self.client.force_login(user)
+        with self.assertLogs("core.query_stats", logging.INFO) as logs:
+            resp = self.client.get(reverse("dispositivos:measurement_export"))
+            self.assertTrue(resp.streaming)
+            self.assertEqual(logs.output, [])  # el cuerpo todavía no se generó
+            b"".join(resp.streaming_content)
+        self.assertEqual(len(logs.output), 1)
+        self.assertNotIn("X-Query-Stats", resp)
+        stats = resp.wsgi_request.query_stats
+        self.assertTrue(any('FROM "measurement"' in sql for _, sql in stats.slowest))
+        self.assertIn(f"{stats.count} consultas", logs.output[0])
+
+    @override_settings(QUERY_STATS_ENABLED=False)
+    def test_disabled_by_setting(self):
+        resp = self.client.get(reverse("login"))
+        self.assertNotIn("X-Query-Stats", resp)
+
+
+@override_settings(METRICS_ENABLED=True, METRICS_TOKEN="s3cret", METRICS_ALLOWED_IPS=None)
+class MetricsEndpointTest(TestCase):
+    def setUp(self):
+        from core.metrics import REGISTRY
+        REGISTRY.reset()
+
+    def _scrape(self):
+        resp = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer s3cret")
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp["Content-Type"].startswith("text/plain; version=0.0.4"))
+        return resp.content.decode()
+
+    def test_pipeline_metrics(self):
+        from django.utils import timezone
+        from core.models import Organization
+        from dispositivos.models import Alert, Category, Device, Product, ProductAlert, Zone
+        from dispositivos.services import bulk_ingest_measurements
+        org = Organization.objects.create(name="Org")
+        dev = Device.objects.create(name="Dev", organization=org, zone=Zone.objects.create(name="Z", organization=org))
+        prod = Product.objects.create(name="P", category=Category.objects.create(name="C"), device=dev)
+        alert, _ = Alert.objects.get_or_create(severity="GRAVE", defaults={"message": "Grave"})
+        ProductAlert.objects.create(product=prod, alert=alert, range_min=90, range_max=999, unit="°C")
+
+        now = timezone.now()
+        bulk_ingest_measurements([
+            {"product_id": prod.pk, "value": v, "unit": "°C", "measured_at": now} for v in (10, 95, 99)
+        ])
+        self.client.get(reverse("login"))
+        body = self._scrape()
+        self.assertIn(f'ecoenergy_measurements_ingested_total{{product="{prod.pk}"}} 3', body)
+        self.assertIn(f'ecoenergy_measurements_ingested_by_organization_total{{organization="{org.pk}"}} 3', body)
+        self.assertIn('ecoenergy_alert_events_created_total{severity="GRAVE"} 2', body)
+        self.assertIn('ecoenergy_alert_evaluation_seconds_count{mode="batch"} 1', body)
+        self.assertIn('ecoenergy_alert_evaluation_seconds_bucket{mode="batch",le="+Inf"} 1', body)
+        self.assertIn('ecoenergy_rule_index_lookups_total{result="', body)
+        self.assertIn('ecoenergy_view_db_queries_total{view="login"}', body)
+        self.assertIn("ecoenergy_alert_queue_depth 0", body)
+
+    def test_multiprocess_files_are_summed(self):
+        import json
+        import os
+        import tempfile
+        from core.metrics import REGISTRY
+        from dispositivos.metrics import ALERT_EVENTS_CREATED
+        ALERT_EVENTS_CREATED.inc(severity="ALTO")
+        with tempfile.TemporaryDirectory() as tmp, self.settings(METRICS_MULTIPROC_DIR=tmp):
+            REGISTRY.flush()
+            self.assertTrue(os.path.exists(os.path.join(tmp, f"{os.getpid()}.json")))
+            # estado volcado por otro worker
+            with open(os.path.join(tmp, "999999.json"), "w", encoding="utf-8") as fh:
+                json.dump({ALERT_EVENTS_CREATED.name: [[["ALTO"], 4], [["GRAVE"], 1]]}, fh)
+            body = self._scrape()
+        self.assertIn('ecoenergy_alert_events_created_total{severity="ALTO"} 5', body)
+        self.assertIn('ecoenergy_alert_events_created_total{severity="GRAVE"} 1', body)
+
+    def test_restricted(self):
+        url = reverse("metrics")
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION="Bearer otro").status_code, 403)
+        # una IP local (p. ej. la del proxy) ya no alcanza
+        self.assertEqual(self.client.get(url, REMOTE_ADDR="127.0.0.1").status_code, 403)
+        with self.settings(METRICS_TOKEN=None):
+            self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION="Bearer None").status_code, 403)
+        with self.settings(METRICS_ALLOWED_IPS=["10.0.0.1"]):
+            self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION="Bearer s3cret").status_code, 403)
+        with self.settings(METRICS_ENABLED=False):
+            self.assertEqual(self.client.get(reverse("metrics")).status_code, 404)
+
+    def test_staff_session(self):
+        user = get_user_model().objects.create_user(username="ops", password="x")
+        self.client.force_login(user)
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 403)
+        user.is_staff = True
+        user.save(update_fields=["is_staff"])
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 200)
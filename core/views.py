@@ -1,3 +1,30 @@
-from django.shortcuts import render
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import Http404, HttpResponse
 
-# Create your views here.
+from .auth import bearer_token_matches
+from .metrics import REGISTRY
+
+
+def _metrics_authorized(request) -> bool:
+    """Bearer METRICS_TOKEN (Prometheus) o sesión de staff."""
+    if bearer_token_matches(request, getattr(settings, "METRICS_TOKEN", None)):
+        return True
+    user = getattr(request, "user", None)
+    return bool(user and user.is_authenticated and user.is_staff)
+
+
+def metrics(request):
+    """
+    Métricas en formato Prometheus; solo con METRICS_ENABLED y con el token
+    METRICS_TOKEN (o un usuario staff). METRICS_ALLOWED_IPS es un filtro
+    adicional: detrás de un proxy REMOTE_ADDR es la IP del proxy.
+    """
+    if not getattr(settings, "METRICS_ENABLED", False):
+        raise Http404
+    allowed = getattr(settings, "METRICS_ALLOWED_IPS", None)
+    if allowed is not None and request.META.get("REMOTE_ADDR") not in allowed:
+        raise PermissionDenied
+    if not _metrics_authorized(request):
+        raise PermissionDenied
+    return HttpResponse(REGISTRY.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
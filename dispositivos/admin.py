@@ -2,12 +2,61 @@
 from django.contrib import admin
 from django import forms
 from django.db import models
-from django.utils import timezone
 
+from core.admin_utils import IndexedDateHierarchyMixin
 from .models import (
     Zone, Category, Device, Product, Measurement,
-    Alert, ProductAlert, ProductAlertEvent
+    Alert, ProductAlert, ProductAlertEvent, LatestMeasurement
 )
+from .forms import ProductAutocompleteWidget, assignable_products
+from .services import assign_products, resolve_events
+
+
+# ---------- Changelists de tablas grandes (Measurement, ProductAlertEvent) ----------
+# Búsqueda: solo prefijo sobre tablas chicas (producto / dispositivo por nombre)
+# y luego un IN sobre la FK indexada de la tabla grande; un icontains con JOIN
+# recorrería la tabla entera. Un término numérico busca además por id.
+def _prefix_search(queryset, search_term, lookup, via_rules=False):
+    term = search_term.strip()
+    if not term:
+        return queryset
+    ids = Product.objects.filter(
+        models.Q(name__istartswith=term) | models.Q(device__name__istartswith=term)
+    ).values("pk")
+    if via_rules:
+        ids = ProductAlert.objects.filter(product_id__in=ids).values("pk")
+    condition = models.Q(**{f"{lookup}__in": ids})
+    if term.isdigit():
+        condition |= models.Q(pk=int(term))
+    return queryset.filter(condition)
+
+
+class OrganizationRelatedListFilter(admin.RelatedFieldListFilter):
+    """
+    RelatedFieldListFilter para Zone y Device, cuyo __str__ muestra la
+    organización: una consulta con JOIN en vez de una por opción.
+    """
+    def field_choices(self, field, request, model_admin):
+        ordering = self.field_admin_ordering(field, request, model_admin) or ("name",)
+        return [
+            (obj.pk, str(obj))
+            for obj in field.related_model._default_manager.select_related("organization").order_by(*ordering)
+        ]
+
+
+class MeasurementUnitFilter(admin.SimpleListFilter):
+    """Unidades desde latest_measurement (una fila por producto), no DISTINCT sobre measurement."""
+    title = "unidad"
+    parameter_name = "unit"
+
+    def lookups(self, request, model_admin):
+        units = LatestMeasurement.objects.order_by("unit").values_list("unit", flat=True).distinct()
+        return [(u, u or "—") for u in units]
+
+    def queryset(self, request, queryset):
+        if self.value() is not None:
+            return queryset.filter(unit=self.value())
+        return queryset
 
 # ---------- Device: form con selector de productos ----------
 class DeviceAdminForm(forms.ModelForm):
@@ -15,8 +64,8 @@ class DeviceAdminForm(forms.ModelForm):
         queryset=Product.objects.none(),
         required=False,
         label="Productos a asociar",
-        help_text="Selecciona productos sin dispositivo o ya asociados a este.",
-        widget=admin.widgets.FilteredSelectMultiple("Productos", is_stacked=False),
+        help_text="Busca por nombre productos sin dispositivo o ya asociados a este.",
+        widget=ProductAutocompleteWidget,
     )
 
     class Meta:
@@ -27,24 +76,19 @@ class DeviceAdminForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
 
         if self.instance and self.instance.pk:
-            base_qs = Product.objects.filter(
-                models.Q(device__isnull=True) | models.Q(device=self.instance)
-            ).select_related("device", "category")
             # preseleccionar los ya asociados
             self.fields["products"].initial = self.instance.products.values_list("pk", flat=True)
-        else:
-            base_qs = Product.objects.filter(
-                device__isnull=True
-            ).select_related("device", "category")
-
-        self.fields["products"].queryset = base_qs.order_by("name")
+        # solo valida lo enviado; las opciones llegan por product_autocomplete
+        self.fields["products"].queryset = assignable_products(self.instance)
+        self.fields["products"].widget.device = self.instance
 
 
 @admin.register(Device)
 class DeviceAdmin(admin.ModelAdmin):
     form = DeviceAdminForm
     list_display = ("name", "serial_number", "zone", "organization", "estado", "created_at")
-    list_filter  = ("zone", "organization", "estado")
+    list_select_related = ("zone__organization", "organization")
+    list_filter  = (("zone", OrganizationRelatedListFilter), "organization", "estado")
     search_fields = ("name", "serial_number")
     fieldsets = (
         (None, {
@@ -60,13 +104,9 @@ class DeviceAdmin(admin.ModelAdmin):
     def save_model(self, request, obj, form, change):
         # Guarda primero el device (para tener pk)
         super().save_model(request, obj, form, change)
-        # Sincroniza productos seleccionados DESPUÉS de guardar
+        # Sincroniza productos seleccionados DESPUÉS de guardar (un UPDATE con la diferencia)
         if "products" in form.cleaned_data:
-            selected_ids = list(form.cleaned_data["products"].values_list("pk", flat=True))
-            # Quita los que ya no están marcados
-            Product.objects.filter(device=obj).exclude(pk__in=selected_ids).update(device=None)
-            # Asocia los marcados
-            Product.objects.filter(pk__in=selected_ids).update(device=obj)
+            assign_products(obj, [p.pk for p in form.cleaned_data["products"]])
 
 
 # ---------- Inlines para gestionar rangos por producto ----------
@@ -80,7 +120,8 @@ class ProductAlertInline(admin.TabularInline):
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
     list_display = ("name", "device", "category", "serial_number", "estado")
-    list_filter  = ("category", "device", "estado")
+    list_select_related = ("device__organization", "category")
+    list_filter  = ("category", ("device", OrganizationRelatedListFilter), "estado")
     search_fields = ("name", "serial_number")
     inlines = [ProductAlertInline]
 
@@ -94,6 +135,7 @@ class CategoryAdmin(admin.ModelAdmin):
 @admin.register(Zone)
 class ZoneAdmin(admin.ModelAdmin):
     list_display = ("name", "organization", "estado")
+    list_select_related = ("organization",)
     list_filter = ("organization",)
 
 
@@ -106,15 +148,26 @@ class AlertAdmin(admin.ModelAdmin):
 
 
 @admin.register(Measurement)
-class MeasurementAdmin(admin.ModelAdmin):
+class MeasurementAdmin(IndexedDateHierarchyMixin, admin.ModelAdmin):
     list_display = ("product", "value", "unit", "measured_at", "triggered_alerts")
-    list_filter  = ("unit", "product__device")
-    search_fields = ("product__name",)
+    list_filter  = (MeasurementUnitFilter, ("product__device", OrganizationRelatedListFilter))
+    search_fields = ("^product__name",)
+    search_help_text = "Prefijo del nombre del producto o dispositivo, o id de la medición."
+    list_select_related = ("product__device",)
+    date_hierarchy = "measured_at"          # meas_live_time_idx
+    ordering = ("-measured_at", "-id")      # mismo orden que el índice
+
+    def get_search_results(self, request, queryset, search_term):
+        return _prefix_search(queryset, search_term, "product_id"), False
+
+    def get_queryset(self, request):
+        # una consulta para los eventos de toda la página, no una por fila
+        return super().get_queryset(request).prefetch_related("alert_events__product_alert__alert")
 
     def triggered_alerts(self, obj):
         severities = [
             e.product_alert.alert.get_severity_display()
-            for e in obj.alert_events.select_related("product_alert__alert")
+            for e in obj.alert_events.all()
         ]
         return ", ".join(severities) if severities else "—"
     triggered_alerts.short_description = "Alertas disparadas"
@@ -123,15 +176,23 @@ class MeasurementAdmin(admin.ModelAdmin):
 @admin.register(ProductAlert)
 class ProductAlertAdmin(admin.ModelAdmin):
     list_display = ("product", "alert", "range_min", "range_max", "unit", "estado")
+    list_select_related = ("product__device", "alert")
     list_filter = ("alert__severity", "unit", "estado")
     search_fields = ("product__name",)
 
 
 @admin.register(ProductAlertEvent)
-class ProductAlertEventAdmin(admin.ModelAdmin):
+class ProductAlertEventAdmin(IndexedDateHierarchyMixin, admin.ModelAdmin):
     list_display = ("product_name", "device_name", "alert_severity", "value_with_unit", "measured_at", "is_resolved", "created_at")
-    list_filter = ("product_alert__alert__severity", "is_resolved")
-    search_fields = ("product_alert__product__name", "measurement__product__name")
+    list_filter = (("product_alert__alert__severity", admin.ChoicesFieldListFilter), "is_resolved")
+    list_select_related = ("product_alert__product__device", "product_alert__alert", "measurement")
+    search_fields = ("^product_alert__product__name",)
+    search_help_text = "Prefijo del nombre del producto o dispositivo, o id del evento."
+    date_hierarchy = "created_at"           # pae_live_time_idx
+    ordering = ("-created_at", "-id")
+
+    def get_search_results(self, request, queryset, search_term):
+        return _prefix_search(queryset, search_term, "product_alert_id", via_rules=True), False
 
     @admin.display(description="Producto")
     def product_name(self, obj):
@@ -157,6 +218,6 @@ class ProductAlertEventAdmin(admin.ModelAdmin):
 
     @admin.action(description="Marcar seleccionadas como resueltas")
     def marcar_resueltas(self, request, queryset):
-        updated = queryset.update(is_resolved=True, resolved_at=timezone.now())
+        updated = resolve_events(queryset, source="admin")
         self.message_user(request, f"{updated} evento(s) marcados como resueltos.")
     actions = ["marcar_resueltas"]
@@ -0,0 +1,161 @@
+# dispositivos/alert_queue.py
+"""
+Evaluación diferida de alertas respaldada por la tabla alert_evaluation_queue.
+
+Con ALERT_EVALUATION_ASYNC = True, la señal post_save y la ingesta masiva
+solo encolan el id de la medición; `manage.py alert_worker` drena la cola en
+lotes fuera de la transacción del escritor.
+
+Semántica al-menos-una-vez: la fila de la cola se escribe en la misma
+transacción que la medición (si la medición se confirma, su tarea también)
+y solo se borra después de evaluar. Una tarea reclamada por un worker que
+muere vuelve a estar disponible tras ALERT_WORKER_CLAIM_TIMEOUT segundos.
+Reprocesar es seguro: generate_alert_events_for_measurements no duplica eventos.
+
+Una tarea que vence su reclamo ALERT_WORKER_MAX_ATTEMPTS veces (p. ej. una
+medición que siempre hace fallar la evaluación) se marca con failed_at y
+deja de reclamarse: queda en la tabla para revisarla y se cuenta aparte en
+queue_stats. Para reintentarla basta con limpiar failed_at y attempts.
+"""
+from __future__ import annotations
+import logging
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Iterable
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+
+from .models import AlertEvaluationTask, Measurement
+from .services import generate_alert_events_for_measurements
+
+logger = logging.getLogger(__name__)
+
+
+def is_async_enabled() -> bool:
+    return getattr(settings, "ALERT_EVALUATION_ASYNC", False)
+
+
+def enqueue_measurements(measurement_ids: Iterable[int]) -> None:
+    AlertEvaluationTask.objects.bulk_create(
+        [AlertEvaluationTask(measurement_id=pk) for pk in measurement_ids]
+    )
+
+
+def _claimable(now):
+    timeout = getattr(settings, "ALERT_WORKER_CLAIM_TIMEOUT", 300)
+    return Q(failed_at__isnull=True) & (
+        Q(claimed_at__isnull=True) | Q(claimed_at__lt=now - timedelta(seconds=timeout))
+    )
+
+
+def _fail_exhausted(now) -> int:
+    """Marca como fallidas las tareas reclamables que ya agotaron sus intentos."""
+    max_attempts = getattr(settings, "ALERT_WORKER_MAX_ATTEMPTS", 5)
+    exhausted = AlertEvaluationTask.objects.filter(_claimable(now), attempts__gte=max_attempts)
+    measurement_ids = list(exhausted.values_list("measurement_id", flat=True)[:20])
+    if not measurement_ids:
+        return 0
+    failed = exhausted.update(failed_at=now, claimed_by=None)
+    logger.error(
+        "%s tareas de evaluación superaron %s intentos y quedan fallidas (mediciones %s%s)",
+        failed, max_attempts, measurement_ids, "…" if failed > len(measurement_ids) else "",
+    )
+    return failed
+
+
+def claim_batch(batch_size: int) -> list:
+    """
+    Reclama hasta batch_size tareas libres (o con reclamo vencido), después
+    de apartar las que agotaron ALERT_WORKER_MAX_ATTEMPTS.
+    El UPDATE condicional garantiza que dos workers no se queden con la misma fila.
+    """
+    token = uuid.uuid4().hex
+    now = timezone.now()
+    with transaction.atomic():
+        _fail_exhausted(now)
+        ids = list(
+            AlertEvaluationTask.objects
+            .filter(_claimable(now))
+            .order_by("id")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if not ids:
+            return []
+        (AlertEvaluationTask.objects
+            .filter(pk__in=ids)
+            .filter(_claimable(now))
+            .update(claimed_by=token, claimed_at=now, attempts=F("attempts") + 1))
+    return list(AlertEvaluationTask.objects.filter(claimed_by=token))
+
+
+def process_batch(tasks: list) -> int:
+    """Evalúa las mediciones de las tareas y las borra. Retorna eventos creados."""
+    measurements = Measurement.objects.filter(pk__in=[t.measurement_id for t in tasks])
+    events = generate_alert_events_for_measurements(measurements)
+    AlertEvaluationTask.objects.filter(pk__in=[t.pk for t in tasks]).delete()
+    return len(events)
+
+
+def drain(batch_size: int | None = None, stop: threading.Event | None = None) -> int:
+    """Procesa lotes hasta vaciar la cola (o hasta que se pida detener)."""
+    batch_size = batch_size or getattr(settings, "ALERT_WORKER_BATCH_SIZE", 500)
+    processed = 0
+    while not (stop and stop.is_set()):
+        tasks = claim_batch(batch_size)
+        if not tasks:
+            break
+        try:
+            process_batch(tasks)
+            processed += len(tasks)
+        except Exception:
+            # Quedan reclamadas; se reintentan al vencer ALERT_WORKER_CLAIM_TIMEOUT
+            # (hasta ALERT_WORKER_MAX_ATTEMPTS)
+            logger.exception("Error evaluando %s mediciones encoladas", len(tasks))
+    return processed
+
+
+def run_workers(concurrency: int, batch_size: int, once: bool = False,
+                poll_interval: float = 1.0, stop: threading.Event | None = None) -> int:
+    """
+    Lanza `concurrency` hilos que drenan la cola. Con once=True termina cuando
+    la cola queda vacía; si no, espera poll_interval segundos entre pasadas
+    hasta que se active `stop` (o llegue un KeyboardInterrupt: cada hilo
+    termina su lote en curso y sale).
+    """
+    stop = stop or threading.Event()
+
+    def loop():
+        total = 0
+        try:
+            while True:
+                total += drain(batch_size, stop)
+                if once or stop.wait(poll_interval):
+                    return total
+        finally:
+            close_old_connections()
+
+    pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="alert-worker")
+    try:
+        futures = [pool.submit(loop) for _ in range(concurrency)]
+        return sum(f.result() for f in futures)
+    finally:
+        # Ctrl-C (KeyboardInterrupt) llega mientras se espera a los hilos: hay
+        # que avisarles antes de que shutdown() espere a que terminen
+        stop.set()
+        pool.shutdown(wait=True)
+
+
+def queue_stats() -> dict:
+    """Profundidad de la cola, atraso (segundos) de la tarea pendiente más antigua y fallidas."""
+    agg = AlertEvaluationTask.objects.aggregate(
+        oldest=Min("enqueued_at", filter=Q(failed_at__isnull=True)),
+        depth=Count("pk", filter=Q(failed_at__isnull=True)),
+        failed=Count("pk", filter=Q(failed_at__isnull=False)),
+    )
+    lag = (timezone.now() - agg["oldest"]).total_seconds() if agg["oldest"] else 0.0
+    return {"depth": agg["depth"], "lag_seconds": max(lag, 0.0), "failed": agg["failed"]}
@@ -0,0 +1,245 @@
+# dispositivos/archive.py
+"""
+Archivo columnar del historial de mediciones para análisis en Python.
+
+Por producto y mes hay dos archivos .npy en MEASUREMENT_ARCHIVE_DIR:
+
+    <dir>/<product_id>/<YYYY_MM>.t.npy   datetime64[us] (int64), ordenado
+    <dir>/<product_id>/<YYYY_MM>.v.npy   float64, en la unidad canónica (units.py)
+
+Se abren con np.load(mmap_mode="r"): leer un año son 12 mapeos de memoria,
+sin crear objetos por lectura (16 bytes por medición en disco, 0 copias).
+
+- archive_month() escribe un mes desde la tabla caliente y sus particiones
+  (partitions.querysets) con una consulta ordenada por producto; cada par
+  de archivos se reemplaza de forma atómica (os.replace).
+- load() devuelve una Series: segmentos (un mes cada uno) ya recortados al
+  rango con searchsorted, que siguen siendo vistas del memmap. stats() y
+  resample() trabajan segmento por segmento y combinan, sin concatenar.
+
+Los timestamps guardan la hora de pared de measured_at (USE_TZ=False); si
+la fecha viene con zona horaria se guarda en UTC. La retención
+(enforce_retention) no borra el archivo; un mes ya archivado que recibe
+filas atrasadas se regenera con `archive_measurements --force`.
+"""
+from __future__ import annotations
+import heapq
+import os
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from itertools import groupby
+from operator import itemgetter
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from . import partitions
+from .units import to_canonical
+
+TIME_DTYPE = np.dtype("datetime64[us]")
+VALUE_DTYPE = np.dtype(np.float64)
+
+
+def archive_dir() -> Path:
+    return Path(getattr(settings, "MEASUREMENT_ARCHIVE_DIR", Path(settings.BASE_DIR) / "archive"))
+
+
+def _paths(product_id: int, month: date) -> Tuple[Path, Path]:
+    base = archive_dir() / str(product_id) / f"{month:%Y_%m}"
+    return base.with_suffix(".t.npy"), base.with_suffix(".v.npy")
+
+
+def to_datetime64(dt) -> np.datetime64:
+    if isinstance(dt, np.datetime64):
+        return dt.astype(TIME_DTYPE)
+    if not isinstance(dt, datetime):
+        dt = datetime(dt.year, dt.month, dt.day)
+    if timezone.is_aware(dt):
+        dt = timezone.make_naive(dt, dt_timezone.utc)
+    return np.datetime64(dt, "us")
+
+
+def archived_months(product_id: int) -> List[date]:
+    folder = archive_dir() / str(product_id)
+    if not folder.is_dir():
+        return []
+    months = []
+    for name in os.listdir(folder):
+        if name.endswith(".v.npy"):
+            year, month = name[:-len(".v.npy")].split("_")
+            months.append(date(int(year), int(month), 1))
+    return sorted(months)
+
+
+def is_archived(product_id: int, month: date) -> bool:
+    return all(path.exists() for path in _paths(product_id, month))
+
+
+# ------------------------ escritura ------------------------
+def _write(path: Path, array: np.ndarray) -> None:
+    tmp = path.with_name(f".{path.name}.tmp")
+    with open(tmp, "wb") as fh:
+        np.save(fh, array)
+    os.replace(tmp, path)
+
+
+def write_series(product_id: int, month: date, times, values) -> int:
+    """Escribe (o reemplaza) el mes del producto; times en datetime64[us] ordenado."""
+    times = np.asarray(times, dtype=TIME_DTYPE)
+    values = np.asarray(values, dtype=VALUE_DTYPE)
+    t_path, v_path = _paths(product_id, month)
+    t_path.parent.mkdir(parents=True, exist_ok=True)
+    # el de valores va último: archived_months/is_archived lo usan como marca
+    _write(t_path, times)
+    _write(v_path, values)
+    return len(values)
+
+
+def _month_rows(month: date, product_ids: Optional[Iterable[int]], chunk_size: int) -> Iterator[tuple]:
+    since = datetime(month.year, month.month, 1)
+    until = datetime.combine(partitions.next_month(month), datetime.min.time())
+    sources = [
+        qs.order_by("product_id", "measured_at", "id")
+        .values_list("product_id", "measured_at", "value", "unit")
+        .iterator(chunk_size=chunk_size)
+        for qs in partitions.querysets(since, until, product_ids)
+    ]
+    if len(sources) == 1:
+        return sources[0]
+    return heapq.merge(*sources, key=itemgetter(0, 1))
+
+
+def archive_month(month: date, product_ids: Optional[Iterable[int]] = None, skip_existing: bool = False,
+                  chunk_size: int = 5000) -> Dict[int, int]:
+    """
+    Archiva el mes (todas las mediciones, o las de product_ids). Retorna
+    {product_id: filas escritas}; los productos sin lecturas no generan archivos.
+    """
+    month = partitions.month_start(month)
+    product_ids = list(product_ids) if product_ids is not None else None
+    written = {}
+    for pid, rows in groupby(_month_rows(month, product_ids, chunk_size), key=itemgetter(0)):
+        if skip_existing and is_archived(pid, month):
+            continue
+        times, values = [], []
+        for _, measured_at, value, unit in rows:
+            times.append(to_datetime64(measured_at))
+            values.append(to_canonical(value, unit)[0])
+        written[pid] = write_series(pid, month, times, values)
+    return written
+
+
+# ------------------------ lectura ------------------------
+@dataclass
+class Series:
+    """
+    Lecturas de un producto en [since, until) como lista de segmentos
+    (times, values), uno por mes, que son vistas de los memmap (sin copia).
+    """
+    product_id: int
+    segments: List[Tuple[np.ndarray, np.ndarray]]
+
+    def __len__(self) -> int:
+        return sum(len(v) for _, v in self.segments)
+
+    def arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(times, values) contiguos; sin copia si hay un solo segmento."""
+        if len(self.segments) == 1:
+            return self.segments[0]
+        if not self.segments:
+            return np.empty(0, TIME_DTYPE), np.empty(0, VALUE_DTYPE)
+        return (np.concatenate([t for t, _ in self.segments]),
+                np.concatenate([v for _, v in self.segments]))
+
+    def slice(self, since=None, until=None) -> "Series":
+        return Series(self.product_id, _clip(self.segments, since, until))
+
+    def stats(self) -> dict:
+        """count, min, max, mean (None si no hay lecturas)."""
+        count, total = 0, 0.0
+        lo, hi = np.inf, -np.inf
+        for _, values in self.segments:
+            if len(values):
+                count += len(values)
+                total += float(values.sum())
+                lo, hi = min(lo, float(values.min())), max(hi, float(values.max()))
+        if not count:
+            return {"count": 0, "min": None, "max": None, "mean": None}
+        return {"count": count, "min": lo, "max": hi, "mean": total / count}
+
+    def resample(self, width: timedelta, origin=None) -> dict:
+        """
+        Agrega en ventanas fijas de `width` desde `origin` (por defecto, la
+        primera lectura truncada al día). Retorna arrays alineados: start,
+        count, mean, min, max; solo las ventanas con lecturas.
+        """
+        empty = {"start": np.empty(0, TIME_DTYPE), "count": np.empty(0, np.int64),
+                 "mean": np.empty(0), "min": np.empty(0), "max": np.empty(0)}
+        segments = [(t, v) for t, v in self.segments if len(v)]
+        if not segments:
+            return empty
+        step = np.timedelta64(int(width / timedelta(microseconds=1)), "us")
+        if step <= np.timedelta64(0, "us"):
+            raise ValueError("width debe ser positivo.")
+        start = to_datetime64(origin) if origin is not None else segments[0][0][0].astype("datetime64[D]").astype(TIME_DTYPE)
+        last = segments[-1][0][-1]
+        if last < start:
+            return empty
+        n = int((last - start) // step) + 1
+        counts = np.zeros(n, np.int64)
+        sums = np.zeros(n)
+        mins = np.full(n, np.inf)
+        maxs = np.full(n, -np.inf)
+        for times, values in segments:
+            if origin is not None:
+                keep = times >= start
+                if not keep.any():
+                    continue
+                times, values = times[keep], values[keep]
+            buckets = ((times - start) // step).astype(np.int64)
+            # ordenado: cada ventana es un tramo contiguo del segmento
+            uniq, first = np.unique(buckets, return_index=True)
+            counts[uniq] += np.diff(np.append(first, len(buckets)))
+            sums[uniq] += np.add.reduceat(values, first)
+            mins[uniq] = np.minimum(mins[uniq], np.minimum.reduceat(values, first))
+            maxs[uniq] = np.maximum(maxs[uniq], np.maximum.reduceat(values, first))
+        used = np.nonzero(counts)[0]
+        return {
+            "start": start + used * step,
+            "count": counts[used],
+            "mean": sums[used] / counts[used],
+            "min": mins[used],
+            "max": maxs[used],
+        }
+
+
+def _clip(segments, since, until) -> List[Tuple[np.ndarray, np.ndarray]]:
+    clipped = []
+    for times, values in segments:
+        lo = int(np.searchsorted(times, to_datetime64(since), "left")) if since is not None else 0
+        hi = int(np.searchsorted(times, to_datetime64(until), "left")) if until is not None else len(times)
+        if hi > lo:
+            clipped.append((times[lo:hi], values[lo:hi]))
+    return clipped
+
+
+def load(product_id: int, since=None, until=None) -> Series:
+    """Series del producto en [since, until) leída del archivo por memmap."""
+    segments = []
+    for month in archived_months(product_id):
+        if since is not None and partitions.next_month(month) <= partitions.month_start(since):
+            continue
+        if until is not None and datetime(month.year, month.month, 1) >= _naive(until):
+            continue
+        t_path, v_path = _paths(product_id, month)
+        segments.append((np.load(t_path, mmap_mode="r"), np.load(v_path, mmap_mode="r")))
+    return Series(product_id, _clip(segments, since, until))
+
+
+def _naive(dt) -> datetime:
+    if not isinstance(dt, datetime):
+        dt = datetime(dt.year, dt.month, dt.day)
+    return timezone.make_naive(dt, dt_timezone.utc) if timezone.is_aware(dt) else dt
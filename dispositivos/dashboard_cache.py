@@ -0,0 +1,88 @@
+# dispositivos/dashboard_cache.py
+"""
+Caché del dashboard por sección, organización y filtros.
+
+Cada sección tiene una versión en el caché (dashboard:v:<sección>) que se
+incrementa cuando cambia algún modelo del que depende (señales, o llamadas
+explícitas desde caminos que usan bulk_create/update). Las claves incluyen
+la versión, así que nada se borra: lo viejo expira por DASHBOARD_CACHE_TTL,
+que además acota cualquier desfase entre procesos.
+
+Usa el framework de caché de Django (CACHES['default']); funciona igual con
+locmem o file cache en tests.
+"""
+from __future__ import annotations
+import threading
+from typing import Callable, Iterable
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+# Sección -> modelos (app_label.Model) cuyos cambios la invalidan
+SECTIONS = {
+    "counts_by_cat": ("dispositivos.Category", "dispositivos.Product"),
+    "counts_by_zone": ("dispositivos.Zone", "dispositivos.Device"),
+    "sev_map": ("dispositivos.ProductAlertEvent", "dispositivos.ProductAlert", "dispositivos.Alert"),
+    "last_measurements": ("dispositivos.LatestMeasurement", "dispositivos.Product", "dispositivos.Device"),
+    "recent_events": ("dispositivos.ProductAlertEvent", "dispositivos.ProductAlert",
+                      "dispositivos.Product", "dispositivos.Device"),
+    "filters": ("dispositivos.Category", "dispositivos.Zone"),
+    "device_cards": ("dispositivos.Device", "dispositivos.Product", "dispositivos.Zone",
+                     "dispositivos.LatestMeasurement"),
+}
+
+_stats_lock = threading.Lock()
+_stats = {name: {"hits": 0, "misses": 0} for name in SECTIONS}
+
+
+def _version_key(section: str) -> str:
+    return f"dashboard:v:{section}"
+
+
+def sections_for_model(label: str) -> list:
+    return [name for name, models in SECTIONS.items() if label in models]
+
+
+def bump(*sections: str) -> None:
+    """Invalida secciones subiendo su versión (al confirmar la transacción en curso)."""
+    def _do():
+        for section in sections:
+            key = _version_key(section)
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.add(key, 2, timeout=None)
+    transaction.on_commit(_do)
+
+
+class DashboardCache:
+    def __init__(self, organization_id):
+        self.org = organization_id or "all"
+        self.ttl = getattr(settings, "DASHBOARD_CACHE_TTL", 30)
+        keys = [_version_key(s) for s in SECTIONS]
+        found = cache.get_many(keys)
+        self.versions = {s: found.get(_version_key(s), 1) for s in SECTIONS}
+
+    def get(self, section: str, builder: Callable, params: Iterable = ()):
+        """Valor cacheado de la sección o, si no está, el resultado de builder()."""
+        params_key = ":".join(str(p) for p in params) or "-"
+        key = f"dashboard:{section}:{self.org}:{params_key}:v{self.versions[section]}"
+        value = cache.get(key)
+        hit = value is not None
+        if not hit:
+            value = builder()
+            cache.set(key, value, self.ttl)
+        with _stats_lock:
+            _stats[section]["hits" if hit else "misses"] += 1
+        return value
+
+
+def stats() -> dict:
+    """Aciertos, fallos y tasa de acierto por sección (en este proceso)."""
+    with _stats_lock:
+        out = {}
+        for name, s in _stats.items():
+            total = s["hits"] + s["misses"]
+            out[name] = dict(s, ratio=(s["hits"] / total) if total else None)
+        return out
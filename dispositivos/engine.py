@@ -0,0 +1,134 @@
+# dispositivos/engine.py
+"""
+Motor vectorizado (NumPy) para evaluar lotes grandes de mediciones contra
+las reglas de alerta. Produce los mismos pares (medición, ProductAlert) que
+generate_alert_events_for_measurement, pero sin loop Python por fila
+(incluida la conversión de unidades, ver units.py).
+
+Se usa desde services.generate_alert_events_for_measurements cuando el lote
+supera ALERT_VECTORIZED_MIN_BATCH, y desde el benchmark bench_alert_engine.
+"""
+from __future__ import annotations
+from typing import Dict, Iterable, Tuple
+
+import numpy as np
+
+from .rules import CompiledRules
+from .units import SIGNIFICANT_DIGITS, conversion
+
+
+class RuleTable:
+    """
+    Reglas en una matriz densa (productos × K), donde K es el máximo de reglas
+    por producto (acotado: unique_together product/alert). Las celdas vacías
+    tienen range_min = +inf, así que nunca calzan.
+
+    Las unidades de las reglas se codifican como enteros: 0 = sin unidad
+    (comodín), 1..n = unidades normalizadas. Las de las mediciones tienen su
+    propio código (encode_units), que indexa las matrices de conversión
+    scale/offset/convertible (unidades de medición × unidades de regla),
+    armadas con units.conversion.
+    """
+
+    def __init__(self, rules: Iterable[Tuple[int, int, str, float, float]]):
+        # rules: (rule_id, product_id, unit_norm, range_min, range_max)
+        by_product: Dict[int, list] = {}
+        self.unit_codes: Dict[str, int] = {"": 0}
+        for rule_id, product_id, unit, rmin, rmax in rules:
+            by_product.setdefault(product_id, []).append((rule_id, unit, rmin, rmax))
+            self.unit_codes.setdefault(unit, len(self.unit_codes))
+
+        self.product_ids = np.array(sorted(by_product), dtype=np.int64)
+        width = max((len(v) for v in by_product.values()), default=0)
+        shape = (len(self.product_ids), width)
+        self.rule_ids = np.full(shape, -1, dtype=np.int64)
+        self.units = np.zeros(shape, dtype=np.int32)
+        self.mins = np.full(shape, np.inf, dtype=np.float64)
+        self.maxs = np.full(shape, -np.inf, dtype=np.float64)
+        for row, product_id in enumerate(self.product_ids.tolist()):
+            for k, (rule_id, unit, rmin, rmax) in enumerate(sorted(by_product[product_id])):
+                self.rule_ids[row, k] = rule_id
+                self.units[row, k] = self.unit_codes[unit]
+                self.mins[row, k] = rmin
+                self.maxs[row, k] = rmax
+        self._size = sum(len(v) for v in by_product.values())
+        self.reading_codes: Dict[str, int] = {}
+        self.scale = np.empty((0, len(self.unit_codes)), dtype=np.float64)
+        self.offset = np.empty((0, len(self.unit_codes)), dtype=np.float64)
+        self.convertible = np.empty((0, len(self.unit_codes)), dtype=bool)
+
+    @classmethod
+    def from_compiled(cls, compiled: Dict[int, CompiledRules]) -> "RuleTable":
+        """Construye la tabla a partir de las entradas de rules.rule_index."""
+        rows = []
+        for product_id, rules in compiled.items():
+            for unit, (mins, maxs, ids) in rules.groups.items():
+                rows.extend(zip(ids, [product_id] * len(ids), [unit] * len(ids), mins, maxs))
+        return cls(rows)
+
+    def __len__(self):
+        return self._size
+
+    def encode_units(self, units_norm: Iterable[str]) -> np.ndarray:
+        """Códigos de las unidades de las mediciones; agrega filas de conversión para las nuevas."""
+        codes = self.reading_codes
+        known = len(codes)
+        encoded = np.fromiter((codes.setdefault(u, len(codes)) for u in units_norm), dtype=np.int32)
+        if len(codes) > known:
+            new = list(codes)[known:]
+            rule_units = list(self.unit_codes)
+            factors = [[conversion(u, r) for r in rule_units] for u in new]
+            self.convertible = np.vstack([self.convertible, [[f is not None for f in row] for row in factors]])
+            self.scale = np.vstack([self.scale, [[f[0] if f else 0.0 for f in row] for row in factors]])
+            self.offset = np.vstack([self.offset, [[f[1] if f else 0.0 for f in row] for row in factors]])
+        return encoded
+
+
+def _round_significant(v: np.ndarray) -> np.ndarray:
+    """units.round_significant elemento a elemento."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        digits = SIGNIFICANT_DIGITS - 1 - np.floor(np.log10(np.abs(v)))
+    finite = np.isfinite(digits)
+    scale = 10.0 ** np.minimum(np.where(finite, digits, 0.0), 300)
+    return np.where(finite, np.round(v * scale) / scale, v)
+
+
+def evaluate(table: RuleTable, product_ids, values, unit_codes) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Evalúa N mediciones (arreglos paralelos) contra la tabla de reglas.
+
+    Retorna (índices de medición, ids de ProductAlert) de los pares que
+    calzan: valor convertido a la unidad de la regla (o comodín) dentro del
+    rango inclusivo. unit_codes sale de table.encode_units.
+    """
+    product_ids = np.asarray(product_ids, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64)
+    unit_codes = np.asarray(unit_codes, dtype=np.int32)
+    empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64))
+    if not len(table) or not len(product_ids):
+        return empty
+
+    # Fila de la tabla para cada medición (productos sin reglas quedan fuera)
+    rows = np.searchsorted(table.product_ids, product_ids)
+    rows[rows == len(table.product_ids)] = 0
+    known = table.product_ids[rows] == product_ids
+
+    # Máscara (N × K) por broadcast: valor convertido a la unidad de cada regla
+    # (una multiplicación y una suma) dentro del rango inclusivo
+    rule_units = table.units[rows]
+    reading_units = unit_codes[:, None]
+    scale = table.scale[reading_units, rule_units]
+    offset = table.offset[reading_units, rule_units]
+    v = values[:, None] * scale + offset
+    # mismo redondeo que units.convert (la identidad queda exacta)
+    converted = (scale != 1.0) | (offset != 0.0)
+    if converted.any():
+        v = np.where(converted, _round_significant(v), v)
+    mask = (
+        (table.mins[rows] <= v)
+        & (v <= table.maxs[rows])
+        & table.convertible[reading_units, rule_units]
+        & known[:, None]
+    )
+    meas_idx, k = np.nonzero(mask)
+    return meas_idx.astype(np.int64), table.rule_ids[rows[meas_idx], k]
@@ -0,0 +1,196 @@
+# dispositivos/exports.py
+"""
+Exportación de mediciones y eventos de alerta (CSV o NDJSON) para rangos
+largos, en streaming y con memoria constante.
+
+- Filtros: organization, zone, device, product (ids) y since/until (ISO
+  8601; sobre measured_at en mediciones y created_at en eventos).
+- Las filas se leen con values_list(...).iterator(chunk_size=EXPORT_CHUNK_SIZE):
+  sin instancias de modelo ni select_related por fila. Nombres de producto y
+  dispositivo salen de una sola consulta previa (producto -> dimensiones).
+- Mediciones: la tabla caliente y las particiones mensuales que se cruzan
+  con el rango (partitions.querysets) se mezclan ya ordenadas por
+  (measured_at, id).
+- Se emite de a EXPORT_CHUNK_SIZE filas por bloque; con gzip, el bloque se
+  comprime al vuelo (zlib con cabecera gzip).
+
+Lo usan views.measurement_export / views.alert_export y
+`manage.py export_data`.
+"""
+from __future__ import annotations
+import csv
+import heapq
+import io
+import json
+import zlib
+from itertools import islice
+from operator import itemgetter
+from typing import Iterable, Iterator, Optional, Tuple
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.dateparse import parse_datetime
+
+from . import partitions
+from .models import Product, ProductAlertEvent
+
+FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+_FILTERS = {
+    "organization": "device__organization_id",
+    "zone": "device__zone_id",
+    "device": "device_id",
+    "product": "pk",
+}
+
+
+def _chunk_size() -> int:
+    return getattr(settings, "EXPORT_CHUNK_SIZE", 2000)
+
+
+def parse_filters(params) -> Tuple[Optional[dict], Optional[str]]:
+    """organization/zone/device/product (enteros) y since/until (ISO 8601); (filtros, error)."""
+    filters = {}
+    for key in _FILTERS:
+        if params.get(key) not in (None, ""):
+            try:
+                filters[key] = int(params[key])
+            except (TypeError, ValueError):
+                return None, f"{key} debe ser un entero."
+    for key in ("since", "until"):
+        if params.get(key):
+            try:
+                value = parse_datetime(str(params[key]))
+            except ValueError:
+                value = None
+            if value is None:
+                return None, f"{key} debe ser una fecha ISO 8601."
+            filters[key] = value
+    if filters.get("since") and filters.get("until") and filters["since"] >= filters["until"]:
+        return None, "since debe ser anterior a until."
+    return filters, None
+
+
+def _dimensions(filters: dict):
+    """
+    {product_id: (producto, device_id, dispositivo)} y los ids a filtrar
+    (None si no hay filtros de jerarquía: se exporta todo).
+    Incluye productos borrados (soft delete) para no perder su historial.
+    """
+    lookups = {_FILTERS[key]: filters[key] for key in _FILTERS if key in filters}
+    rows = (
+        Product.all_objects.filter(**lookups)
+        .values_list("pk", "name", "device_id", "device__name")
+    )
+    dims = {pk: (name, device_id, device_name) for pk, name, device_id, device_name in rows}
+    return dims, (list(dims) if lookups else None)
+
+
+# "product" es el id, igual que lo lee `manage.py import_measurements`
+MEASUREMENT_COLUMNS = ["id", "product", "product_name", "device", "device_name", "value", "unit", "measured_at"]
+
+
+def measurement_rows(filters: dict) -> Iterator[tuple]:
+    dims, product_ids = _dimensions(filters)
+    if product_ids == []:
+        return
+    sources = [
+        qs.order_by("measured_at", "id")
+        .values_list("measured_at", "id", "product_id", "value", "unit")
+        .iterator(chunk_size=_chunk_size())
+        for qs in partitions.querysets(filters.get("since"), filters.get("until"), product_ids)
+    ]
+    unknown = (None, None, None)
+    for measured_at, pk, product_id, value, unit in heapq.merge(*sources, key=itemgetter(0, 1)):
+        product, device_id, device = dims.get(product_id, unknown)
+        yield pk, product_id, product, device_id, device, value, unit, measured_at
+
+
+ALERT_COLUMNS = [
+    "id", "product", "product_name", "device", "device_name", "severity", "rule_id", "measurement_id",
+    "value", "unit", "measured_at", "created_at", "match_count", "last_seen_at", "is_resolved", "resolved_at",
+]
+
+
+def alert_rows(filters: dict) -> Iterator[tuple]:
+    dims, product_ids = _dimensions(filters)
+    if product_ids == []:
+        return
+    qs = ProductAlertEvent.objects.all()
+    if product_ids is not None:
+        qs = qs.filter(product_alert__product_id__in=product_ids)
+    if filters.get("since"):
+        qs = qs.filter(created_at__gte=filters["since"])
+    if filters.get("until"):
+        qs = qs.filter(created_at__lt=filters["until"])
+    # los JOIN van en la misma consulta; no se cargan instancias relacionadas
+    rows = qs.order_by("created_at", "id").values_list(
+        "id", "product_alert__product_id", "product_alert__alert__severity", "product_alert_id",
+        "measurement_id", "measurement__value", "measurement__unit", "measurement__measured_at",
+        "created_at", "match_count", "last_seen_at", "is_resolved", "resolved_at",
+    ).iterator(chunk_size=_chunk_size())
+    unknown = (None, None, None)
+    for pk, product_id, *rest in rows:
+        product, device_id, device = dims.get(product_id, unknown)
+        yield (pk, product_id, product, device_id, device, *rest)
+
+
+KINDS = {
+    "measurements": (MEASUREMENT_COLUMNS, measurement_rows),
+    "alerts": (ALERT_COLUMNS, alert_rows),
+}
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
+
+
+def _json_value(value):
+    # DjangoJSONEncoder trunca las fechas a milisegundos; se exportan completas
+    return value.isoformat() if hasattr(value, "isoformat") else value
+
+
+def render(columns, rows: Iterable[tuple], fmt: str) -> Iterator[bytes]:
+    """Bloques de EXPORT_CHUNK_SIZE filas ya serializadas (CSV con cabecera, o una línea JSON por fila)."""
+    rows = iter(rows)
+    buffer = io.StringIO()
+    if fmt == "csv":
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+    while True:
+        batch = list(islice(rows, _chunk_size()))
+        if fmt == "csv":
+            writer.writerows([_csv_value(v) for v in row] for row in batch)
+        else:
+            for row in batch:
+                buffer.write(json.dumps({c: _json_value(v) for c, v in zip(columns, row)}, cls=DjangoJSONEncoder))
+                buffer.write("\n")
+        if buffer.tell():
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+        if not batch:
+            return
+
+
+def gzip_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Comprime al vuelo en formato gzip (se puede leer con gunzip / gzip.open)."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream(kind: str, filters: dict, fmt: str = "csv", compress: bool = False) -> Iterator[bytes]:
+    columns, rows = KINDS[kind]
+    chunks = render(columns, rows(filters), fmt)
+    return gzip_chunks(chunks) if compress else chunks
+
+
+def filename(kind: str, fmt: str, compress: bool, now) -> str:
+    return f"{kind}-{now:%Y%m%dT%H%M}.{fmt}" + (".gz" if compress else "")
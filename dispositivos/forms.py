@@ -2,7 +2,9 @@
 from django import forms
 from django.utils import timezone
 from django.db.models import Q
+from django.urls import reverse
 from .models import Zone, Category, Device, Product, Measurement, Alert
+from .services import assign_products
 
 # ------------ Catálogos básicos ------------
 class ZoneForm(forms.ModelForm):
@@ -18,13 +20,57 @@ class CategoryForm(forms.ModelForm):
 
 
 # ---------------- Dispositivos ----------------
+class ProductAutocompleteWidget(forms.SelectMultiple):
+    """
+    Selector múltiple de productos que solo renderiza los ya elegidos; el
+    resto se busca mientras se escribe contra views.product_autocomplete
+    (paginado por cursor). El HTML y la consulta no crecen con el catálogo.
+    """
+    template_name = "dispositivos/widgets/product_autocomplete.html"
+
+    class Media:
+        js = ("js/product_autocomplete.js",)
+
+    def __init__(self, device=None, attrs=None):
+        super().__init__(attrs)
+        self.device = device
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        url = reverse("dispositivos:product_autocomplete")
+        if self.device is not None and self.device.pk:
+            url += f"?device={self.device.pk}"
+        context["widget"]["autocomplete_url"] = url
+        return context
+
+    def optgroups(self, name, value, attrs=None):
+        # solo las opciones elegidas (una consulta acotada por la selección)
+        selected = [v for v in value if str(v).isdigit()]
+        if not selected:
+            return []
+        field = self.choices.field
+        options = [
+            self.create_option(name, obj.pk, field.label_from_instance(obj), True, i)
+            for i, obj in enumerate(self.choices.queryset.filter(pk__in=selected))
+        ]
+        return [(None, options, 0)]
+
+
+def assignable_products(device=None):
+    """Productos sin dispositivo, o ya asociados a device."""
+    condition = Q(device__isnull=True)
+    if device is not None and device.pk:
+        condition |= Q(device=device)
+    return Product.objects.filter(condition).select_related("device").order_by("name", "id")
+
+
 class DeviceForm(forms.ModelForm):
     products = forms.ModelMultipleChoiceField(
         queryset=Product.objects.none(),
         required=False,
         label="Productos asociados",
-        help_text="Selecciona productos existentes para asociarlos a este dispositivo.",
-        widget=forms.SelectMultiple(attrs={"size": 10})
+        help_text="Escribe el comienzo del nombre para buscar productos sin dispositivo y asociarlos.",
+        widget=ProductAutocompleteWidget,
     )
 
     class Meta:
@@ -40,26 +86,21 @@ class DeviceForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
 
         if self.instance and self.instance.pk:
-            base_qs = Product.objects.filter(
-                Q(device__isnull=True) | Q(device=self.instance)
-            ).select_related("category", "device")
             # valores iniciales: los ya asociados a este device
             self.fields["products"].initial = self.instance.products.values_list("pk", flat=True)
-        else:
-            base_qs = Product.objects.filter(device__isnull=True).select_related("category", "device")
-
-        self.fields["products"].queryset = base_qs.order_by("name")
+        # el queryset solo se usa para validar lo enviado y etiquetar lo elegido
+        self.fields["products"].queryset = assignable_products(self.instance)
+        self.fields["products"].widget.device = self.instance
+        # las etiquetas de zona incluyen la organización (Zone.__str__)
+        self.fields["zone"].queryset = Zone.objects.select_related("organization").order_by("name")
 
     def save(self, commit=True):
         # Guardamos Device primero
         device = super().save(commit=commit)
 
-        # Luego actualizamos los productos asociados
-        if "products" in self.cleaned_data:
-            selected = list(self.cleaned_data["products"].values_list("pk", flat=True))
-
-            Product.objects.filter(device=device).exclude(pk__in=selected).update(device=None)
-            Product.objects.filter(pk__in=selected).update(device=device)
+        # Luego actualizamos los productos asociados (un UPDATE con la diferencia)
+        if "products" in self.cleaned_data and device.pk:
+            assign_products(device, [p.pk for p in self.cleaned_data["products"]])
 
         return device
 
@@ -79,7 +120,7 @@ class ProductForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
         # 🔸 deja device como opcional
         self.fields["device"].required = False
-        self.fields["device"].queryset = Device.objects.select_related("zone").order_by("name")
+        self.fields["device"].queryset = Device.objects.select_related("zone", "organization").order_by("name")
         self.fields["category"].queryset = Category.objects.order_by("name")
 
 
@@ -0,0 +1,195 @@
+# dispositivos/incidents.py
+"""
+Modo incidente de las alertas (ALERT_INCIDENT_MODE).
+
+En el modo clásico cada lectura fuera de rango crea un ProductAlertEvent:
+un sensor que queda pegado en alarma escribe una fila por lectura. En modo
+incidente hay a lo más un evento abierto por regla (ProductAlert), que las
+lecturas siguientes extienden (last_seen_at, last_value, match_count,
+peak_value) con un UPDATE en vez de un INSERT; un lote de N lecturas de la
+misma regla es un solo bulk_update.
+
+- Histéresis: un incidente abierto sigue coincidiendo mientras el valor
+  esté dentro del rango ensanchado en ALERT_INCIDENT_HYSTERESIS (fracción
+  del valor absoluto de cada borde), así una señal que oscila sobre el
+  borde no abre y cierra incidentes.
+- Cierre automático tras ALERT_INCIDENT_CLOSE_AFTER_MISSES lecturas
+  seguidas fuera de la banda, o si pasó ALERT_INCIDENT_CLOSE_AFTER desde la
+  última coincidencia (al llegar la siguiente lectura, o con
+  `manage.py close_stale_incidents` para sensores que dejan de reportar).
+  Los cerrados así quedan con is_resolved=True y auto_resolved=True.
+- last_value y peak_value quedan en la unidad de la regla (la lectura se
+  convierte como en el modo clásico, ver units.py).
+- Los consumidores no cambian: un incidente es un ProductAlertEvent cuyo
+  `measurement` es la lectura que lo abrió. Los eventos clásicos existentes
+  (sin last_seen_at) no participan.
+- La restricción pae_one_open_incident garantiza un incidente abierto por
+  regla entre procesos; si otro proceso abrió el mismo incidente en paralelo,
+  se reintenta una vez y se extiende el suyo.
+
+Reprocesar un lote (cola al-menos-una-vez) no abre incidentes duplicados,
+pero puede volver a sumar sus lecturas al contador de un incidente abierto.
+"""
+from __future__ import annotations
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import dashboard_cache
+from .models import ProductAlertEvent
+from .units import conversion, convert
+
+UPDATE_FIELDS = [
+    "last_seen_at", "last_value", "last_measurement_id", "peak_value",
+    "match_count", "miss_count", "is_resolved", "resolved_at", "auto_resolved", "updated_at",
+]
+OPEN_INCIDENT = Q(is_resolved=False, last_seen_at__isnull=False)
+
+
+def is_enabled() -> bool:
+    return getattr(settings, "ALERT_INCIDENT_MODE", False)
+
+
+def _hysteresis() -> float:
+    return getattr(settings, "ALERT_INCIDENT_HYSTERESIS", 0.02)
+
+
+def _max_misses() -> int:
+    return getattr(settings, "ALERT_INCIDENT_CLOSE_AFTER_MISSES", 3)
+
+
+def _close_after() -> Optional[timedelta]:
+    return getattr(settings, "ALERT_INCIDENT_CLOSE_AFTER", timedelta(minutes=30))
+
+
+def _peak(current: Optional[float], value: float, lo: float, hi: float) -> float:
+    """Valor más alejado del centro del rango (el 'peor' visto)."""
+    if current is None:
+        return value
+    center = (lo + hi) / 2
+    return value if abs(value - center) > abs(current - center) else current
+
+
+def _close(incident: ProductAlertEvent, now) -> None:
+    incident.is_resolved = True
+    incident.resolved_at = now
+    incident.auto_resolved = True
+
+
+def evaluate(measurements: Iterable, rules_by_product: Dict[int, "CompiledRules"]) -> List[ProductAlertEvent]:
+    """
+    Aplica las mediciones a los incidentes de sus reglas. Retorna los
+    incidentes abiertos en esta llamada (los extendidos solo se actualizan).
+    """
+    measurements = list(measurements)
+    for attempt in (1, 2):
+        try:
+            with transaction.atomic():
+                return _evaluate(measurements, rules_by_product)
+        except IntegrityError:
+            if attempt == 2:
+                raise
+
+
+def _evaluate(measurements, rules_by_product) -> List[ProductAlertEvent]:
+    from .services import _norm_unit
+
+    rules = {pid: list(compiled.rules()) for pid, compiled in rules_by_product.items() if compiled}
+    rule_ids = [rule[0] for items in rules.values() for rule in items]
+    measurements = sorted((m for m in measurements if m.product_id in rules), key=lambda m: (m.measured_at, m.pk))
+    if not measurements:
+        return []
+
+    # Una consulta: incidentes abiertos de las reglas y eventos ya creados por
+    # estas mediciones (para no reabrir al reprocesar).
+    open_by_rule, seen = {}, set()
+    for event in (
+        ProductAlertEvent.objects.select_for_update()
+        .filter((Q(product_alert_id__in=rule_ids) & OPEN_INCIDENT) | Q(measurement_id__in=[m.pk for m in measurements]))
+    ):
+        seen.add((event.product_alert_id, event.measurement_id))
+        if not event.is_resolved and event.last_seen_at is not None:
+            open_by_rule[event.product_alert_id] = event
+
+    hysteresis, max_misses, close_after = _hysteresis(), _max_misses(), _close_after()
+    now = timezone.now()
+    created, changed = [], {}
+    for m in measurements:
+        unit = _norm_unit(m.unit)
+        for rule_id, rule_unit, lo, hi in rules[m.product_id]:
+            factors = conversion(unit, rule_unit)
+            if factors is None:
+                continue
+            # valores del incidente (last/peak) en la unidad de la regla
+            value = convert(m.value, factors)
+            if (rule_id, m.pk) in seen:
+                continue
+            incident = open_by_rule.get(rule_id)
+            if incident is not None and close_after and m.measured_at - incident.last_seen_at > close_after:
+                _close(incident, now)
+                changed[id(incident)] = incident
+                del open_by_rule[rule_id]
+                incident = None
+
+            if incident is not None:
+                late = m.measured_at < incident.last_seen_at
+                if lo - abs(lo) * hysteresis <= value <= hi + abs(hi) * hysteresis:
+                    incident.match_count += 1
+                    incident.peak_value = _peak(incident.peak_value, value, lo, hi)
+                    if not late:
+                        incident.miss_count = 0
+                        incident.last_seen_at = m.measured_at
+                        incident.last_value = value
+                        incident.last_measurement_id = m.pk
+                elif not late:
+                    incident.miss_count += 1
+                    if incident.miss_count >= max_misses:
+                        _close(incident, now)
+                        del open_by_rule[rule_id]
+                else:
+                    continue
+                changed[id(incident)] = incident
+            elif lo <= value <= hi:
+                incident = ProductAlertEvent(
+                    product_alert_id=rule_id, measurement_id=m.pk, is_resolved=False,
+                    last_seen_at=m.measured_at, last_value=value, last_measurement_id=m.pk,
+                    peak_value=value, match_count=1, miss_count=0,
+                )
+                open_by_rule[rule_id] = incident
+                created.append(incident)
+
+    # los abiertos en este lote se insertan ya con su estado final
+    created_ids = {id(e) for e in created}
+    to_update = [e for key, e in changed.items() if key not in created_ids]
+    # primero los cierres: un incidente nuevo de la misma regla violaría
+    # pae_one_open_incident si el viejo siguiera abierto
+    if to_update:
+        for e in to_update:
+            e.updated_at = now
+        ProductAlertEvent.objects.bulk_update(to_update, UPDATE_FIELDS)
+    if created:
+        ProductAlertEvent.objects.bulk_create(created)
+    if created or to_update:
+        # bulk_create / bulk_update no disparan post_save
+        dashboard_cache.bump(*dashboard_cache.sections_for_model(ProductAlertEvent._meta.label))
+    return created
+
+
+def close_stale(now=None) -> int:
+    """Cierra los incidentes sin coincidencias desde hace ALERT_INCIDENT_CLOSE_AFTER. Retorna cuántos."""
+    close_after = _close_after()
+    if not close_after:
+        return 0
+    now = now or timezone.now()
+    closed = (
+        ProductAlertEvent.objects
+        .filter(OPEN_INCIDENT, last_seen_at__lt=now - close_after)
+        .update(is_resolved=True, resolved_at=now, auto_resolved=True, updated_at=now)
+    )
+    if closed:
+        dashboard_cache.bump(*dashboard_cache.sections_for_model(ProductAlertEvent._meta.label))
+    return closed
@@ -0,0 +1,112 @@
+# dispositivos/latest.py
+"""
+Mantención de LatestMeasurement (última lectura por producto).
+
+Se actualiza en la ingesta (señal y bulk) con protección de orden: una
+lectura atrasada (measured_at más antiguo que el guardado) no pisa la
+vigente. Con empate de measured_at gana el id mayor.
+
+Al borrar (soft o físico) la lectura vigente, refresh_after_delete la
+recalcula desde Measurement.objects (solo vivas); si el producto queda sin
+lecturas, su fila se elimina.
+"""
+from __future__ import annotations
+from typing import Iterable
+
+from django.db import IntegrityError, transaction
+
+from .models import LatestMeasurement, Measurement
+from . import dashboard_cache, live, partitions
+
+
+def _newer(a_at, a_pk, b_at, b_pk) -> bool:
+    return (a_at, a_pk or 0) > (b_at, b_pk or 0)
+
+
+def update_latest(measurements: Iterable[Measurement]) -> None:
+    """Aplica un lote de mediciones nuevas a latest_measurement."""
+    newest = {}
+    for m in measurements:
+        if not m.product_id:
+            continue
+        cur = newest.get(m.product_id)
+        if cur is None or _newer(m.measured_at, m.pk, cur.measured_at, cur.pk):
+            newest[m.product_id] = m
+    if not newest:
+        return
+
+    # Igual que los rollups: si otro escritor crea la fila en paralelo, se
+    # reintenta una vez ya como UPDATE.
+    for attempt in range(2):
+        try:
+            with transaction.atomic():
+                _merge(newest)
+            return
+        except IntegrityError:
+            if attempt:
+                raise
+
+
+def _merge(newest: dict) -> None:
+    existing = {
+        row.product_id: row
+        for row in LatestMeasurement.objects.select_for_update().filter(product_id__in=newest)
+    }
+    to_update, to_create = [], []
+    for product_id, m in newest.items():
+        row = existing.get(product_id)
+        if row is None:
+            to_create.append(LatestMeasurement(
+                product_id=product_id, measurement_id=m.pk,
+                value=m.value, unit=m.unit, measured_at=m.measured_at,
+            ))
+        elif _newer(m.measured_at, m.pk, row.measured_at, row.measurement_id):
+            row.measurement_id, row.value, row.unit, row.measured_at = m.pk, m.value, m.unit, m.measured_at
+            to_update.append(row)
+    if to_update:
+        LatestMeasurement.objects.bulk_update(to_update, ["measurement", "value", "unit", "measured_at"])
+    if to_create:
+        LatestMeasurement.objects.bulk_create(to_create)
+    if to_update or to_create:
+        # bulk_* no dispara señales
+        dashboard_cache.bump(*dashboard_cache.sections_for_model(LatestMeasurement._meta.label))
+        live.publish_readings(to_update + to_create)
+
+
+def _newest(product_id: int):
+    """Última lectura viva, en la tabla caliente o en una partición mensual."""
+    page = partitions.paginate_measurements(
+        Measurement.objects.filter(product_id=product_id), None, 1, {"product_id": product_id}
+    )
+    return page.object_list[0] if page.object_list else None
+
+
+def refresh_after_delete(pks: Iterable[int], hard: bool = False, chunk_size: int = 500) -> int:
+    """
+    Recalcula las filas cuya lectura vigente está entre los pks borrados (en
+    un borrado físico, SET_NULL ya dejó measurement en NULL). Retorna los
+    productos recalculados.
+    """
+    pks = list(pks)
+    stale = set()
+    if hard:
+        stale.update(LatestMeasurement.objects.filter(measurement__isnull=True).values_list("product_id", flat=True))
+    for i in range(0, len(pks), chunk_size):
+        stale.update(
+            LatestMeasurement.objects.filter(measurement_id__in=pks[i:i + chunk_size])
+            .values_list("product_id", flat=True)
+        )
+    if not stale:
+        return 0
+    with transaction.atomic():
+        for row in LatestMeasurement.objects.select_for_update().filter(product_id__in=stale):
+            m = _newest(row.product_id)
+            if m is None:
+                row.delete()
+                continue
+            # una fila de partición no es una Measurement: queda sin FK
+            row.measurement_id = None if m._state.adding else m.pk
+            row.value, row.unit, row.measured_at = m.value, m.unit, m.measured_at
+            row.save()
+    dashboard_cache.bump(*dashboard_cache.sections_for_model(LatestMeasurement._meta.label))
+    return len(stale)
@@ -0,0 +1,238 @@
+# dispositivos/live.py
+"""
+Feed en vivo (Server-Sent Events) de eventos de alerta y últimas lecturas
+por organización.
+
+- La ingesta y la evaluación de alertas llaman a publish_readings /
+  publish_events; se publica al confirmar la transacción, con una sola
+  consulta (producto -> organización) por lote, y solo si hay alguien
+  suscrito. Los suscriptores no consultan la base: un write llega a N
+  clientes sin N consultas.
+- broker (en proceso): una asyncio.Queue acotada por suscriptor; si un
+  cliente lento la llena se descarta lo más viejo.
+- Varios procesos: con LIVE_BROKER_DIR cada proceso que tiene suscriptores
+  escucha en un socket Unix de datagramas <dir>/<pid>.sock y quien publica
+  envía el mensaje a todos los sockets del directorio (los de procesos
+  muertos se borran al fallar el envío). Sin servidor aparte ni Redis.
+  Cuando se va el último suscriptor local el socket se borra (los demás
+  dejan de enviarle) y el hilo receptor lo cierra y termina.
+
+El endpoint (views.live_feed) necesita un servidor ASGI
+(`uvicorn monitoreo.asgi:application`); bajo WSGI cada cliente ocuparía un
+worker mientras dure la conexión.
+"""
+from __future__ import annotations
+import asyncio
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from typing import Iterable, Optional
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+ALL = "*"  # clave de suscripción a todas las organizaciones
+_MAX_DATAGRAM_ITEMS = 200
+_RECV_TIMEOUT = 1.0  # cada cuánto el receptor revisa si su socket sigue vigente
+_MAX_BACKOFF = 5.0   # espera máxima entre reintentos tras un error del socket
+
+
+class Broker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}  # clave -> {(loop, queue)}
+        self._sock: Optional[socket.socket] = None
+        self._sock_path: Optional[str] = None
+
+    # ---- suscripción (lado async) ----
+    def subscribe(self, key) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=getattr(settings, "LIVE_FEED_QUEUE_SIZE", 500))
+        with self._lock:
+            self._subscribers.setdefault(key, set()).add((asyncio.get_running_loop(), queue))
+        self._listen()
+        return queue
+
+    def unsubscribe(self, key, queue: asyncio.Queue) -> None:
+        with self._lock:
+            subs = self._subscribers.get(key, set())
+            subs.difference_update({s for s in subs if s[1] is queue})
+            if not subs:
+                self._subscribers.pop(key, None)
+            if not self._subscribers:
+                self._detach()
+
+    def _detach(self) -> None:
+        """Desvincula el socket (con el lock tomado); el hilo receptor lo cierra."""
+        if self._sock_path is not None:
+            _unlink_quietly(self._sock_path)
+        self._sock = self._sock_path = None
+
+    def has_local_subscribers(self) -> bool:
+        return bool(self._subscribers)
+
+    # ---- entrega ----
+    def deliver(self, message: dict) -> None:
+        """Entrega local (thread-safe) a los suscriptores de la organización y a los de ALL."""
+        with self._lock:
+            targets = list(self._subscribers.get(message.get("organization"), ())) + list(self._subscribers.get(ALL, ()))
+        for loop, queue in targets:
+            try:
+                loop.call_soon_threadsafe(_put_dropping_oldest, queue, message)
+            except RuntimeError:
+                pass  # loop cerrado: el suscriptor se está yendo
+
+    # ---- multiproceso ----
+    def _directory(self) -> Optional[str]:
+        return getattr(settings, "LIVE_BROKER_DIR", None)
+
+    def _listen(self) -> None:
+        directory = self._directory()
+        if not directory or self._sock is not None:
+            return
+        with self._lock:
+            if self._sock is not None:
+                return
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"{os.getpid()}.sock")
+            if os.path.exists(path):
+                os.unlink(path)
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            sock.bind(path)
+            sock.settimeout(_RECV_TIMEOUT)
+            self._sock, self._sock_path = sock, path
+        threading.Thread(target=self._receive, args=(sock,), name="live-broker", daemon=True).start()
+
+    def _receive(self, sock: socket.socket) -> None:
+        """Recibe hasta que el socket deja de ser el vigente; ante errores espera cada vez más."""
+        delay = 0.0
+        try:
+            while self._sock is sock:
+                try:
+                    data = sock.recv(1 << 20)
+                except socket.timeout:
+                    continue
+                except OSError:
+                    if self._sock is not sock:
+                        break
+                    delay = min(max(delay * 2, 0.05), _MAX_BACKOFF)
+                    logger.exception("Error leyendo el socket del broker en vivo; reintento en %.2fs", delay)
+                    time.sleep(delay)
+                    continue
+                delay = 0.0
+                try:
+                    for message in json.loads(data):
+                        self.deliver(message)
+                except Exception:
+                    logger.exception("Mensaje inválido en el broker en vivo")
+        finally:
+            sock.close()
+
+    def has_remote_subscribers(self) -> bool:
+        directory = self._directory()
+        if not directory or not os.path.isdir(directory):
+            return False
+        return any(name.endswith(".sock") and name != f"{os.getpid()}.sock" for name in os.listdir(directory))
+
+    def fan_out(self, messages: list) -> None:
+        """Entrega local y envía a los demás procesos (en datagramas acotados)."""
+        for message in messages:
+            self.deliver(message)
+        directory = self._directory()
+        if not directory or not self.has_remote_subscribers():
+            return
+        chunks = [
+            json.dumps(messages[i:i + _MAX_DATAGRAM_ITEMS], cls=DjangoJSONEncoder).encode()
+            for i in range(0, len(messages), _MAX_DATAGRAM_ITEMS)
+        ]
+        own = f"{os.getpid()}.sock"
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sender:
+            for name in os.listdir(directory):
+                if not name.endswith(".sock") or name == own:
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    for chunk in chunks:
+                        sender.sendto(chunk, path)
+                except (ConnectionRefusedError, FileNotFoundError):
+                    _unlink_quietly(path)  # proceso muerto
+                except OSError:
+                    logger.warning("No se pudo enviar al socket %s", path, exc_info=True)
+
+
+def _put_dropping_oldest(queue: asyncio.Queue, message: dict) -> None:
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(message)
+
+
+def _unlink_quietly(path: str) -> None:
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+broker = Broker()
+
+
+def is_enabled() -> bool:
+    return getattr(settings, "LIVE_FEED_ENABLED", True)
+
+
+def _listening() -> bool:
+    return is_enabled() and (broker.has_local_subscribers() or broker.has_remote_subscribers())
+
+
+def _publish(kind: str, items: list) -> None:
+    if not items or not _listening():
+        return
+
+    def _do():
+        from .models import Product
+        product_ids = {item["product_id"] for item in items}
+        info = {
+            pk: (name, org_id, device_name)
+            for pk, name, org_id, device_name in Product.all_objects
+            .filter(pk__in=product_ids)
+            .values_list("pk", "name", "device__organization_id", "device__name")
+        }
+        messages = []
+        for item in items:
+            name, org_id, device_name = info.get(item["product_id"], (None, None, None))
+            messages.append(dict(item, type=kind, organization=org_id, product=name, device=device_name))
+        broker.fan_out(json.loads(json.dumps(messages, cls=DjangoJSONEncoder)))
+
+    transaction.on_commit(_do)
+
+
+def publish_readings(readings: Iterable) -> None:
+    """readings: LatestMeasurement (o filas con product_id, value, unit, measured_at)."""
+    _publish("reading", [
+        {"product_id": r.product_id, "value": r.value, "unit": r.unit, "measured_at": r.measured_at}
+        for r in readings
+    ])
+
+
+def publish_events(events: Iterable, measurements: dict, rules_by_product: dict) -> None:
+    """events: ProductAlertEvent nuevos; measurements: id -> Measurement; reglas compiladas por producto."""
+    if not _listening():
+        return
+    severities = {}
+    for rules in rules_by_product.values():
+        severities.update(rules.severities)
+    items = []
+    for e in events:
+        m = measurements.get(e.measurement_id)
+        if m is None:
+            continue
+        items.append({
+            "id": e.pk, "product_id": m.product_id, "severity": severities.get(e.product_alert_id),
+            "value": m.value, "unit": m.unit, "measured_at": m.measured_at,
+        })
+    _publish("alert", items)
@@ -0,0 +1,51 @@
+import signal
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from dispositivos.alert_queue import queue_stats, run_workers
+
+
+class Command(BaseCommand):
+    help = "Drena la cola de evaluación diferida de alertas (ALERT_EVALUATION_ASYNC)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int,
+                            default=getattr(settings, "ALERT_WORKER_CONCURRENCY", 2))
+        parser.add_argument("--batch-size", type=int,
+                            default=getattr(settings, "ALERT_WORKER_BATCH_SIZE", 500))
+        parser.add_argument("--poll-interval", type=float, default=1.0)
+        parser.add_argument("--once", action="store_true", help="Termina cuando la cola queda vacía.")
+        parser.add_argument("--stats", action="store_true", help="Solo muestra profundidad, atraso y fallidas.")
+
+    def handle(self, *args, **opts):
+        if opts["stats"]:
+            stats = queue_stats()
+            self.stdout.write(
+                f"depth={stats['depth']} lag_seconds={stats['lag_seconds']:.1f} failed={stats['failed']}"
+            )
+            return
+
+        stop = threading.Event()
+        if threading.current_thread() is threading.main_thread():
+            # SIGTERM (systemd, docker stop): mismo apagado ordenado que Ctrl-C
+            signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+        t0 = time.perf_counter()
+        try:
+            processed = run_workers(
+                concurrency=opts["concurrency"],
+                batch_size=opts["batch_size"],
+                once=opts["once"],
+                poll_interval=opts["poll_interval"],
+                stop=stop,
+            )
+        except KeyboardInterrupt:
+            # run_workers ya activó stop y esperó a que los hilos terminen su lote
+            self.stdout.write("Workers detenidos.")
+            return
+        elapsed = time.perf_counter() - t0
+        self.stdout.write(self.style.SUCCESS(
+            f"{processed} mediciones evaluadas en {elapsed:.2f}s"
+        ))
@@ -0,0 +1,63 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+
+from dispositivos import archive, partitions
+from dispositivos.models import Measurement, MeasurementPartition
+
+
+def _parse_month(value):
+    try:
+        year, month = value.split("-")
+        return date(int(year), int(month), 1)
+    except ValueError:
+        raise CommandError(f"Mes inválido: {value} (formato AAAA-MM)")
+
+
+class Command(BaseCommand):
+    help = (
+        "Escribe el archivo columnar (NumPy, memmap) de mediciones por producto y "
+        "mes en MEASUREMENT_ARCHIVE_DIR. Sin --month archiva los meses cerrados "
+        "que aún no están archivados; --force los regenera."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--month", action="append", dest="months", type=_parse_month,
+                            help="Mes a archivar, AAAA-MM (repetible).")
+        parser.add_argument("--product", type=int, action="append", dest="products",
+                            help="Limita a estos productos (repetible).")
+        parser.add_argument("--force", action="store_true", help="Reescribe los meses ya archivados.")
+        parser.add_argument("--chunk-size", type=int, default=5000)
+
+    def handle(self, *args, **opts):
+        months = opts["months"] or self._closed_months()
+        total = 0
+        t0 = time.perf_counter()
+        for month in sorted(set(months)):
+            written = archive.archive_month(month, opts["products"], skip_existing=not opts["force"],
+                                            chunk_size=opts["chunk_size"])
+            rows = sum(written.values())
+            total += rows
+            self.stdout.write(f"{month:%Y-%m}: {len(written)} productos, {rows} mediciones")
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} mediciones archivadas en {time.perf_counter() - t0:.2f}s ({archive.archive_dir()})"
+        ))
+
+    def _closed_months(self):
+        """Desde el mes de la medición más antigua (caliente o particionada) hasta el mes anterior al actual."""
+        oldest = [d for d in (
+            Measurement.objects.aggregate(m=Min("measured_at"))["m"],
+            MeasurementPartition.objects.aggregate(m=Min("month"))["m"],
+        ) if d is not None]
+        if not oldest:
+            return []
+        month = min(partitions.month_start(d) for d in oldest)
+        current = partitions.month_start(timezone.now())
+        months = []
+        while month < current:
+            months.append(month)
+            month = partitions.next_month(month)
+        return months
@@ -0,0 +1,72 @@
+import random
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from dispositivos.engine import RuleTable, evaluate
+from dispositivos.rules import CompiledRules
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara el loop por fila (CompiledRules.match) con el motor vectorizado "
+        "(engine.evaluate) sobre datos sintéticos en memoria. No toca la BD."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", nargs="+", type=int, default=[1_000, 100_000, 1_000_000])
+        parser.add_argument("--products", type=int, default=1_000)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **opts):
+        rnd = random.Random(opts["seed"])
+        n_products = opts["products"]
+
+        # 3 severidades por producto; ~10% de reglas sin unidad (comodín)
+        rules, rule_id = [], 0
+        for pid in range(1, n_products + 1):
+            unit = rnd.choice(["c", "kw", "v"])
+            for lo, hi in ((70, 80), (81, 90), (91, 9_999_999)):
+                rule_id += 1
+                rules.append((rule_id, pid, "" if rnd.random() < 0.1 else unit, lo, hi))
+
+        by_product = {}
+        for rid, pid, unit, lo, hi in rules:
+            by_product.setdefault(pid, []).append((rid, unit, lo, hi))
+        compiled = {pid: CompiledRules(items) for pid, items in by_product.items()}
+
+        table = RuleTable(rules)
+        self.stdout.write(
+            f"{'filas':>10} {'loop (s)':>10} {'numpy (s)':>10} {'+conv (s)':>10} {'speedup':>8} {'pares':>10}"
+        )
+        for size in opts["sizes"]:
+            pids = [rnd.randint(1, n_products) for _ in range(size)]
+            vals = [rnd.uniform(0, 120) for _ in range(size)]
+            units = [rnd.choice(["c", "kw", "v", "f"]) for _ in range(size)]
+
+            t0 = time.perf_counter()
+            loop_pairs = []
+            for i in range(size):
+                for rid in compiled[pids[i]].match(vals[i], units[i]):
+                    loop_pairs.append((i, rid))
+            t_loop = time.perf_counter() - t0
+
+            # conversión listas -> arreglos (en producción se paga una vez por lote)
+            t0 = time.perf_counter()
+            a_pids = np.asarray(pids, dtype=np.int64)
+            a_vals = np.asarray(vals, dtype=np.float64)
+            a_units = table.encode_units(units)
+            t_conv = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            meas_idx, rule_ids = evaluate(table, a_pids, a_vals, a_units)
+            t_np = time.perf_counter() - t0
+
+            np_pairs = set(zip(meas_idx.tolist(), rule_ids.tolist()))
+            if np_pairs != set(loop_pairs):
+                self.stderr.write(self.style.ERROR(f"Resultados distintos con {size} filas"))
+            self.stdout.write(
+                f"{size:>10} {t_loop:>10.3f} {t_np:>10.3f} {t_np + t_conv:>10.3f} "
+                f"{t_loop / max(t_np, 1e-9):>7.1f}x {len(loop_pairs):>10}"
+            )
@@ -0,0 +1,136 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, transaction
+from django.db.models import Count
+
+from dispositivos.models import Alert, Category, Measurement, Product, ProductAlert, ProductAlertEvent
+from dispositivos.services import _insert_events
+
+STRATEGIES = ("get_or_create", "insert_ignore")
+_MAX_ATTEMPTS = 50
+
+
+def _write_get_or_create(pairs):
+    created = 0
+    for rule_id, m_id in pairs:
+        _, was_created = ProductAlertEvent.objects.get_or_create(
+            product_alert_id=rule_id, measurement_id=m_id, defaults={"is_resolved": False},
+        )
+        created += was_created
+    return created
+
+
+def _write_insert_ignore(pairs):
+    return len(_insert_events(pairs))
+
+
+WRITERS = {"get_or_create": _write_get_or_create, "insert_ignore": _write_insert_ignore}
+
+
+class Command(BaseCommand):
+    help = (
+        "Prueba de estrés de escritura de eventos de alerta: varios hilos escriben "
+        "los mismos pares (regla, medición) con get_or_create (camino anterior) y con "
+        "INSERT que ignora conflictos; informa duplicados, eventos reportados como "
+        "nuevos y pares/s. Crea un producto temporal y lo borra al terminar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=4)
+        parser.add_argument("--measurements", type=int, default=2000)
+        parser.add_argument("--chunk-size", type=int, default=200)
+        parser.add_argument("--strategies", nargs="+", choices=STRATEGIES, default=list(STRATEGIES))
+
+    def handle(self, *args, **opts):
+        category = Category.objects.create(name="bench-event-writes")
+        product = Product.objects.create(name="bench-event-writes", category=category)
+        try:
+            self.results = self._run(product, opts)
+        finally:
+            # hard delete en cascada: reglas, mediciones y eventos del benchmark
+            Product.all_objects.filter(pk=product.pk).hard_delete()
+            Category.all_objects.filter(pk=category.pk).hard_delete()
+
+    def _run(self, product, opts):
+        # una regla por severidad (ProductAlert es único por producto y alerta), todas coinciden
+        rule_ids = [
+            ProductAlert.objects.create(
+                product=product, alert=Alert.objects.get_or_create(severity=severity, defaults={"message": label})[0],
+                range_min=0, range_max=100, unit="",
+            ).pk
+            for severity, label in Alert.SEVERITIES
+        ]
+        measurements = Measurement.objects.bulk_create([
+            Measurement(product=product, value=50, unit="", measured_at=product.created_at)
+            for _ in range(opts["measurements"])
+        ])
+        pairs = [(rule_id, m.pk) for m in measurements for rule_id in rule_ids]
+        chunks = [pairs[i:i + opts["chunk_size"]] for i in range(0, len(pairs), opts["chunk_size"])]
+
+        self.stdout.write(
+            f"{'estrategia':>14} {'hilos':>6} {'pares':>8} {'seg':>8} {'pares/s':>10} {'duplicados':>11} {'reportados':>11}"
+        )
+        results = {}
+        for strategy in opts["strategies"]:
+            ProductAlertEvent.all_objects.filter(product_alert_id__in=rule_ids).hard_delete()
+            reported, errors = self._stress(WRITERS[strategy], chunks, opts["threads"])
+            elapsed = self._elapsed
+            rows = ProductAlertEvent.all_objects.filter(product_alert_id__in=rule_ids)
+            duplicates = sum(
+                n - 1 for n in rows.values("product_alert_id", "measurement_id")
+                .annotate(n=Count("id")).values_list("n", flat=True)
+            )
+            results[strategy] = {
+                "threads": opts["threads"], "pairs": len(pairs), "seconds": round(elapsed, 4),
+                "pairs_per_second": round(len(pairs) * opts["threads"] / max(elapsed, 1e-9), 1),
+                "rows": rows.count(), "duplicates": duplicates, "reported": reported, "retries": errors,
+            }
+            r = results[strategy]
+            self.stdout.write(
+                f"{strategy:>14} {r['threads']:>6} {r['pairs']:>8} {r['seconds']:>8.3f} "
+                f"{r['pairs_per_second']:>10.1f} {r['duplicates']:>11} {r['reported']:>11}"
+            )
+            if errors:
+                self.stderr.write(self.style.WARNING(f"{strategy}: {errors} reintento(s) por bloqueo"))
+        if len(results) == 2:
+            gain = results["insert_ignore"]["pairs_per_second"] / max(results["get_or_create"]["pairs_per_second"], 1e-9)
+            self.stdout.write(self.style.SUCCESS(f"insert_ignore / get_or_create: {gain:.1f}x"))
+        return results
+
+    def _stress(self, writer, chunks, threads):
+        """Cada hilo escribe todos los tramos (solapamiento total); retorna (reportados, reintentos)."""
+        reported, errors = [0], [0]
+        lock = threading.Lock()
+        start = threading.Barrier(threads)
+
+        def work(offset):
+            mine = errs = 0
+            try:
+                start.wait()
+                # cada hilo empieza en un tramo distinto para que choquen en el medio
+                for chunk in chunks[offset:] + chunks[:offset]:
+                    for attempt in range(_MAX_ATTEMPTS):
+                        try:
+                            with transaction.atomic():
+                                mine += writer(chunk)
+                            break
+                        except OperationalError:
+                            # SQLite: otro hilo tiene el lock de escritura; se reintenta el tramo
+                            errs += 1
+                            time.sleep(0.001 * 2 ** min(attempt, 6))
+            finally:
+                connection.close()
+            with lock:
+                reported[0] += mine
+                errors[0] += errs
+
+        workers = [threading.Thread(target=work, args=(i * len(chunks) // threads,)) for i in range(threads)]
+        t0 = time.perf_counter()
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        self._elapsed = time.perf_counter() - t0
+        return reported[0], errors[0]
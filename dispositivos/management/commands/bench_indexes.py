@@ -0,0 +1,115 @@
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from dispositivos.models import Device, Measurement, Product, ProductAlertEvent
+from dispositivos.seed import seed_fleet
+
+# Índices de 0008_live_partial_indexes (tabla, nombre)
+NEW_INDEXES = [
+    ("device", "device_live_name_idx"),
+    ("product", "product_live_name_idx"),
+    ("measurement", "meas_live_prod_time_idx"),
+    ("measurement", "meas_live_time_idx"),
+    ("product_alert_event", "pae_live_time_idx"),
+    ("product_alert_event", "pae_open_time_idx"),
+    ("product_alert_event", "pae_live_rule_time_idx"),
+]
+
+
+def view_queries():
+    """Las consultas de dispositivos/views.py que los índices deben cubrir."""
+    product = Product.objects.order_by("pk").first()
+    since = timezone.now() - timedelta(days=7)
+    return [
+        ("measurement_list", Measurement.objects.order_by("-measured_at", "-id")[:51]),
+        ("measurement_list?product", Measurement.objects.filter(product=product).order_by("-measured_at", "-id")[:51]),
+        ("product_detail.measurements", product.measurements.order_by("-measured_at", "-id")[:21]),
+        ("product_detail.events", ProductAlertEvent.objects.filter(product_alert__product=product)
+         .order_by("-created_at")[:10]),
+        ("alert_list", ProductAlertEvent.objects.filter(is_resolved=False).order_by("-created_at", "-id")[:51]),
+        ("alert_list?show=all", ProductAlertEvent.objects.order_by("-created_at", "-id")[:51]),
+        ("dashboard.recent_events", ProductAlertEvent.objects.order_by("-created_at")[:6]),
+        ("dashboard.sev_map", ProductAlertEvent.objects.filter(created_at__gte=since)
+         .values("product_alert__alert__severity").annotate(n=Count("id"))),
+        ("product_list", Product.objects.order_by("name", "id")[:26]),
+        ("device_list", Device.objects.order_by("name", "id")[:26]),
+    ]
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Muestra planes (EXPLAIN) y tiempos de las consultas de las vistas con y sin "
+        "los índices parciales/compuestos. Siembra un dataset sintético y quita los "
+        "índices dentro de una transacción que se revierte: la BD queda intacta."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=200)
+        parser.add_argument("--per-product", type=int, default=500, help="Mediciones por producto.")
+        parser.add_argument("--repeat", type=int, default=20, help="Ejecuciones por consulta (se usa la mediana).")
+        parser.add_argument("--no-seed", action="store_true", help="Usa los datos existentes.")
+        parser.add_argument("--plans", action="store_true", help="Imprime el plan completo de cada consulta.")
+
+    def handle(self, *args, **opts):
+        try:
+            with transaction.atomic():
+                if opts["no_seed"] and not Product.objects.exists():
+                    raise CommandError("No hay productos; quite --no-seed para sembrar datos.")
+                if not opts["no_seed"]:
+                    counts = seed_fleet(
+                        products=opts["products"], measurements=opts["products"] * opts["per_product"],
+                        deleted_ratio=0.05, prefix=f"bench-{int(time.time())}", derived=False,
+                    )
+                    self.stdout.write("Dataset: " + ", ".join(f"{k}={v}" for k, v in counts.items()))
+                self._analyze()
+                after = self._measure(opts)
+                # DDL crudo (no el schema editor): en SQLite éste no corre dentro de atomic()
+                template = connection.schema_editor().sql_delete_index
+                with connection.cursor() as cursor:
+                    for table, name in NEW_INDEXES:
+                        cursor.execute(template % {
+                            "table": connection.ops.quote_name(table), "name": connection.ops.quote_name(name),
+                        })
+                self._analyze()
+                before = self._measure(opts)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        self.stdout.write(f"\n{'consulta':<30} {'antes (ms)':>11} {'después (ms)':>13} {'mejora':>8}")
+        for name, (t_after, plan_after) in after.items():
+            t_before, plan_before = before[name]
+            self.stdout.write(
+                f"{name:<30} {t_before * 1000:>11.2f} {t_after * 1000:>13.2f} "
+                f"{t_before / max(t_after, 1e-9):>7.1f}x"
+            )
+            if opts["plans"]:
+                self.stdout.write(f"  antes:   {plan_before}")
+                self.stdout.write(f"  después: {plan_after}")
+
+    def _analyze(self):
+        # Estadísticas frescas para que el planificador elija con datos reales
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def _measure(self, opts):
+        results = {}
+        for name, qs in view_queries():
+            plan = " | ".join(line.strip() for line in qs.explain().splitlines())
+            timings = []
+            for _ in range(opts["repeat"]):
+                t0 = time.perf_counter()
+                list(qs.all())
+                timings.append(time.perf_counter() - t0)
+            results[name] = (statistics.median(timings), plan)
+        return results
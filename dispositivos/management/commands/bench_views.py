@@ -0,0 +1,179 @@
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from dispositivos.models import Measurement, Product
+from dispositivos.services import bulk_ingest_measurements
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=settings.BASE_DIR, timeout=5,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _summary(timings, queries):
+    timings = sorted(timings)
+    return {
+        "runs": len(timings),
+        "median_ms": round(statistics.median(timings) * 1000, 3),
+        "p95_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))] * 1000, 3),
+        "max_ms": round(timings[-1] * 1000, 3),
+        "queries": queries,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide las vistas principales y la ingesta sobre los datos actuales (p. ej. tras "
+        "seed_fleet) y escribe los resultados en JSON para comparar corridas. "
+        "Todo corre en una transacción que se revierte."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--ingest-batches", type=int, default=5)
+        parser.add_argument("--ingest-batch-size", type=int, default=1000)
+        parser.add_argument("--output", help="Archivo JSON (por defecto bench/results/<fecha>.json).")
+        parser.add_argument("--compare", help="JSON de una corrida anterior para mostrar diferencias.")
+
+    def handle(self, *args, **opts):
+        product = (
+            Product.objects.annotate(n=Count("measurements")).order_by("-n", "pk").first()
+        )
+        if product is None or product.device_id is None:
+            raise CommandError("No hay datos; corra antes `manage.py seed_fleet`.")
+
+        results = {}
+        try:
+            with transaction.atomic():
+                user = get_user_model().objects.create_user(username=f"bench-{int(time.time())}", password="x")
+                # Con DEBUG y ALLOWED_HOSTS vacío Django acepta localhost
+                client = Client(HTTP_HOST=(settings.ALLOWED_HOSTS or ["localhost"])[0].lstrip("."))
+                client.force_login(user)
+                urls = {
+                    "dashboard": reverse("dispositivos:dashboard"),
+                    "product_list": reverse("dispositivos:product_list"),
+                    "measurement_list": reverse("dispositivos:measurement_list"),
+                    "alert_list": reverse("dispositivos:alert_list"),
+                    "device_detail": reverse("dispositivos:device_detail", args=[product.device_id]),
+                    "product_detail": reverse("dispositivos:product_detail", args=[product.pk]),
+                }
+                for name, url in urls.items():
+                    results[name] = self._time_view(client, url, opts["repeat"], cold=True)
+                results["dashboard_warm"] = self._time_view(client, urls["dashboard"], opts["repeat"], cold=False)
+                results.update(self._time_ingest(client, product, opts))
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        report = {
+            "timestamp": timezone.now().isoformat(),
+            "git_commit": _git_commit(),
+            "database": connection.vendor,
+            "python": platform.python_version(),
+            "dataset": {
+                "products": Product.objects.count(),
+                "measurements": Measurement.objects.count(),
+            },
+            "results": results,
+        }
+        path = opts["output"] or os.path.join(
+            settings.BASE_DIR, "bench", "results", f"{timezone.now():%Y%m%d-%H%M%S}.json"
+        )
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2, ensure_ascii=False)
+
+        previous = None
+        if opts["compare"]:
+            with open(opts["compare"], encoding="utf-8") as fh:
+                previous = json.load(fh)["results"]
+        self.stdout.write(f"{'caso':<22} {'mediana (ms)':>13} {'p95 (ms)':>10} {'consultas':>10} {'vs. anterior':>13}")
+        for name, r in results.items():
+            delta = ""
+            if previous and name in previous:
+                delta = f"{r['median_ms'] / max(previous[name]['median_ms'], 1e-9):.2f}x"
+            self.stdout.write(f"{name:<22} {r['median_ms']:>13.2f} {r['p95_ms']:>10.2f} {r['queries']:>10} {delta:>13}")
+            if "rows_per_s" in r:
+                self.stdout.write(f"{'':<22} {r['rows_per_s']:>13,.0f} filas/s")
+        self.stdout.write(self.style.SUCCESS(f"Resultados en {path}"))
+
+    def _time_view(self, client, url, repeat, cold):
+        timings, queries = [], 0
+        if not cold:
+            client.get(url)  # calienta el caché
+        for _ in range(repeat):
+            if cold:
+                cache.clear()
+            with CaptureQueriesContext(connection) as ctx:
+                t0 = time.perf_counter()
+                resp = client.get(url)
+                timings.append(time.perf_counter() - t0)
+            if resp.status_code != 200:
+                raise CommandError(f"{url} respondió {resp.status_code}")
+            queries = len(ctx)
+        return _summary(timings, queries)
+
+    def _time_ingest(self, client, product, opts):
+        size = opts["ingest_batch_size"]
+        base = timezone.now()
+
+        def rows(batch):
+            return [
+                {"product_id": product.pk, "value": 20.0 + (i % 50), "unit": "°C",
+                 "measured_at": base + timedelta(seconds=batch * size + i)}
+                for i in range(size)
+            ]
+
+        out = {}
+        timings, queries = [], 0
+        for b in range(opts["ingest_batches"]):
+            batch = rows(b)
+            with CaptureQueriesContext(connection) as ctx:
+                t0 = time.perf_counter()
+                bulk_ingest_measurements(batch)
+                timings.append(time.perf_counter() - t0)
+            queries = len(ctx)
+        out["ingest_service"] = dict(_summary(timings, queries), rows_per_s=round(size / statistics.median(timings)))
+
+        url = reverse("dispositivos:measurement_bulk_ingest")
+        timings = []
+        for b in range(opts["ingest_batches"]):
+            payload = json.dumps({"measurements": [
+                {"product": r["product_id"], "value": r["value"], "unit": r["unit"],
+                 "measured_at": r["measured_at"].isoformat()}
+                for r in rows(opts["ingest_batches"] + b)
+            ]})
+            with CaptureQueriesContext(connection) as ctx:
+                t0 = time.perf_counter()
+                resp = client.post(url, payload, content_type="application/json")
+                timings.append(time.perf_counter() - t0)
+            if resp.status_code != 201:
+                raise CommandError(f"{url} respondió {resp.status_code}: {resp.content[:200]!r}")
+            queries = len(ctx)
+        out["ingest_http"] = dict(_summary(timings, queries), rows_per_s=round(size / statistics.median(timings)))
+        return out
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from dispositivos.incidents import close_stale
+
+
+class Command(BaseCommand):
+    help = (
+        "Cierra los incidentes de alerta (ALERT_INCIDENT_MODE) sin lecturas que "
+        "coincidan desde hace ALERT_INCIDENT_CLOSE_AFTER (sensores que dejaron de reportar)."
+    )
+
+    def handle(self, *args, **opts):
+        closed = close_stale()
+        self.stdout.write(self.style.SUCCESS(f"Incidentes cerrados: {closed}"))
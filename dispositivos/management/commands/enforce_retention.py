@@ -0,0 +1,75 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from dispositivos import partitions
+from dispositivos.models import MeasurementRollup
+from dispositivos.retention import (
+    compact_raw, cutoff_for, detach_old_months, drop_expired_partitions,
+    expired_raw, get_policy, purge_raw, purge_rollups,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Aplica MEASUREMENT_RETENTION: desprende meses cerrados a particiones, "
+        "compacta mediciones antiguas en rollups, las borra físicamente en lotes "
+        "(o con DROP TABLE si están particionadas) y poda rollups vencidos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--raw-days", type=int, help="Sobrescribe raw_days.")
+        parser.add_argument("--hourly-days", type=int, help="Sobrescribe hourly_rollup_days.")
+        parser.add_argument("--daily-days", type=int, help="Sobrescribe daily_rollup_days.")
+        parser.add_argument("--partition-days", type=int, help="Sobrescribe partition_after_days.")
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--sleep", type=float, default=0.0,
+                            help="Pausa (s) entre lotes para no acaparar la BD.")
+        parser.add_argument("--dry-run", action="store_true", help="Solo informa qué se borraría.")
+
+    def handle(self, *args, **opts):
+        policy = get_policy(
+            raw_days=opts["raw_days"],
+            hourly_rollup_days=opts["hourly_days"],
+            daily_rollup_days=opts["daily_days"],
+            partition_after_days=opts["partition_days"],
+        )
+        now = timezone.now()
+        raw_cutoff = cutoff_for(policy["raw_days"], now)
+        partition_cutoff = cutoff_for(policy["partition_after_days"], now)
+        rollup_cutoffs = [
+            (MeasurementRollup.HOUR, cutoff_for(policy["hourly_rollup_days"], now)),
+            (MeasurementRollup.DAY, cutoff_for(policy["daily_rollup_days"], now)),
+        ]
+
+        if opts["dry_run"]:
+            if raw_cutoff:
+                self.stdout.write(f"Mediciones antes de {raw_cutoff:%Y-%m-%d}: {expired_raw(raw_cutoff).count()}")
+                for month in partitions.expired_partitions(raw_cutoff):
+                    self.stdout.write(f"Partición {partitions.table_name(month)}: se eliminaría")
+            for gran, cutoff in rollup_cutoffs:
+                if cutoff:
+                    n = MeasurementRollup.objects.filter(granularity=gran, bucket_start__lt=cutoff).count()
+                    self.stdout.write(f"Rollups '{gran}' antes de {cutoff:%Y-%m-%d}: {n}")
+            return
+
+        t0 = time.perf_counter()
+        batch, pause = opts["batch_size"], opts["sleep"]
+        if partition_cutoff:
+            for month, moved in detach_old_months(partition_cutoff, batch).items():
+                self.stdout.write(f"Partición {partitions.table_name(month)}: {moved} filas movidas")
+        if raw_cutoff:
+            for month in drop_expired_partitions(raw_cutoff):
+                self.stdout.write(f"Partición {partitions.table_name(month)}: eliminada")
+            compacted = compact_raw(raw_cutoff)
+            purged = purge_raw(raw_cutoff, batch, pause)
+            self.stdout.write(
+                f"Mediciones: {compacted} buckets compactados, {purged} filas borradas "
+                f"(antes de {raw_cutoff:%Y-%m-%d})"
+            )
+        for gran, cutoff in rollup_cutoffs:
+            if cutoff:
+                purged = purge_rollups(gran, cutoff, batch, pause)
+                self.stdout.write(f"Rollups '{gran}': {purged} borrados (antes de {cutoff:%Y-%m-%d})")
+        self.stdout.write(self.style.SUCCESS(f"Retención aplicada en {time.perf_counter() - t0:.2f}s"))
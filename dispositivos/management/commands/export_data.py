@@ -0,0 +1,49 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from dispositivos import exports
+
+
+class Command(BaseCommand):
+    help = (
+        "Exporta mediciones o eventos de alerta a CSV o NDJSON (opcionalmente .gz) "
+        "en streaming, con memoria constante. Filtros: organización, zona, "
+        "dispositivo, producto y rango de fechas. Las mediciones exportadas en CSV "
+        "se pueden volver a cargar con import_measurements."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=sorted(exports.KINDS))
+        parser.add_argument("--output", "-o", default="-", help="Archivo destino ('-' para stdout).")
+        parser.add_argument("--format", choices=list(exports.FORMATS), help="Por defecto según la extensión.")
+        parser.add_argument("--gzip", action="store_true", help="Comprime (implícito si el archivo termina en .gz).")
+        for key in ("organization", "zone", "device", "product"):
+            parser.add_argument(f"--{key}", type=int)
+        parser.add_argument("--since", help="ISO 8601, inclusive.")
+        parser.add_argument("--until", help="ISO 8601, exclusivo.")
+
+    def handle(self, *args, **opts):
+        filters, error = exports.parse_filters(opts)
+        if error:
+            raise CommandError(error)
+        path = opts["output"]
+        fmt = opts["format"] or ("ndjson" if ".ndjson" in path or ".jsonl" in path else "csv")
+        compress = opts["gzip"] or path.endswith(".gz")
+
+        try:
+            fh = sys.stdout.buffer if path == "-" else open(path, "wb")
+        except OSError as exc:
+            raise CommandError(str(exc))
+        size = 0
+        try:
+            for chunk in exports.stream(opts["kind"], filters, fmt, compress):
+                fh.write(chunk)
+                size += len(chunk)
+        finally:
+            if fh is not sys.stdout.buffer:
+                fh.close()
+            else:
+                fh.flush()
+        # el resumen va a stderr para no mezclarse con los datos en stdout
+        self.stderr.write(self.style.SUCCESS(f"Exportado {opts['kind']} ({fmt}{', gzip' if compress else ''}): {size:,} bytes"))
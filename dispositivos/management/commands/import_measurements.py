@@ -0,0 +1,197 @@
+import csv
+import gzip
+import io
+import json
+import math
+import sys
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+
+from dispositivos.models import Product
+from dispositivos.services import bulk_ingest_measurements, evaluate_measurements_by_pk_range
+
+
+class ProductLookup:
+    """
+    Resuelve productos por número de serie (o por id) con caché en memoria.
+    Lo desconocido se consulta una vez por lote y también se recuerdan los
+    inexistentes para no volver a preguntar.
+    """
+
+    def __init__(self):
+        self._by_serial = {}
+        self._ids = {}
+
+    @staticmethod
+    def _key(record):
+        if not isinstance(record, dict):
+            return None, None
+        if record.get("product"):
+            try:
+                return "id", int(record["product"])
+            except (TypeError, ValueError):
+                return None, None
+        return "serial", str(record.get("serial_number") or "").strip() or None
+
+    def prefetch(self, records):
+        serials, ids = set(), set()
+        for record in records:
+            kind, key = self._key(record)
+            if kind == "serial" and key not in self._by_serial:
+                serials.add(key)
+            elif kind == "id" and key not in self._ids:
+                ids.add(key)
+        if serials:
+            found = dict(
+                Product.objects
+                .filter(serial_number__in=serials)
+                .order_by("serial_number", "-pk")
+                .values_list("serial_number", "pk")
+            )
+            self._by_serial.update({s: found.get(s) for s in serials})
+        if ids:
+            found = set(Product.objects.filter(pk__in=ids).values_list("pk", flat=True))
+            self._ids.update({pk: pk if pk in found else None for pk in ids})
+
+    def resolve(self, record):
+        kind, key = self._key(record)
+        if kind == "serial":
+            return self._by_serial.get(key)
+        if kind == "id":
+            return self._ids.get(key)
+        return None
+
+
+def _pk_runs(pks, runs):
+    """Agrega a runs los tramos [lo, hi] de pks consecutivos (memoria por tramo, no por fila)."""
+    for pk in sorted(pks):
+        if runs and runs[-1][1] == pk - 1:
+            runs[-1][1] = pk
+        else:
+            runs.append([pk, pk])
+
+
+def _open(path):
+    if path == "-":
+        return io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8")
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, "r", encoding="utf-8", newline="")
+
+
+def _iter_records(fh, fmt):
+    """Genera un dict por fila sin cargar el archivo completo (None si la línea es inválida)."""
+    if fmt == "csv":
+        yield from csv.DictReader(fh)
+    else:
+        for line in fh:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield None
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa mediciones desde CSV o NDJSON (opcionalmente .gz) en streaming. "
+        "Columnas: serial_number o product (id), value, unit, measured_at (ISO 8601)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Archivo a importar ('-' para stdin).")
+        parser.add_argument("--format", choices=["csv", "ndjson"], help="Por defecto según la extensión.")
+        parser.add_argument("--chunk-size", type=int, default=5000)
+        parser.add_argument("--defer-alerts", action="store_true",
+                            help="No evalúa alertas por lote; hace una pasada masiva al final.")
+        parser.add_argument("--max-errors", type=int, default=20,
+                            help="Cantidad de filas inválidas a detallar en la salida.")
+
+    def handle(self, *args, **opts):
+        path = opts["path"]
+        fmt = opts["format"] or ("ndjson" if ".ndjson" in path or ".jsonl" in path else "csv")
+        chunk_size = opts["chunk_size"]
+        if chunk_size <= 0:
+            raise CommandError("--chunk-size debe ser positivo.")
+
+        lookup = ProductLookup()
+        stats = {"rows": 0, "inserted": 0, "skipped": 0, "events": 0}
+        # Tramos de pks creados por esta importación: entre lotes otros
+        # escritores pueden insertar mediciones con pks intermedios
+        imported = []
+        t0 = time.perf_counter()
+
+        try:
+            fh = _open(path)
+        except OSError as exc:
+            raise CommandError(str(exc))
+
+        with fh:
+            records = enumerate(_iter_records(fh, fmt), start=1)
+            while True:
+                chunk = list(islice(records, chunk_size))
+                if not chunk:
+                    break
+                rows = self._parse_chunk(chunk, lookup, stats, opts["max_errors"])
+                if not rows:
+                    continue
+                # Una transacción por lote (bulk_ingest_measurements es atómica)
+                measurements, events = bulk_ingest_measurements(rows, evaluate_alerts=not opts["defer_alerts"])
+                stats["inserted"] += len(rows)  # incluye las que van a particiones
+                stats["events"] += len(events)
+                if opts["defer_alerts"]:
+                    _pk_runs((m.pk for m in measurements), imported)
+                elapsed = time.perf_counter() - t0
+                self.stdout.write(
+                    f"{stats['inserted']} filas insertadas ({stats['inserted'] / elapsed:,.0f} filas/s)"
+                )
+
+        if imported:
+            self.stdout.write("Evaluando alertas de las filas importadas…")
+            for first_pk, last_pk in imported:
+                stats["events"] += evaluate_measurements_by_pk_range(first_pk, last_pk, chunk_size)
+
+        elapsed = time.perf_counter() - t0
+        self.stdout.write(self.style.SUCCESS(
+            f"Listo: {stats['inserted']} insertadas, {stats['skipped']} omitidas, "
+            f"{stats['events']} eventos, {elapsed:.2f}s "
+            f"({stats['inserted'] / max(elapsed, 1e-9):,.0f} filas/s)"
+        ))
+
+    def _parse_chunk(self, chunk, lookup, stats, max_errors):
+        lookup.prefetch(rec for _, rec in chunk)
+        rows = []
+        for lineno, rec in chunk:
+            stats["rows"] += 1
+            error = None
+            try:
+                product_id = lookup.resolve(rec)
+                value = float(rec.get("value"))
+                measured_at = parse_datetime(str(rec.get("measured_at") or ""))
+                if product_id is None:
+                    error = "producto desconocido"
+                elif measured_at is None:
+                    error = "measured_at inválido"
+                elif not math.isfinite(value):
+                    error = "value no finito"
+                elif value < 0:
+                    error = "value negativo"
+            except (AttributeError, TypeError, ValueError):
+                error = "fila mal formada"
+            if error:
+                stats["skipped"] += 1
+                if stats["skipped"] <= max_errors:
+                    self.stderr.write(f"Fila {lineno}: {error}")
+                continue
+            rows.append({
+                "product_id": product_id,
+                "value": value,
+                "unit": str(rec.get("unit") or "")[:20],
+                "measured_at": measured_at,
+            })
+        return rows
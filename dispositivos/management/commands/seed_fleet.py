@@ -0,0 +1,64 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.models import Organization
+from dispositivos.seed import seed_fleet
+
+
+def _count(value: str) -> int:
+    """Acepta 250000, 250k o 2M."""
+    value = value.strip().lower().replace("_", "")
+    factor = {"k": 1_000, "m": 1_000_000}.get(value[-1:], 1)
+    try:
+        return int(float(value[:-1] if factor > 1 else value) * factor)
+    except ValueError:
+        raise CommandError(f"Cantidad inválida: {value!r}")
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera una flota sintética (organizaciones, zonas, dispositivos, productos, "
+        "reglas de tres severidades y mediciones) con inserciones masivas, para benchmarks."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--measurements", type=_count, default=1_000_000, help="Total (acepta 500k, 2M).")
+        parser.add_argument("--products", type=_count, default=2_000)
+        parser.add_argument("--organizations", type=int, default=3)
+        parser.add_argument("--products-per-device", type=int, default=4)
+        parser.add_argument("--devices-per-zone", type=int, default=25)
+        parser.add_argument("--days", type=int, default=90, help="Ventana de tiempo de las mediciones.")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--prefix", default="fleet", help="Prefijo de nombres (debe ser nuevo).")
+        parser.add_argument("--no-derived", action="store_true",
+                            help="No llena latest_measurement ni rollups.")
+
+    def handle(self, *args, **opts):
+        prefix = opts["prefix"]
+        if Organization.all_objects.filter(name__startswith=f"{prefix}-org-").exists():
+            raise CommandError(f"Ya existe una flota con prefijo '{prefix}'; use --prefix.")
+
+        t0 = time.perf_counter()
+        step = max(opts["measurements"] // 20, opts["batch_size"])
+        last = [0]
+
+        def progress(n):
+            if n - last[0] >= step:
+                last[0] = n
+                self.stdout.write(f"{n:,} mediciones ({n / (time.perf_counter() - t0):,.0f} filas/s)")
+
+        with transaction.atomic():
+            counts = seed_fleet(
+                products=opts["products"], measurements=opts["measurements"],
+                organizations=opts["organizations"], products_per_device=opts["products_per_device"],
+                devices_per_zone=opts["devices_per_zone"], days=opts["days"], seed=opts["seed"],
+                batch_size=opts["batch_size"], prefix=prefix, derived=not opts["no_derived"],
+                progress=progress,
+            )
+        elapsed = time.perf_counter() - t0
+        self.stdout.write(self.style.SUCCESS(
+            "Listo en {:.1f}s: ".format(elapsed) + ", ".join(f"{k}={v:,}" for k, v in counts.items())
+        ))
@@ -0,0 +1,88 @@
+# dispositivos/metrics.py
+"""
+Métricas de la ingesta y del pipeline de alertas (expuestas en /metrics,
+ver core/metrics.py).
+
+- ecoenergy_measurements_ingested_total{product}: mediciones ingeridas
+  (post_save, ingesta masiva e import_measurements). La serie por
+  organización se deriva en el scrape con una consulta producto -> org.
+- ecoenergy_alert_evaluation_seconds{mode}: latencia de evaluación
+  (single = una medición; batch / vectorized = lotes).
+- ecoenergy_alert_events_created_total{severity}
+- ecoenergy_alert_events_resolved_total{source}: eventos resueltos (single,
+  bulk = endpoint de resolución masiva, admin).
+- ecoenergy_rule_index_lookups_total{result}: aciertos del índice de reglas.
+- ecoenergy_alert_queue_depth / _lag_seconds / _failed: cola de evaluación
+  diferida.
+"""
+from __future__ import annotations
+from collections import Counter as _Tally
+
+from core.metrics import REGISTRY, Counter, Histogram
+
+MEASUREMENTS_INGESTED = Counter(
+    "ecoenergy_measurements_ingested_total", "Mediciones ingeridas por producto.", ["product"],
+)
+ALERT_EVALUATION_SECONDS = Histogram(
+    "ecoenergy_alert_evaluation_seconds", "Latencia de evaluación de alertas.", ["mode"],
+)
+ALERT_EVENTS_CREATED = Counter(
+    "ecoenergy_alert_events_created_total", "Eventos de alerta creados por severidad.", ["severity"],
+)
+ALERT_EVENTS_RESOLVED = Counter(
+    "ecoenergy_alert_events_resolved_total", "Eventos de alerta resueltos por origen.", ["source"],
+)
+RULE_INDEX_LOOKUPS = Counter(
+    "ecoenergy_rule_index_lookups_total", "Consultas al índice de reglas en memoria (hit/miss).", ["result"],
+)
+
+
+def record_ingest(measurements) -> None:
+    tally = _Tally((m.product_id,) for m in measurements)
+    if tally:
+        MEASUREMENTS_INGESTED.inc_many(tally)
+
+
+def record_events(events, rules_by_product) -> None:
+    """Cuenta eventos por severidad; las severidades salen de las reglas compiladas."""
+    severities = {}
+    for rules in rules_by_product.values():
+        severities.update(rules.severities)
+    tally = _Tally((severities.get(e.product_alert_id, "DESCONOCIDA"),) for e in events)
+    if tally:
+        ALERT_EVENTS_CREATED.inc_many(tally)
+
+
+def _by_organization(snapshot):
+    from .models import Product
+    per_product = snapshot.get(MEASUREMENTS_INGESTED.name, {})
+    if not per_product:
+        return []
+    org_of = dict(
+        Product.all_objects
+        .filter(pk__in=[int(labels[0]) for labels in per_product])
+        .values_list("pk", "device__organization_id")
+    )
+    totals = _Tally()
+    for (product_id,), n in per_product.items():
+        totals[org_of.get(int(product_id)) or "ninguna"] += n
+    yield (
+        "ecoenergy_measurements_ingested_by_organization_total", "counter",
+        "Mediciones ingeridas por organización (derivado de la serie por producto).",
+        [({"organization": org}, n) for org, n in sorted(totals.items(), key=lambda kv: str(kv[0]))],
+    )
+
+
+def _alert_queue(snapshot):
+    from .alert_queue import queue_stats
+    stats = queue_stats()
+    yield ("ecoenergy_alert_queue_depth", "gauge",
+           "Mediciones pendientes en la cola de evaluación diferida.", [({}, stats["depth"])])
+    yield ("ecoenergy_alert_queue_lag_seconds", "gauge",
+           "Antigüedad de la tarea más vieja de la cola.", [({}, stats["lag_seconds"])])
+    yield ("ecoenergy_alert_queue_failed", "gauge",
+           "Tareas que agotaron ALERT_WORKER_MAX_ATTEMPTS.", [({}, stats["failed"])])
+
+
+REGISTRY.add_collector(_by_organization)
+REGISTRY.add_collector(_alert_queue)
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.6 on 2026-10-17 13:07
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dispositivos', '0003_remove_alert_is_resolved_remove_alert_resolved_at_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertEvaluationTask',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('enqueued_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('claimed_by', models.CharField(blank=True, max_length=64, null=True)),
+                ('claimed_at', models.DateTimeField(blank=True, null=True)),
+                ('measurement', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='dispositivos.measurement')),
+            ],
+            options={
+                'db_table': 'alert_evaluation_queue',
+                'indexes': [models.Index(fields=['claimed_at', 'id'], name='alert_evalu_claimed_1c652f_idx'), models.Index(fields=['claimed_by'], name='alert_evalu_claimed_6dbb87_idx')],
+            },
+        ),
+    ]
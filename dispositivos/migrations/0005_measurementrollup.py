@@ -0,0 +1,35 @@
+# Generated by Django 5.2.6 on 2026-10-17 13:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dispositivos', '0004_alertevaluationtask'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MeasurementRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('hour', 'Hora'), ('day', 'Día')], max_length=5)),
+                ('bucket_start', models.DateTimeField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('min_value', models.FloatField()),
+                ('max_value', models.FloatField()),
+                ('sum_value', models.FloatField()),
+                ('last_value', models.FloatField()),
+                ('last_measured_at', models.DateTimeField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='dispositivos.product')),
+            ],
+            options={
+                'db_table': 'measurement_rollup',
+                'ordering': ['bucket_start'],
+                'indexes': [models.Index(fields=['granularity', 'bucket_start'], name='measurement_granula_b7a641_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'granularity', 'bucket_start'), name='uq_rollup_product_granularity_bucket')],
+            },
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.6 on 2026-10-17 13:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_latest(apps, schema_editor):
+    """Llena latest_measurement con la última medición viva de cada producto."""
+    Measurement = apps.get_model("dispositivos", "Measurement")
+    LatestMeasurement = apps.get_model("dispositivos", "LatestMeasurement")
+    newest = (
+        Measurement.objects
+        .filter(product_id=models.OuterRef("product_id"), deleted_at__isnull=True)
+        .order_by("-measured_at", "-id")
+        .values("id")[:1]
+    )
+    rows = (
+        Measurement.objects
+        .filter(deleted_at__isnull=True, id=models.Subquery(newest))
+        .values_list("id", "product_id", "value", "unit", "measured_at")
+        .iterator(chunk_size=2000)
+    )
+    batch = []
+    for pk, product_id, value, unit, measured_at in rows:
+        batch.append(LatestMeasurement(
+            product_id=product_id, measurement_id=pk, value=value, unit=unit, measured_at=measured_at,
+        ))
+        if len(batch) >= 2000:
+            LatestMeasurement.objects.bulk_create(batch)
+            batch = []
+    LatestMeasurement.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dispositivos', '0005_measurementrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LatestMeasurement',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='latest_measurement', serialize=False, to='dispositivos.product')),
+                ('value', models.FloatField()),
+                ('unit', models.CharField(max_length=20)),
+                ('measured_at', models.DateTimeField()),
+                ('measurement', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='dispositivos.measurement')),
+            ],
+            options={
+                'db_table': 'latest_measurement',
+                'ordering': ['-measured_at'],
+                'indexes': [models.Index(fields=['-measured_at'], name='latest_meas_measure_b3e5a6_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_latest, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-17 13:16
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dispositivos', '0006_latestmeasurement'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MeasurementPartition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(unique=True)),
+                ('table_name', models.CharField(max_length=63, unique=True)),
+                ('row_count', models.PositiveIntegerField(default=0)),
+                ('detached_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'measurement_partition',
+                'ordering': ['month'],
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.6 on 2026-10-17 13:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+        ('dispositivos', '0007_measurementpartition'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='device',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['name', 'id'], name='device_live_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='measurement',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['product', '-measured_at', '-id'], name='meas_live_prod_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='measurement',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['-measured_at', '-id'], name='meas_live_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['name', 'id'], name='product_live_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productalertevent',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['-created_at', '-id'], name='pae_live_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productalertevent',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True), ('is_resolved', False)), fields=['-created_at', '-id'], name='pae_open_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productalertevent',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['product_alert', '-created_at'], name='pae_live_rule_time_idx'),
+        ),
+    ]
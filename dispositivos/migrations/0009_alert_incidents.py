@@ -0,0 +1,52 @@
+# Generated by Django 5.2.6 on 2026-10-17 14:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dispositivos', '0008_live_partial_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productalertevent',
+            name='auto_resolved',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='productalertevent',
+            name='last_measurement_id',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='productalertevent',
+            name='last_seen_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='productalertevent',
+            name='last_value',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='productalertevent',
+            name='match_count',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='productalertevent',
+            name='miss_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='productalertevent',
+            name='peak_value',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='productalertevent',
+            constraint=models.UniqueConstraint(condition=models.Q(('deleted_at__isnull', True), ('is_resolved', False), ('last_seen_at__isnull', False)), fields=('product_alert',), name='pae_one_open_incident'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.6 on 2026-10-17 14:28
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def drop_duplicate_events(apps, schema_editor):
+    # get_or_create sin restricción pudo dejar pares repetidos bajo carrera:
+    # se conserva el evento más antiguo de cada (regla, medición)
+    ProductAlertEvent = apps.get_model("dispositivos", "ProductAlertEvent")
+    duplicated = (
+        ProductAlertEvent.objects
+        .values("product_alert_id", "measurement_id")
+        .annotate(n=Count("id"), keep=Min("id"))
+        .filter(n__gt=1)
+    )
+    for row in duplicated.iterator():
+        (
+            ProductAlertEvent.objects
+            .filter(product_alert_id=row["product_alert_id"], measurement_id=row["measurement_id"])
+            .exclude(pk=row["keep"])
+            .delete()
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dispositivos', '0009_alert_incidents'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_events, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='productalertevent',
+            constraint=models.UniqueConstraint(fields=('product_alert', 'measurement'), name='pae_rule_measurement_uniq'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 14:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dispositivos', '0010_event_rule_measurement_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='measurementrollup',
+            name='unit',
+            field=models.CharField(blank=True, default='', max_length=20),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.6 on 2026-10-17 15:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_counts(apps, schema_editor):
+    """Cuenta por producto las filas de las particiones ya desprendidas."""
+    MeasurementPartition = apps.get_model("dispositivos", "MeasurementPartition")
+    MeasurementPartitionCount = apps.get_model("dispositivos", "MeasurementPartitionCount")
+    quote = schema_editor.quote_name
+    for partition in MeasurementPartition.objects.all():
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT product_id, COUNT(*) FROM {quote(partition.table_name)} GROUP BY product_id"
+            )
+            rows = cursor.fetchall()
+        MeasurementPartitionCount.objects.bulk_create([
+            MeasurementPartitionCount(partition=partition, product_id=product_id, row_count=n)
+            for product_id, n in rows
+        ])
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dispositivos', '0011_rollup_canonical_unit'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MeasurementPartitionCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_id', models.BigIntegerField()),
+                ('row_count', models.PositiveIntegerField(default=0)),
+                ('partition', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='product_counts', to='dispositivos.measurementpartition')),
+            ],
+            options={
+                'db_table': 'measurement_partition_count',
+                'indexes': [models.Index(fields=['product_id'], name='partition_count_prod_idx')],
+                'constraints': [models.UniqueConstraint(fields=('partition', 'product_id'), name='partition_count_unique')],
+            },
+        ),
+        migrations.RunPython(backfill_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 15:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dispositivos', '0012_partition_product_counts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alertevaluationtask',
+            name='failed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -2,8 +2,12 @@
 from django.db import models
 from django.core.validators import MinValueValidator
 from django.db.models import Q  
+from django.utils import timezone
 from core.models import BaseModel, Organization
 
+# Condición de los índices parciales: el manager por defecto siempre filtra
+# deleted_at IS NULL, así que los índices solo cubren filas vivas.
+LIVE = Q(deleted_at__isnull=True)
 
 
 class Zone(BaseModel):
@@ -56,6 +60,8 @@ class Device(BaseModel):
         indexes = [
             models.Index(fields=["organization"]),
             models.Index(fields=["zone"]),
+            # device_list: keyset por (name, id) sobre filas vivas
+            models.Index(fields=["name", "id"], name="device_live_name_idx", condition=LIVE),
         ]
 
     def __str__(self):
@@ -82,6 +88,8 @@ class Product(BaseModel):
         indexes = [
             models.Index(fields=["device"]),
             models.Index(fields=["category"]),
+            # product_list: keyset por (name, id) sobre filas vivas
+            models.Index(fields=["name", "id"], name="product_live_name_idx", condition=LIVE),
         ]
         constraints = [
             models.UniqueConstraint(
@@ -109,7 +117,14 @@ class Measurement(BaseModel):
     class Meta:
         db_table = "measurement"
         ordering = ["-measured_at"]
-        indexes = [models.Index(fields=["product"]), models.Index(fields=["-measured_at"])]
+        indexes = [
+            models.Index(fields=["product"]),
+            models.Index(fields=["-measured_at"]),
+            # product_detail / measurement_list?product=: últimas de un producto
+            models.Index(fields=["product", "-measured_at", "-id"], name="meas_live_prod_time_idx", condition=LIVE),
+            # measurement_list sin filtro: keyset por (-measured_at, -id)
+            models.Index(fields=["-measured_at", "-id"], name="meas_live_time_idx", condition=LIVE),
+        ]
     def __str__(self):
         return f"{self.product.name} — {self.value} {self.unit} @ {self.measured_at:%Y-%m-%d %H:%M}"
     
@@ -143,11 +158,138 @@ class ProductAlertEvent(BaseModel):
     measurement   = models.ForeignKey('Measurement',  on_delete=models.CASCADE, related_name='alert_events')
     is_resolved   = models.BooleanField(default=False)
     resolved_at   = models.DateTimeField(blank=True, null=True)
+    # Modo incidente (ALERT_INCIDENT_MODE, ver incidents.py): un evento abierto
+    # por regla que se extiende con cada lectura que coincide. `measurement`
+    # es la lectura que lo abrió; last_measurement_id no es FK para no
+    # retener mediciones (retención/particiones) ni cascadas al borrarlas.
+    last_seen_at        = models.DateTimeField(blank=True, null=True)
+    last_value          = models.FloatField(blank=True, null=True)
+    last_measurement_id = models.BigIntegerField(blank=True, null=True)
+    peak_value          = models.FloatField(blank=True, null=True)
+    match_count         = models.PositiveIntegerField(default=1)
+    miss_count          = models.PositiveIntegerField(default=0)
+    auto_resolved       = models.BooleanField(default=False)
     class Meta:
         db_table = "product_alert_event"
+        constraints = [
+            # un evento por (regla, medición): los escritores concurrentes
+            # insertan con ON CONFLICT DO NOTHING (services._insert_events)
+            models.UniqueConstraint(fields=["product_alert", "measurement"], name="pae_rule_measurement_uniq"),
+            # a lo más un incidente abierto por regla (los eventos clásicos
+            # no tienen last_seen_at y no cuentan)
+            models.UniqueConstraint(
+                fields=["product_alert"], name="pae_one_open_incident",
+                condition=LIVE & Q(is_resolved=False, last_seen_at__isnull=False),
+            ),
+        ]
+        indexes = [
+            # dashboard (recientes, conteo semanal) y alert_list?show=all
+            models.Index(fields=["-created_at", "-id"], name="pae_live_time_idx", condition=LIVE),
+            # alert_list por defecto: solo pendientes (índice chico)
+            models.Index(fields=["-created_at", "-id"], name="pae_open_time_idx",
+                         condition=LIVE & Q(is_resolved=False)),
+            # product_detail / device_detail: eventos de las reglas de un producto
+            models.Index(fields=["product_alert", "-created_at"], name="pae_live_rule_time_idx", condition=LIVE),
+        ]
     
     def __str__(self):
         sev = self.product_alert.alert.get_severity_display()
         p = self.product_alert.product.name
         v = f"{self.measurement.value} {self.measurement.unit}"
-        return f"{p} · {sev} · {v} @ {self.measurement.measured_at:%Y-%m-%d %H:%M}"
\ No newline at end of file
+        return f"{p} · {sev} · {v} @ {self.measurement.measured_at:%Y-%m-%d %H:%M}"
+
+# Cola de evaluación diferida de alertas (ALERT_EVALUATION_ASYNC).
+# No hereda de BaseModel: es una tabla de trabajo, las filas se borran
+# físicamente al procesarse (sin soft delete).
+class AlertEvaluationTask(models.Model):
+    measurement = models.ForeignKey('Measurement', on_delete=models.CASCADE, related_name='+')
+    enqueued_at = models.DateTimeField(default=timezone.now)
+    attempts    = models.PositiveIntegerField(default=0)
+    claimed_by  = models.CharField(max_length=64, blank=True, null=True)
+    claimed_at  = models.DateTimeField(blank=True, null=True)
+    # Superó ALERT_WORKER_MAX_ATTEMPTS: queda fuera de la cola para revisión
+    failed_at   = models.DateTimeField(blank=True, null=True)
+    class Meta:
+        db_table = "alert_evaluation_queue"
+        indexes = [models.Index(fields=["claimed_at", "id"]), models.Index(fields=["claimed_by"])]
+    def __str__(self):
+        return f"Medición {self.measurement_id} (intentos: {self.attempts})"
+
+
+# Resumen por producto y bucket (hora/día) mantenido incrementalmente en la
+# ingesta (ver rollups.py). Es un dato derivado: sin soft delete, se
+# reconstruye con `manage.py rebuild_rollups`.
+class MeasurementRollup(models.Model):
+    HOUR, DAY = "hour", "day"
+    GRANULARITIES = ((HOUR, "Hora"), (DAY, "Día"))
+    product          = models.ForeignKey('Product', on_delete=models.CASCADE, related_name='rollups')
+    granularity      = models.CharField(max_length=5, choices=GRANULARITIES)
+    bucket_start     = models.DateTimeField()
+    count            = models.PositiveIntegerField(default=0)
+    min_value        = models.FloatField()
+    max_value        = models.FloatField()
+    sum_value        = models.FloatField()
+    last_value       = models.FloatField()
+    last_measured_at = models.DateTimeField()
+    unit             = models.CharField(max_length=20, blank=True, default="")  # canónica (units.py)
+    class Meta:
+        db_table = "measurement_rollup"
+        ordering = ["bucket_start"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["product", "granularity", "bucket_start"],
+                name="uq_rollup_product_granularity_bucket",
+            ),
+        ]
+        indexes = [models.Index(fields=["granularity", "bucket_start"])]
+    @property
+    def avg_value(self):
+        return self.sum_value / self.count if self.count else None
+    def __str__(self):
+        return f"{self.product_id} · {self.granularity} @ {self.bucket_start:%Y-%m-%d %H:%M} (n={self.count})"
+
+
+# Última lectura por producto (una fila por producto), mantenida en la
+# ingesta con protección de orden: solo un measured_at más nuevo la reemplaza.
+class LatestMeasurement(models.Model):
+    product     = models.OneToOneField('Product', on_delete=models.CASCADE, primary_key=True, related_name='latest_measurement')
+    measurement = models.ForeignKey('Measurement', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    value       = models.FloatField()
+    unit        = models.CharField(max_length=20)
+    measured_at = models.DateTimeField()
+    class Meta:
+        db_table = "latest_measurement"
+        ordering = ["-measured_at"]
+        indexes = [models.Index(fields=["-measured_at"])]
+    def __str__(self):
+        return f"{self.product_id} — {self.value} {self.unit} @ {self.measured_at:%Y-%m-%d %H:%M}"
+
+
+# Catálogo de particiones mensuales de mediciones (ver partitions.py). Cada
+# fila corresponde a una tabla measurement_YYYY_MM ya desprendida de la
+# tabla caliente; borrar el mes es DROP TABLE + borrar esta fila.
+class MeasurementPartition(models.Model):
+    month       = models.DateField(unique=True)  # primer día del mes
+    table_name  = models.CharField(max_length=63, unique=True)
+    row_count   = models.PositiveIntegerField(default=0)
+    detached_at = models.DateTimeField(default=timezone.now)
+    class Meta:
+        db_table = "measurement_partition"
+        ordering = ["month"]
+    def __str__(self):
+        return f"{self.table_name} ({self.row_count} filas)"
+
+
+# Filas por producto de cada partición. Las tablas mensuales no tienen FK a
+# Product, así que los conteos de mediciones por producto/dispositivo suman
+# la tabla caliente y este catálogo.
+class MeasurementPartitionCount(models.Model):
+    partition  = models.ForeignKey(MeasurementPartition, on_delete=models.CASCADE, related_name="product_counts")
+    product_id = models.BigIntegerField()
+    row_count  = models.PositiveIntegerField(default=0)
+    class Meta:
+        db_table = "measurement_partition_count"
+        constraints = [
+            models.UniqueConstraint(fields=["partition", "product_id"], name="partition_count_unique"),
+        ]
+        indexes = [models.Index(fields=["product_id"], name="partition_count_prod_idx")]
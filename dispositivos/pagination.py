@@ -0,0 +1,126 @@
+# dispositivos/pagination.py
+"""
+Paginación por cursor (keyset) para listados grandes.
+
+En vez de COUNT(*) + OFFSET, cada página filtra "después de la última fila
+vista" según el orden (p. ej. (measured_at, id)), así la página N cuesta lo
+mismo que la 1 si hay un índice que calce con el orden. Los cursores son
+opacos (base64 de JSON) y llevan la dirección ('n' siguiente / 'p' anterior).
+"""
+from __future__ import annotations
+import base64
+import binascii
+import datetime
+import json
+from typing import List, Optional, Sequence
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+class KeysetPage:
+    def __init__(self, object_list: list, has_next: bool, has_previous: bool,
+                 next_cursor: Optional[str], prev_cursor: Optional[str]):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+
+class _CursorEncoder(DjangoJSONEncoder):
+    """Como DjangoJSONEncoder, pero sin truncar fechas a milisegundos."""
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            # la comparación del cursor debe ser exacta: filas con el mismo
+            # milisegundo y distinto microsegundo no pueden saltarse
+            return o.isoformat()
+        return super().default(o)
+
+
+def _encode(direction: str, values: Sequence) -> str:
+    raw = json.dumps({"d": direction, "k": list(values)}, cls=_CursorEncoder, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode(cursor: str, fields: list):
+    """Retorna (dirección, valores) o None si el cursor es inválido."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        direction, values = data["d"], data["k"]
+        if direction not in ("n", "p") or len(values) != len(fields):
+            return None
+        return direction, [f.to_python(v) for f, v in zip(fields, values)]
+    except (binascii.Error, ValueError, KeyError, TypeError, ValidationError):
+        return None
+
+
+def _after(ordering: List[str], values: list, reverse: bool) -> Q:
+    """
+    Condición "viene después de values" para el orden dado (o antes, si reverse):
+    (a > x) OR (a = x AND b > y) OR ...
+    """
+    condition = Q()
+    for i, term in enumerate(ordering):
+        name = term.lstrip("-")
+        descending = term.startswith("-") != reverse
+        clause = Q(**{f"{name}__{'lt' if descending else 'gt'}": values[i]})
+        for prev_term, prev_value in zip(ordering[:i], values[:i]):
+            clause &= Q(**{prev_term.lstrip("-"): prev_value})
+        condition |= clause
+    return condition
+
+
+def keyset_paginate(queryset, ordering: List[str], cursor: Optional[str], per_page: int) -> KeysetPage:
+    """
+    Pagina queryset por las columnas de `ordering` (la última debe ser única,
+    normalmente "id"/"-id"). Un cursor inválido se trata como primera página.
+    """
+    opts = queryset.model._meta
+    fields = [opts.pk if t.lstrip("-") in ("pk", "id") else opts.get_field(t.lstrip("-")) for t in ordering]
+    decoded = _decode(cursor, fields) if cursor else None
+
+    backwards = decoded is not None and decoded[0] == "p"
+    order = [t[1:] if t.startswith("-") else f"-{t}" for t in ordering] if backwards else ordering
+    qs = queryset.order_by(*order)
+    if decoded is not None:
+        qs = qs.filter(_after(ordering, decoded[1], reverse=backwards))
+
+    rows = list(qs[:per_page + 1])
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+        has_next, has_previous = True, has_more
+    else:
+        has_next, has_previous = has_more, decoded is not None
+
+    def key(obj):
+        return [getattr(obj, f.attname) for f in fields]
+
+    return KeysetPage(
+        rows,
+        has_next=has_next,
+        has_previous=has_previous,
+        next_cursor=_encode("n", key(rows[-1])) if has_next and rows else None,
+        prev_cursor=_encode("p", key(rows[0])) if has_previous and rows else None,
+    )
+
+
+def page_querystring(request, param: str = "cursor") -> str:
+    """Querystring actual sin el cursor, para armar los links siguiente/anterior."""
+    params = request.GET.copy()
+    params.pop(param, None)
+    return params.urlencode()
@@ -0,0 +1,339 @@
+# dispositivos/partitions.py
+"""
+Particiones mensuales de mediciones.
+
+La tabla `measurement` es la partición "caliente": ahí entra todo lo nuevo y
+ahí viven los eventos de alerta (FK). Los meses cerrados se desprenden a su
+propia tabla `measurement_YYYY_MM` (detach_month) y quedan registrados en
+MeasurementPartition. Desde entonces:
+
+- route_rows() envía las filas atrasadas de un mes desprendido directo a su
+  partición (no generan alertas: el mes ya está cerrado);
+- querysets() entrega la tabla caliente más solo las particiones que se
+  cruzan con la ventana pedida (poda por mes), para lecturas acotadas;
+- paginate_measurements() pagina por cursor (-measured_at, -id) sobre la
+  caliente y las particiones, para los listados (measurement_list,
+  product_detail) que no tienen ventana de fechas;
+- drop_partition() borra un mes completo con DROP TABLE, sin DELETE masivo.
+
+Las mediciones con eventos de alerta (resueltos o no) no se mueven: quedan en
+la tabla caliente hasta que la retención de filas las alcance.
+
+SQLite no tiene particionamiento nativo; cada partición es una tabla normal
+del mismo archivo, creada con el schema editor de Django, así que el mismo
+código sirve para PostgreSQL/MySQL. En SQLite el schema editor no puede
+usarse dentro de una transacción: detach_month/drop_partition se llaman
+fuera de atomic (p. ej. desde enforce_retention).
+"""
+from __future__ import annotations
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.apps.registry import Apps
+from django.db import connection, models, transaction
+
+from .models import (
+    Measurement, MeasurementPartition, MeasurementPartitionCount, Product, ProductAlertEvent,
+)
+from .pagination import KeysetPage, _after, _decode, _encode
+
+# Registro aislado: los modelos de partición no entran en migraciones ni en
+# el registro global de la app.
+_partition_apps = Apps()
+_models: Dict[str, type] = {}
+
+
+def month_start(dt) -> date:
+    return date(dt.year, dt.month, 1)
+
+
+def next_month(month: date) -> date:
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def _as_datetime(month: date) -> datetime:
+    return datetime(month.year, month.month, month.day)
+
+
+def table_name(month: date) -> str:
+    return f"measurement_{month:%Y_%m}"
+
+
+def partition_model(month: date):
+    """Modelo (no administrado por migraciones) de la tabla del mes."""
+    name = table_name(month)
+    model = _models.get(name)
+    if model is None:
+        meta = type("Meta", (), {
+            "apps": _partition_apps,
+            "app_label": "dispositivos",
+            "db_table": name,
+            "ordering": ["-measured_at"],
+            "indexes": [models.Index(fields=["product_id", "measured_at"], name=f"{name}_prod_idx")],
+        })
+        model = type(f"Measurement_{month:%Y_%m}", (models.Model,), {
+            "__module__": __name__,
+            "Meta": meta,
+            # Siempre el id de la tabla caliente (también las filas atrasadas, ver route_rows)
+            "id": models.BigAutoField(primary_key=True),
+            # Sin FK: la partición no debe impedir borrar productos ni depender de la caliente
+            "product_id": models.BigIntegerField(),
+            "value": models.FloatField(),
+            "unit": models.CharField(max_length=20),
+            "measured_at": models.DateTimeField(),
+            "created_at": models.DateTimeField(),
+        })
+        _models[name] = model
+    return model
+
+
+def _table_exists(name: str) -> bool:
+    with connection.cursor() as cursor:
+        return name in connection.introspection.table_names(cursor)
+
+
+def ensure_partition(month: date):
+    """Crea la tabla del mes y su entrada en el catálogo si no existen."""
+    model = partition_model(month)
+    if not _table_exists(model._meta.db_table):
+        with connection.schema_editor() as editor:
+            editor.create_model(model)
+    MeasurementPartition.objects.get_or_create(
+        month=month, defaults={"table_name": model._meta.db_table}
+    )
+    return model
+
+
+def detached_months() -> set:
+    return set(MeasurementPartition.objects.values_list("month", flat=True))
+
+
+def detach_month(month: date, batch_size: int = 5000) -> int:
+    """
+    Mueve las mediciones vivas del mes (sin eventos) a su partición, por
+    lotes de una transacción cada uno. Es idempotente: volver a correrlo
+    mueve lo que haya llegado después a la tabla caliente.
+    Retorna la cantidad de filas movidas.
+    """
+    from .rollups import ensure_day_rollups
+    month = month_start(month)
+    since, until = _as_datetime(month), _as_datetime(next_month(month))
+    # Los rollups se aseguran antes de mover: después el día ya no está en la caliente
+    ensure_day_rollups(since, until)
+    model = ensure_partition(month)
+
+    with_events = ProductAlertEvent.all_objects.values("measurement_id")
+    candidates = (
+        Measurement.objects
+        .filter(measured_at__gte=since, measured_at__lt=until)
+        .exclude(pk__in=with_events)
+        .order_by("pk")
+    )
+    moved = 0
+    while True:
+        with transaction.atomic():
+            rows = list(candidates.values_list(
+                "pk", "product_id", "value", "unit", "measured_at", "created_at"
+            )[:batch_size])
+            if not rows:
+                break
+            model.objects.bulk_create([
+                model(id=pk, product_id=product_id, value=value, unit=unit,
+                      measured_at=measured_at, created_at=created_at)
+                for pk, product_id, value, unit, measured_at, created_at in rows
+            ])
+            Measurement.all_objects.filter(pk__in=[r[0] for r in rows]).hard_delete()
+        moved += len(rows)
+
+    partition = MeasurementPartition.objects.get(month=month)
+    partition.row_count = model.objects.count()
+    partition.save(update_fields=["row_count"])
+    with transaction.atomic():
+        partition.product_counts.all().delete()
+        MeasurementPartitionCount.objects.bulk_create([
+            MeasurementPartitionCount(partition=partition, product_id=row["product_id"], row_count=row["n"])
+            for row in model.objects.values("product_id").annotate(n=models.Count("id")).order_by()
+        ])
+    return moved
+
+
+def _add_product_counts(partition: MeasurementPartition, counts: Dict[int, int]) -> None:
+    """Suma filas nuevas a los conteos por producto de la partición."""
+    existing = set(partition.product_counts.filter(product_id__in=counts).values_list("product_id", flat=True))
+    for product_id in existing:
+        partition.product_counts.filter(product_id=product_id).update(
+            row_count=models.F("row_count") + counts[product_id]
+        )
+    MeasurementPartitionCount.objects.bulk_create([
+        MeasurementPartitionCount(partition=partition, product_id=product_id, row_count=n)
+        for product_id, n in counts.items() if product_id not in existing
+    ])
+
+
+def drop_partition(month: date) -> bool:
+    """Elimina un mes completo (DROP TABLE). Retorna False si no existía."""
+    month = month_start(month)
+    model = partition_model(month)
+    # Primero el catálogo: desde ahí ni el router ni los lectores ven el mes
+    deleted, _ = MeasurementPartition.objects.filter(month=month).delete()
+    if _table_exists(model._meta.db_table):
+        with connection.schema_editor() as editor:
+            editor.delete_model(model)
+    return bool(deleted)
+
+
+def expired_partitions(cutoff: datetime) -> List[date]:
+    """Meses desprendidos que terminan antes del corte (se pueden borrar enteros)."""
+    return [
+        month for month in MeasurementPartition.objects.order_by("month").values_list("month", flat=True)
+        if _as_datetime(next_month(month)) <= cutoff
+    ]
+
+
+def route_rows(rows: List[dict]) -> Tuple[List[dict], list]:
+    """
+    Separa las filas de meses desprendidos y las inserta en su partición.
+    Retorna (filas para la tabla caliente, instancias insertadas en particiones).
+
+    Los ids salen de la secuencia de la tabla caliente (se insertan ahí y se
+    mueven en la misma transacción), igual que las filas que mueve
+    detach_month: un id identifica una sola medición entre la caliente y
+    todas las particiones (cursores de paginate_measurements, exportes).
+    """
+    if not rows:
+        return rows, []
+    detached = detached_months()
+    if not detached:
+        return rows, []
+    hot, routed = [], {}
+    for row in rows:
+        month = month_start(row["measured_at"])
+        if month in detached:
+            routed.setdefault(month, []).append(row)
+        else:
+            hot.append(row)
+    archived = []
+    partitions = MeasurementPartition.objects.in_bulk(list(routed), field_name="month")
+    for month, month_rows in routed.items():
+        model = partition_model(month)
+        with transaction.atomic():
+            staged = Measurement.objects.bulk_create([
+                Measurement(product_id=row["product_id"], value=row["value"], unit=row.get("unit") or "",
+                            measured_at=row["measured_at"])
+                for row in month_rows
+            ])
+            archived += model.objects.bulk_create([
+                model(id=m.pk, product_id=m.product_id, value=m.value, unit=m.unit,
+                      measured_at=m.measured_at, created_at=m.created_at)
+                for m in staged
+            ])
+            # Sin rows_deleted: las filas de paso nunca fueron lectura vigente
+            models.QuerySet.delete(Measurement.all_objects.filter(pk__in=[m.pk for m in staged]))
+            MeasurementPartition.objects.filter(month=month).update(
+                row_count=models.F("row_count") + len(month_rows)
+            )
+            counts: Dict[int, int] = {}
+            for m in staged:
+                counts[m.product_id] = counts.get(m.product_id, 0) + 1
+            _add_product_counts(partitions[month], counts)
+    return hot, archived
+
+
+def querysets(since: Optional[datetime] = None, until: Optional[datetime] = None,
+              product_ids: Optional[Iterable[int]] = None) -> list:
+    """
+    QuerySets que cubren [since, until): la tabla caliente y solo las
+    particiones cuyo mes se cruza con la ventana.
+    """
+    months = MeasurementPartition.objects.order_by("month").values_list("month", flat=True)
+    if since is not None:
+        months = months.filter(month__gte=month_start(since))
+    if until is not None:
+        months = months.filter(month__lte=month_start(until - timedelta(microseconds=1)))
+
+    product_ids = list(product_ids) if product_ids is not None else None
+    result = []
+    for qs in [Measurement.objects.all()] + [partition_model(m).objects.all() for m in months]:
+        if since is not None:
+            qs = qs.filter(measured_at__gte=since)
+        if until is not None:
+            qs = qs.filter(measured_at__lt=until)
+        if product_ids is not None:
+            qs = qs.filter(product_id__in=product_ids)
+        result.append(qs)
+    return result
+
+
+MEASUREMENT_ORDERING = ["-measured_at", "-id"]
+
+
+def _as_measurements(rows: list) -> List[Measurement]:
+    """Filas de partición como Measurement (no se guardan): con producto y sin eventos."""
+    products = (
+        Product.all_objects.select_related("device", "category")
+        .in_bulk({row.product_id for row in rows})
+    )
+    result = []
+    for row in rows:
+        m = Measurement(id=row.id, product_id=row.product_id, value=row.value, unit=row.unit,
+                        measured_at=row.measured_at, created_at=row.created_at)
+        if row.product_id in products:
+            m.product = products[row.product_id]
+        # las mediciones con eventos nunca se desprenden
+        m._prefetched_objects_cache = {"alert_events": ProductAlertEvent.objects.none()}
+        result.append(m)
+    return result
+
+
+def paginate_measurements(hot, cursor: Optional[str], per_page: int, filters: Optional[dict] = None) -> KeysetPage:
+    """
+    keyset_paginate por (-measured_at, -id) sobre `hot` (QuerySet de la tabla
+    caliente, ya filtrado) y las particiones, filtradas con `filters` (sobre
+    product_id: las particiones no tienen FK).
+
+    Los meses desprendidos no se solapan, así que se consultan de a uno,
+    desde el mes del cursor en el sentido del recorrido, y se corta apenas
+    la página ya está completa con filas más nuevas (o más viejas, hacia
+    atrás) que todo el mes: la primera página con datos recientes no toca
+    ninguna partición.
+    """
+    fields = [Measurement._meta.get_field("measured_at"), Measurement._meta.pk]
+    decoded = _decode(cursor, fields) if cursor else None
+    backwards = decoded is not None and decoded[0] == "p"
+    order = ["measured_at", "id"] if backwards else MEASUREMENT_ORDERING
+
+    def fetch(qs) -> list:
+        qs = qs.order_by(*order)
+        if decoded is not None:
+            qs = qs.filter(_after(MEASUREMENT_ORDERING, decoded[1], reverse=backwards))
+        return list(qs[:per_page + 1])
+
+    rows = fetch(hot)
+    months = MeasurementPartition.objects.values_list("month", flat=True)
+    if decoded is not None:
+        anchor = month_start(decoded[1][0])
+        months = months.filter(month__gte=anchor) if backwards else months.filter(month__lte=anchor)
+    for month in months.order_by("month" if backwards else "-month"):
+        if len(rows) > per_page:
+            edge = rows[per_page].measured_at
+            if edge < _as_datetime(month) if backwards else edge >= _as_datetime(next_month(month)):
+                break
+        found = fetch(partition_model(month).objects.filter(**(filters or {})))
+        if found:
+            rows = sorted(rows + _as_measurements(found), key=lambda m: (m.measured_at, m.pk),
+                          reverse=not backwards)[:per_page + 1]
+
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+        has_next, has_previous = True, has_more
+    else:
+        has_next, has_previous = has_more, decoded is not None
+    return KeysetPage(
+        rows,
+        has_next=has_next,
+        has_previous=has_previous,
+        next_cursor=_encode("n", [rows[-1].measured_at, rows[-1].pk]) if has_next and rows else None,
+        prev_cursor=_encode("p", [rows[0].measured_at, rows[0].pk]) if has_previous and rows else None,
+    )
@@ -0,0 +1,119 @@
+# dispositivos/retention.py
+"""
+Política de retención de mediciones (MEASUREMENT_RETENTION).
+
+- Las mediciones crudas más antiguas que raw_days se compactan en rollups
+  (solo los (producto, día) que aún no tengan rollup diario) y luego se
+  borran físicamente en lotes acotados, una transacción corta por lote.
+- No se borran mediciones con eventos de alerta sin resolver: el evento
+  aún las necesita. Los eventos resueltos se van con su medición (CASCADE).
+- Los rollups horarios/diarios se podan según hourly_rollup_days /
+  daily_rollup_days (None = sin límite).
+- Con partition_after_days, los meses completos más antiguos que ese plazo
+  se desprenden a tablas mensuales (partitions.py) y, al vencer raw_days,
+  se eliminan con DROP TABLE en vez de DELETE por lotes. Una partición se
+  borra entera cuando su mes termina antes del corte.
+
+Los cortes se alinean a días completos para que un día nunca quede a medio
+compactar entre dos ejecuciones.
+"""
+from __future__ import annotations
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Min
+
+from .models import Measurement, MeasurementRollup, ProductAlertEvent
+from . import partitions
+from .rollups import bucket_start, ensure_day_rollups
+
+DEFAULT_RETENTION = {
+    "raw_days": 90, "hourly_rollup_days": 730, "daily_rollup_days": None,
+    "partition_after_days": None,
+}
+
+
+def get_policy(**overrides) -> dict:
+    policy = dict(DEFAULT_RETENTION)
+    policy.update(getattr(settings, "MEASUREMENT_RETENTION", {}))
+    policy.update({k: v for k, v in overrides.items() if v is not None})
+    return policy
+
+
+def cutoff_for(days: Optional[int], now: datetime) -> Optional[datetime]:
+    if days is None:
+        return None
+    return bucket_start(now - timedelta(days=days), MeasurementRollup.DAY)
+
+
+def expired_raw(cutoff: datetime):
+    """Mediciones (vivas o en soft delete) anteriores al corte y sin eventos pendientes."""
+    pending = ProductAlertEvent.objects.filter(is_resolved=False).values("measurement_id")
+    return Measurement.all_objects.filter(measured_at__lt=cutoff).exclude(pk__in=pending)
+
+
+def compact_raw(cutoff: datetime) -> int:
+    """
+    Asegura que cada (producto, día) a borrar tenga rollups; reconstruye solo
+    los que falten (p. ej. datos cargados antes de existir los rollups).
+    Retorna la cantidad de buckets escritos.
+    """
+    oldest = expired_raw(cutoff).aggregate(oldest=Min("measured_at"))["oldest"]
+    if oldest is None:
+        return 0
+    return ensure_day_rollups(oldest, cutoff)
+
+
+def detach_old_months(cutoff: datetime, batch_size: int = 5000) -> Dict[date, int]:
+    """
+    Desprende a su partición cada mes completo anterior al corte que tenga
+    mediciones en la tabla caliente. Retorna {mes: filas movidas}.
+    """
+    moved = {}
+    for month in Measurement.objects.filter(measured_at__lt=cutoff).dates("measured_at", "month"):
+        end = partitions.next_month(month)
+        if datetime(end.year, end.month, 1) > cutoff:
+            continue  # mes incompleto: queda en la caliente
+        moved[month] = partitions.detach_month(month, batch_size)
+    return moved
+
+
+def drop_expired_partitions(cutoff: datetime) -> list:
+    """Borra (DROP TABLE) las particiones cuyo mes terminó antes del corte."""
+    months = partitions.expired_partitions(cutoff)
+    for month in months:
+        partitions.drop_partition(month)
+    return months
+
+
+def _delete_in_batches(qs, delete_ids, batch_size: int, pause: float) -> int:
+    """Borra de a batch_size ids, cada lote en su propia transacción corta."""
+    deleted = 0
+    while True:
+        ids = list(qs.order_by().values_list("pk", flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        with transaction.atomic():
+            delete_ids(ids)
+        deleted += len(ids)
+        if pause:
+            time.sleep(pause)
+
+
+def purge_raw(cutoff: datetime, batch_size: int = 5000, pause: float = 0.0) -> int:
+    return _delete_in_batches(
+        expired_raw(cutoff),
+        lambda ids: Measurement.all_objects.filter(pk__in=ids).hard_delete(),
+        batch_size, pause,
+    )
+
+
+def purge_rollups(granularity: str, cutoff: datetime, batch_size: int = 5000, pause: float = 0.0) -> int:
+    return _delete_in_batches(
+        MeasurementRollup.objects.filter(granularity=granularity, bucket_start__lt=cutoff),
+        lambda ids: MeasurementRollup.objects.filter(pk__in=ids).delete(),
+        batch_size, pause,
+    )
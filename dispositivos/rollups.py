@@ -0,0 +1,308 @@
+# dispositivos/rollups.py
+"""
+Rollups por producto y hora/día (MeasurementRollup).
+
+- apply_measurements: actualización incremental en la ingesta (señal y bulk).
+- rebuild_rollups: recalcula un rango desde las mediciones crudas
+  (tabla caliente + particiones mensuales, ver partitions.py). Requiere
+  los crudos: los (producto, día) ya compactados por la retención (sin
+  crudos, o con menos crudos que su rollup) no se tocan.
+- summarize: resumen de una ventana; si es más larga que
+  ROLLUP_READ_MIN_WINDOW lee los rollups (O(buckets)) en lugar de las
+  mediciones (O(filas)).
+
+Los valores se agregan en la unidad canónica de su dimensión
+(units.to_canonical: °F y K como °C, W como kW...), así un producto que
+reporta en unidades mezcladas no suma peras con manzanas; la unidad queda
+en MeasurementRollup.unit.
+
+Los rollups cuentan las mediciones al ingresar; un soft delete posterior no
+los descuenta (rebuild_rollups sí lo refleja).
+"""
+from __future__ import annotations
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional, Tuple
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Max, Min, Sum
+
+from . import partitions
+from .models import Measurement, MeasurementRollup
+from .units import canonical_unit, conversion, convert, to_canonical
+
+GRANULARITIES = (MeasurementRollup.HOUR, MeasurementRollup.DAY)
+
+logger = logging.getLogger(__name__)
+
+
+def bucket_start(dt: datetime, granularity: str) -> datetime:
+    dt = dt.replace(minute=0, second=0, microsecond=0)
+    if granularity == MeasurementRollup.DAY:
+        dt = dt.replace(hour=0)
+    return dt
+
+
+class _Agg:
+    __slots__ = ("count", "min", "max", "sum", "last_value", "last_at", "unit")
+
+    def __init__(self):
+        self.count = 0
+        self.min = float("inf")
+        self.max = float("-inf")
+        self.sum = 0.0
+        self.last_value = None
+        self.last_at = None
+        self.unit = ""
+
+    def add(self, value: float, measured_at: datetime, unit: str = ""):
+        self.count += 1
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        self.sum += value
+        if self.last_at is None or measured_at >= self.last_at:
+            self.last_at, self.last_value, self.unit = measured_at, value, unit
+
+    def merge_into(self, row: MeasurementRollup):
+        row.count += self.count
+        row.min_value = min(row.min_value, self.min)
+        row.max_value = max(row.max_value, self.max)
+        row.sum_value += self.sum
+        if self.last_at >= row.last_measured_at:
+            row.last_measured_at, row.last_value, row.unit = self.last_at, self.last_value, self.unit
+
+    def to_row(self, product_id, granularity, start) -> MeasurementRollup:
+        return MeasurementRollup(
+            product_id=product_id, granularity=granularity, bucket_start=start,
+            count=self.count, min_value=self.min, max_value=self.max, sum_value=self.sum,
+            last_value=self.last_value, last_measured_at=self.last_at, unit=self.unit,
+        )
+
+
+def is_enabled() -> bool:
+    return getattr(settings, "MEASUREMENT_ROLLUPS_ENABLED", True)
+
+
+def _aggregate(rows: Iterable[Tuple[int, float, str, datetime]], aggs: Dict[tuple, _Agg] | None = None) -> Dict[tuple, _Agg]:
+    aggs = {} if aggs is None else aggs
+    for product_id, value, unit, measured_at in rows:
+        value, unit = to_canonical(value, unit)
+        for gran in GRANULARITIES:
+            key = (product_id, gran, bucket_start(measured_at, gran))
+            agg = aggs.get(key)
+            if agg is None:
+                agg = aggs[key] = _Agg()
+            agg.add(value, measured_at, unit)
+    return aggs
+
+
+def _merge(aggs: Dict[tuple, _Agg]) -> None:
+    existing = {}
+    for gran in GRANULARITIES:
+        keys = [k for k in aggs if k[1] == gran]
+        if not keys:
+            continue
+        qs = (
+            MeasurementRollup.objects.select_for_update()
+            .filter(granularity=gran,
+                    product_id__in={k[0] for k in keys},
+                    bucket_start__in={k[2] for k in keys})
+        )
+        for row in qs:
+            existing[(row.product_id, row.granularity, row.bucket_start)] = row
+
+    to_update, to_create = [], []
+    for key, agg in aggs.items():
+        row = existing.get(key)
+        if row is None:
+            to_create.append(agg.to_row(*key))
+        else:
+            agg.merge_into(row)
+            to_update.append(row)
+    if to_update:
+        MeasurementRollup.objects.bulk_update(
+            to_update, ["count", "min_value", "max_value", "sum_value", "last_value", "last_measured_at", "unit"]
+        )
+    if to_create:
+        MeasurementRollup.objects.bulk_create(to_create)
+
+
+def apply_measurements(measurements: Iterable[Measurement]) -> None:
+    """Suma un lote de mediciones nuevas a sus buckets (hora y día)."""
+    if not is_enabled():
+        return
+    aggs = _aggregate((m.product_id, m.value, m.unit, m.measured_at) for m in measurements if m.product_id)
+    if not aggs:
+        return
+    # Si otro escritor crea el mismo bucket en paralelo, el UniqueConstraint
+    # hace fallar el INSERT; se reintenta una vez, ya como UPDATE.
+    for attempt in range(2):
+        try:
+            with transaction.atomic():
+                _merge(aggs)
+            return
+        except IntegrityError:
+            if attempt:
+                raise
+
+
+def _rebuildable(day: datetime, next_day: datetime, product_ids: Optional[list]) -> set:
+    """
+    Productos del día cuyas mediciones crudas (vivas o en soft delete; caliente
+    o partición) cubren al menos lo que cuenta su rollup diario. Si hay menos
+    crudos que el rollup, parte del día ya fue compactada (purge_raw deja las
+    filas con eventos pendientes; una partición vencida se borra entera) y
+    reconstruir perdería historia: esos productos se saltan.
+    """
+    hot = Measurement.all_objects.filter(measured_at__gte=day, measured_at__lt=next_day)
+    if product_ids is not None:
+        hot = hot.filter(product_id__in=product_ids)
+    raw: Dict[int, int] = {}
+    for qs in [hot] + partitions.querysets(day, next_day, product_ids)[1:]:
+        for product_id, n in qs.order_by().values("product_id").annotate(n=Count("id")).values_list("product_id", "n"):
+            raw[product_id] = raw.get(product_id, 0) + n
+    rolled = dict(
+        MeasurementRollup.objects.filter(granularity=MeasurementRollup.DAY, bucket_start=day)
+        .filter(**({"product_id__in": product_ids} if product_ids is not None else {}))
+        .values_list("product_id", "count")
+    )
+    skipped = sorted(pid for pid, n in rolled.items() if raw.get(pid, 0) < n)
+    if skipped:
+        logger.warning("rebuild_rollups: %s sin crudos completos para %s; se conservan sus rollups",
+                       f"{day:%Y-%m-%d}", skipped)
+    return {pid for pid in raw if pid not in skipped}
+
+
+def rebuild_rollups(since: datetime, until: datetime, product_ids: Optional[Iterable[int]] = None,
+                    chunk_size: int = 5000) -> int:
+    """
+    Recalcula los rollups de [since, until) desde las mediciones vivas (tabla
+    caliente y particiones mensuales que se crucen con el rango).
+    El rango se alinea a días completos y se procesa un día a la vez: la
+    memoria queda acotada a los buckets de un día. Retorna los buckets escritos.
+
+    Precondición: las mediciones crudas del (producto, día) deben seguir ahí.
+    Los rollups del par se borran y se reescriben desde los crudos, así que
+    solo se tocan los pares con crudos que cubren el conteo del rollup diario
+    (_rebuildable); los ya compactados por la retención (purge_raw,
+    particiones borradas) conservan sus rollups, que son su única historia.
+    """
+    since = bucket_start(since, MeasurementRollup.DAY)
+    until_day = bucket_start(until, MeasurementRollup.DAY)
+    until = until_day if until_day == until else until_day + timedelta(days=1)
+    if product_ids is not None:
+        product_ids = list(product_ids)
+
+    written = 0
+    with transaction.atomic():
+        day = since
+        while day < until:
+            next_day = day + timedelta(days=1)
+            present = _rebuildable(day, next_day, product_ids)
+            if present:
+                MeasurementRollup.objects.filter(
+                    product_id__in=present, bucket_start__gte=day, bucket_start__lt=next_day
+                ).delete()
+                aggs: Dict[tuple, _Agg] = {}
+                # Un mismo día puede estar en la caliente y en su partición
+                # (filas con eventos no se mueven): se suman ambas fuentes.
+                for qs in partitions.querysets(day, next_day, present):
+                    _aggregate(qs.order_by().values_list("product_id", "value", "unit", "measured_at")
+                               .iterator(chunk_size=chunk_size), aggs)
+                written += _flush(aggs)
+            day = next_day
+    return written
+
+
+def ensure_day_rollups(since: datetime, until: datetime) -> int:
+    """
+    Reconstruye solo los (producto, día) de [since, until) que tienen
+    mediciones en la tabla caliente pero no rollup diario (p. ej. datos
+    cargados antes de existir los rollups). Retorna los buckets escritos.
+    """
+    written = 0
+    day = bucket_start(since, MeasurementRollup.DAY)
+    while day < until:
+        next_day = day + timedelta(days=1)
+        with_raw = set(
+            Measurement.objects.filter(measured_at__gte=day, measured_at__lt=next_day)
+            .values_list("product_id", flat=True).distinct()
+        )
+        with_rollup = set(
+            MeasurementRollup.objects.filter(granularity=MeasurementRollup.DAY, bucket_start=day)
+            .values_list("product_id", flat=True)
+        )
+        missing = with_raw - with_rollup
+        if missing:
+            written += rebuild_rollups(day, next_day, missing)
+        day = next_day
+    return written
+
+
+def _flush(aggs: Dict[tuple, _Agg]) -> int:
+    new_rows = [agg.to_row(*key) for key, agg in aggs.items()]
+    MeasurementRollup.objects.bulk_create(new_rows, batch_size=1000)
+    return len(new_rows)
+
+
+def summarize(product_ids: Iterable[int], since: datetime, until: datetime) -> dict:
+    """
+    count/min/max/avg y última lectura de [since, until) para los productos,
+    en unidad canónica (`unit`). Ventanas largas se leen de rollups
+    (granularidad horaria, o diaria sobre ROLLUP_DAILY_MIN_WINDOW); los
+    bordes quedan alineados al bucket.
+    """
+    product_ids = list(product_ids)
+    window = until - since
+    min_window = getattr(settings, "ROLLUP_READ_MIN_WINDOW", timedelta(hours=6))
+
+    if is_enabled() and window > min_window:
+        daily_from = getattr(settings, "ROLLUP_DAILY_MIN_WINDOW", timedelta(days=31))
+        gran = MeasurementRollup.DAY if window >= daily_from else MeasurementRollup.HOUR
+        qs = MeasurementRollup.objects.filter(
+            product_id__in=product_ids, granularity=gran,
+            bucket_start__gte=bucket_start(since, gran), bucket_start__lt=until,
+        )
+        agg = qs.aggregate(n=Sum("count"), lo=Min("min_value"), hi=Max("max_value"), total=Sum("sum_value"))
+        last = qs.order_by("-last_measured_at").values_list("last_value", "last_measured_at", "unit").first()
+        count = agg["n"] or 0
+        return {
+            "source": "rollup", "granularity": gran, "count": count,
+            "min": agg["lo"], "max": agg["hi"],
+            "avg": agg["total"] / count if count else None,
+            "last_value": last[0] if last else None,
+            "last_measured_at": last[1] if last else None,
+            "unit": last[2] if last else None,
+        }
+
+    # Ventana corta: mediciones crudas de la caliente y de las particiones
+    # que se crucen con la ventana (normalmente ninguna). Se agrega por
+    # unidad y se convierte cada grupo (conversión lineal con escala > 0:
+    # conserva el orden de min/max).
+    count, lo, hi, total, last = 0, None, None, 0.0, None
+    for qs in partitions.querysets(since, until, product_ids):
+        groups = list(
+            qs.order_by().values("unit")
+            .annotate(n=Count("id"), lo=Min("value"), hi=Max("value"), total=Sum("value"))
+        )
+        if not groups:
+            continue
+        for agg in groups:
+            factors = conversion(agg["unit"], canonical_unit(agg["unit"]))
+            count += agg["n"]
+            total += agg["total"] * factors[0] + agg["n"] * factors[1]
+            group_lo, group_hi = convert(agg["lo"], factors), convert(agg["hi"], factors)
+            lo = group_lo if lo is None else min(lo, group_lo)
+            hi = group_hi if hi is None else max(hi, group_hi)
+        value, measured_at, unit = qs.order_by("-measured_at").values_list("value", "measured_at", "unit").first()
+        if last is None or measured_at > last[1]:
+            value, unit = to_canonical(value, unit)
+            last = (value, measured_at, unit)
+    return {
+        "source": "raw", "granularity": None, "count": count,
+        "min": lo, "max": hi, "avg": total / count if count else None,
+        "last_value": last[0] if last else None,
+        "last_measured_at": last[1] if last else None,
+        "unit": last[2] if last else None,
+    }
@@ -0,0 +1,145 @@
+# dispositivos/rules.py
+"""
+Índice de reglas (ProductAlert) compilado en memoria del proceso.
+
+Por producto guarda, para cada unidad normalizada, los intervalos ordenados
+por range_min; evaluar un valor es convertirlo a la unidad del grupo
+(units.conversion, cacheada por par) y un bisect en lugar de una consulta.
+Se invalida por señales (ver signals.py) y, como red de seguridad entre
+procesos, cada entrada expira tras ALERT_RULE_INDEX_TTL segundos.
+"""
+from __future__ import annotations
+import threading
+import time
+from bisect import bisect_right
+from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List
+
+from django.conf import settings
+
+from .metrics import RULE_INDEX_LOOKUPS
+from .models import ProductAlert
+from .units import conversion, convert
+
+
+class CompiledRules:
+    """Reglas de un producto agrupadas por unidad normalizada ('' = comodín)."""
+    __slots__ = ("groups", "compiled_at", "severities")
+
+    def __init__(self, rules: Iterable[tuple], severities: Dict[int, str] | None = None):
+        # rules: (rule_id, unit_norm, range_min, range_max)
+        # severities: rule_id -> severidad de la Alert (para métricas)
+        self.severities = severities or {}
+        by_unit = defaultdict(list)
+        for rule_id, unit, rmin, rmax in rules:
+            by_unit[unit].append((rmin, rmax, rule_id))
+        self.groups = {}
+        for unit, items in by_unit.items():
+            items.sort()
+            self.groups[unit] = (
+                [i[0] for i in items],
+                [i[1] for i in items],
+                [i[2] for i in items],
+            )
+        self.compiled_at = time.monotonic()
+
+    def __bool__(self):
+        return bool(self.groups)
+
+    def rules(self) -> Iterator[tuple]:
+        """(rule_id, unit_norm, range_min, range_max) de todas las reglas."""
+        for unit, (mins, maxs, ids) in self.groups.items():
+            for rmin, rmax, rule_id in zip(mins, maxs, ids):
+                yield rule_id, unit, rmin, rmax
+
+    def match(self, value: float, unit_norm: str) -> List[int]:
+        """Ids de ProductAlert cuyo rango inclusivo contiene value (convertido a la unidad de cada regla)."""
+        matched = []
+        for unit, (mins, maxs, ids) in self.groups.items():
+            factors = conversion(unit_norm, unit)
+            if factors is None:
+                continue  # otra dimensión o unidad desconocida distinta
+            v = convert(value, factors)
+            # candidatos: range_min <= v
+            for i in range(bisect_right(mins, v)):
+                if v <= maxs[i]:
+                    matched.append(ids[i])
+        return matched
+
+
+class RuleIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_product: Dict[int, CompiledRules] = {}
+        self._stats = {"hits": 0, "misses": 0, "rebuilds": 0, "invalidations": 0}
+        # Generación: sube en cada invalidación. Una compilación solo se guarda
+        # si nada invalidó su producto (ni todo el índice) desde que leyó las
+        # reglas; si no, una señal entre la lectura y el guardado se perdería.
+        self._generation = 0
+        self._cleared_at = 0
+        self._invalidated_at: Dict[int, int] = {}
+
+    def _ttl(self) -> float:
+        return getattr(settings, "ALERT_RULE_INDEX_TTL", 300)
+
+    def get_many(self, product_ids: Iterable[int]) -> Dict[int, CompiledRules]:
+        """Reglas compiladas por producto; compila los faltantes con una sola consulta."""
+        product_ids = set(product_ids)
+        now = time.monotonic()
+        ttl = self._ttl()
+        found, missing = {}, []
+        with self._lock:
+            for pid in product_ids:
+                entry = self._by_product.get(pid)
+                if entry is not None and now - entry.compiled_at < ttl:
+                    found[pid] = entry
+                else:
+                    missing.append(pid)
+            self._stats["hits"] += len(found)
+            self._stats["misses"] += len(missing)
+            generation = self._generation
+        RULE_INDEX_LOOKUPS.inc_many({("hit",): len(found), ("miss",): len(missing)})
+
+        if missing:
+            rows, severities = defaultdict(list), defaultdict(dict)
+            from .services import _norm_unit
+            for rule_id, pid, unit, rmin, rmax, severity in (
+                ProductAlert.objects
+                .filter(product_id__in=missing)
+                .values_list("pk", "product_id", "unit", "range_min", "range_max", "alert__severity")
+            ):
+                rows[pid].append((rule_id, _norm_unit(unit), rmin, rmax))
+                severities[pid][rule_id] = severity
+            compiled = {pid: CompiledRules(rows.get(pid, ()), severities.get(pid)) for pid in missing}
+            with self._lock:
+                if self._cleared_at <= generation:
+                    self._by_product.update(
+                        (pid, entry) for pid, entry in compiled.items()
+                        if self._invalidated_at.get(pid, 0) <= generation
+                    )
+                self._stats["rebuilds"] += len(compiled)
+            found.update(compiled)
+        return found
+
+    def get(self, product_id: int) -> CompiledRules:
+        return self.get_many([product_id])[product_id]
+
+    def invalidate(self, product_id: int | None = None) -> None:
+        """Invalida un producto, o todo el índice si product_id es None."""
+        with self._lock:
+            self._generation += 1
+            if product_id is None:
+                self._by_product.clear()
+                self._invalidated_at.clear()
+                self._cleared_at = self._generation
+            else:
+                self._by_product.pop(product_id, None)
+                self._invalidated_at[product_id] = self._generation
+            self._stats["invalidations"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, products=len(self._by_product))
+
+
+rule_index = RuleIndex()
@@ -0,0 +1,175 @@
+# dispositivos/seed.py
+"""
+Flota sintética para benchmarks (no para producción).
+
+seed_fleet crea organizaciones, zonas, categorías, dispositivos, productos
+con tres reglas (MEDIANO/ALTO/GRAVE) y mediciones con distribuciones
+parecidas a las reales:
+
+- actividad por producto de cola larga (Pareto): pocos productos reportan
+  mucho y la mayoría poco;
+- cada producto oscila alrededor de su propia línea base, con ruido
+  gaussiano y excursiones ocasionales que disparan alertas;
+- lecturas a intervalos regulares con jitter dentro de la ventana de días.
+
+Todo se inserta con bulk_create en lotes (sin señales). Con derived=True
+se llenan también latest_measurement y los rollups del rango.
+"""
+from __future__ import annotations
+import math
+import random
+from datetime import timedelta
+from typing import Callable, Optional
+
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from core.models import Organization
+from .models import (
+    Alert, Category, Device, LatestMeasurement, Measurement, Product, ProductAlert,
+    ProductAlertEvent, Zone,
+)
+
+SEVERITIES = ("MEDIANO", "ALTO", "GRAVE")
+# (categoría, unidad, rango de línea base, desviación típica)
+CATEGORIES = (
+    ("Temperatura", "°C", (18, 60), 2.5),
+    ("Energía", "kWh", (5, 120), 6.0),
+    ("Voltaje", "V", (210, 240), 1.5),
+    ("Corriente", "A", (2, 40), 1.8),
+    ("Presión", "bar", (1, 10), 0.3),
+    ("Humedad", "%", (30, 70), 3.0),
+)
+EXCURSION_RATIO = 0.01
+
+
+def _rules_for(baseline: float, sigma: float):
+    """Rangos MEDIANO/ALTO/GRAVE relativos a la línea base del producto."""
+    lo, mid, hi = baseline + 4 * sigma, baseline + 6 * sigma, baseline + 9 * sigma
+    return ((SEVERITIES[0], lo, mid), (SEVERITIES[1], mid + 0.01, hi), (SEVERITIES[2], hi + 0.01, 9_999_999))
+
+
+def seed_fleet(products: int = 200, measurements: int = 100_000, organizations: int = 1,
+               products_per_device: int = 4, devices_per_zone: int = 10, days: int = 90,
+               deleted_ratio: float = 0.02, resolved_ratio: float = 0.8, seed: int = 42,
+               batch_size: int = 5000, prefix: str = "fleet", derived: bool = True,
+               progress: Optional[Callable[[int], None]] = None) -> dict:
+    """
+    Crea la flota y retorna cuántas filas de cada tipo se insertaron.
+    Los nombres llevan `prefix`: para sembrar dos veces, usar otro prefijo.
+    progress(n) se llama tras cada lote con el total de mediciones insertadas.
+    """
+    rnd = random.Random(seed)
+    now = timezone.now().replace(microsecond=0)
+
+    orgs = Organization.objects.bulk_create([
+        Organization(name=f"{prefix}-org-{i}") for i in range(organizations)
+    ])
+    n_devices = max(1, math.ceil(products / products_per_device))
+    zones = Zone.objects.bulk_create([
+        Zone(name=f"{prefix}-zona-{i:04d}", organization=orgs[i % organizations])
+        for i in range(max(organizations, math.ceil(n_devices / devices_per_zone)))
+    ])
+    categories = Category.objects.bulk_create([
+        Category(name=f"{prefix}-{name}") for name, _, _, _ in CATEGORIES
+    ])
+    devices = Device.objects.bulk_create([
+        Device(name=f"{prefix}-dev-{i:06d}", serial_number=f"{prefix}-D{i:06d}",
+               zone=zone, organization_id=zone.organization_id, installed_at=now - timedelta(days=days))
+        for i, zone in ((i, zones[i % len(zones)]) for i in range(n_devices))
+    ])
+
+    profiles, prods = [], []
+    for i in range(products):
+        kind = rnd.randrange(len(CATEGORIES))
+        _, unit, (b_lo, b_hi), sigma = CATEGORIES[kind]
+        profiles.append((unit, rnd.uniform(b_lo, b_hi), sigma * rnd.uniform(0.5, 1.5)))
+        prods.append(Product(
+            name=f"{prefix}-prod-{i:06d}", serial_number=f"{prefix}-P{i:06d}",
+            category=categories[kind], device=devices[i % n_devices],
+        ))
+    prods = Product.objects.bulk_create(prods, batch_size=batch_size)
+
+    alerts = {
+        sev: Alert.objects.get_or_create(severity=sev, defaults={"message": f"Alerta {sev.title()}"})[0]
+        for sev in SEVERITIES
+    }
+    rules = ProductAlert.objects.bulk_create([
+        ProductAlert(product=p, alert=alerts[sev], range_min=lo, range_max=hi, unit=unit)
+        for p, (unit, base, sigma) in zip(prods, profiles)
+        for sev, lo, hi in _rules_for(base, sigma)
+    ], batch_size=batch_size)
+    rules_by_product = {}
+    for rule in rules:
+        rules_by_product.setdefault(rule.product_id, []).append(rule)
+
+    # Cola larga: pesos Pareto normalizados al total pedido
+    weights = [rnd.paretovariate(1.2) for _ in prods]
+    total_w = sum(weights)
+    per_product = [max(1, round(measurements * w / total_w)) for w in weights]
+
+    counts = {"measurements": 0, "events": 0}
+    latest = {}
+    span = days * 86400
+    pending = []
+
+    def flush():
+        created = Measurement.objects.bulk_create(pending)
+        events = []
+        for m in created:
+            if m.deleted_at is not None:
+                continue
+            for rule in rules_by_product[m.product_id]:
+                if rule.range_min <= m.value <= rule.range_max:
+                    events.append(ProductAlertEvent(
+                        product_alert=rule, measurement=m, is_resolved=rnd.random() < resolved_ratio,
+                    ))
+        ProductAlertEvent.objects.bulk_create(events, batch_size=batch_size)
+        counts["measurements"] += len(created)
+        counts["events"] += len(events)
+        pending.clear()
+        if progress:
+            progress(counts["measurements"])
+
+    for p, (unit, base, sigma), n in zip(prods, profiles, per_product):
+        step = span / n
+        for k in range(n):
+            offset = span - (k + rnd.random()) * step
+            value = rnd.gauss(base, sigma)
+            if rnd.random() < EXCURSION_RATIO:
+                value += sigma * rnd.uniform(4, 12)
+            m = Measurement(
+                product=p, value=round(max(value, 0.0), 2), unit=unit,
+                measured_at=now - timedelta(seconds=offset),
+                deleted_at=now if rnd.random() < deleted_ratio else None,
+            )
+            pending.append(m)
+            if m.deleted_at is None and (p.pk not in latest or m.measured_at > latest[p.pk].measured_at):
+                latest[p.pk] = m
+            if len(pending) >= batch_size:
+                flush()
+    if pending:
+        flush()
+
+    # created_at es auto_now_add: se alinea con la medición para que los
+    # eventos queden repartidos en el tiempo como en producción
+    ProductAlertEvent.all_objects.filter(product_alert__product__device__organization__in=orgs).update(
+        created_at=Subquery(
+            Measurement.all_objects.filter(pk=OuterRef("measurement_id")).values("measured_at")[:1]
+        )
+    )
+
+    if derived:
+        from .rollups import rebuild_rollups
+        LatestMeasurement.objects.bulk_create([
+            LatestMeasurement(product_id=pid, measurement=m, value=m.value, unit=m.unit, measured_at=m.measured_at)
+            for pid, m in latest.items()
+        ], batch_size=batch_size)
+        # Sin filtro por producto (evita un IN gigante); reconstruir desde crudo
+        # es idempotente para el resto de los productos del rango.
+        rebuild_rollups(now - timedelta(days=days), now + timedelta(days=1))
+
+    return {
+        "organizations": len(orgs), "zones": len(zones), "devices": len(devices),
+        "products": len(prods), "rules": len(rules), **counts,
+    }
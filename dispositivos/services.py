@@ -1,18 +1,28 @@
 from __future__ import annotations
-from typing import List
+from typing import Iterable, List, Tuple
+from django.conf import settings
 from django.db import transaction
+from django.db.models import Case, Q, QuerySet, Value, When
+from django.utils import timezone
 
-from .models import Measurement, ProductAlert, ProductAlertEvent
+from .models import Measurement, Product, ProductAlertEvent
+from .rules import rule_index
+from . import partitions, rollups
+from .latest import update_latest
+from . import dashboard_cache
+from .metrics import ALERT_EVALUATION_SECONDS, ALERT_EVENTS_RESOLVED, record_events, record_ingest
+from . import live
+from . import incidents
+from . import units
 
 
 def _norm_unit(u: str | None) -> str:
     """
-    Normaliza unidades: minúsculas y elimina caracteres no alfanuméricos,
-    para que '°C', 'C', 'c' se consideren equivalentes.
+    Normaliza unidades al símbolo del registro (units.normalize), para que
+    '°C', 'C', 'c' se consideren equivalentes; las desconocidas quedan en
+    minúsculas y sin caracteres no alfanuméricos.
     """
-    if not u:
-        return ""
-    return "".join(ch for ch in u.lower().strip() if ch.isalnum())
+    return units.normalize(u)
 
 
 @transaction.atomic
@@ -21,42 +31,229 @@ def generate_alert_events_for_measurement(measurement: Measurement) -> List[Prod
     Evalúa la medición contra las reglas (ProductAlert) del producto y crea
     ProductAlertEvent cuando corresponde.
 
-    - Evita duplicados por (product_alert, measurement) con get_or_create.
+    - Evita duplicados por (product_alert, measurement) con la restricción
+      única y un INSERT que ignora conflictos (ver _insert_events): sin
+      SELECT previo y seguro con escritores en paralelo.
     - Rango inclusivo: [range_min, range_max].
     - Si la unidad de la regla está vacía, se toma como comodín (match con cualquiera).
-      Si no está vacía, se compara normalizada con la de la medición.
+      Si no está vacía, el valor se convierte a la unidad de la regla (°F -> °C,
+      W -> kW, ver units.py); una unidad de otra dimensión o desconocida y
+      distinta no calza.
+    - Las reglas salen de rules.rule_index (compiladas por producto).
     - **No** filtramos por estado aquí para no depender de defaults durante tests.
-      Si quieres volver a exigirlo, añade .filter(estado=True) a la QuerySet de rules.
+      Si quieres volver a exigirlo, añade .filter(estado=True) a la consulta de RuleIndex.
+    - Con ALERT_INCIDENT_MODE se extiende el incidente abierto de la regla en
+      vez de crear un evento por lectura (ver incidents.py); retorna solo los
+      incidentes nuevos.
     """
     created: List[ProductAlertEvent] = []
 
-    product = measurement.product
-    if not product:
+    if not measurement.product_id:
         return created
 
-    val = measurement.value
-    mu  = _norm_unit(measurement.unit)
+    with ALERT_EVALUATION_SECONDS.time(mode="single"):
+        # Reglas compiladas del índice en memoria (sin consulta si están en caché)
+        rules = rule_index.get(measurement.product_id)
+        if incidents.is_enabled():
+            created = incidents.evaluate([measurement], {measurement.product_id: rules})
+        else:
+            created = _insert_events([
+                (rule_id, measurement.pk)
+                for rule_id in rules.match(measurement.value, _norm_unit(measurement.unit))
+            ])
 
-    # Quita el filtro por estado para que el test no dependa de defaults
-    rules = (
-        ProductAlert.objects
-        .select_related("alert", "product")
-        .filter(product=product)
+    record_events(created, {measurement.product_id: rules})
+    live.publish_events(created, {measurement.pk: measurement}, {measurement.product_id: rules})
+    return created
+
+
+@transaction.atomic
+def generate_alert_events_for_measurements(measurements: Iterable[Measurement]) -> List[ProductAlertEvent]:
+    """
+    Versión por lotes de generate_alert_events_for_measurement.
+
+    - Reglas desde rule_index (a lo más una consulta para los productos no cacheados).
+    - Un INSERT por tramo que ignora los pares ya existentes (reprocesar el
+      lote o un worker en paralelo no duplica) y retorna solo los nuevos.
+    - Misma semántica: rango inclusivo, unidad vacía como comodín y
+      conversión a la unidad de la regla.
+    - Desde ALERT_VECTORIZED_MIN_BATCH filas se usa el motor NumPy (engine.py).
+    - Con ALERT_INCIDENT_MODE, incidentes en vez de un evento por lectura
+      (incidents.py); el lote se recorre en orden temporal.
+    """
+    measurements = [m for m in measurements if m.pk and m.product_id]
+    if not measurements:
+        return []
+
+    vectorized = len(measurements) >= getattr(settings, "ALERT_VECTORIZED_MIN_BATCH", 2000)
+    with ALERT_EVALUATION_SECONDS.time(mode="vectorized" if vectorized else "batch"):
+        rules_by_product = rule_index.get_many({m.product_id for m in measurements})
+        if incidents.is_enabled():
+            created = incidents.evaluate(measurements, rules_by_product)
+        else:
+            created = _create_batch_events(measurements, rules_by_product, vectorized)
+    record_events(created, rules_by_product)
+    live.publish_events(created, {m.pk: m for m in measurements}, rules_by_product)
+    return created
+
+
+def _create_batch_events(measurements, rules_by_product, vectorized: bool) -> List[ProductAlertEvent]:
+    if vectorized:
+        # Lotes grandes: evaluación vectorizada (NumPy) en vez de loop por fila
+        from .engine import RuleTable, evaluate
+        table = RuleTable.from_compiled(rules_by_product)
+        meas_idx, rule_ids = evaluate(
+            table,
+            [m.product_id for m in measurements],
+            [m.value for m in measurements],
+            table.encode_units(_norm_unit(m.unit) for m in measurements),
+        )
+        pairs = [(int(r), measurements[int(i)].pk) for i, r in zip(meas_idx, rule_ids)]
+    else:
+        pairs = []
+        for m in measurements:
+            rules = rules_by_product[m.product_id]
+            if rules:
+                pairs.extend((rule_id, m.pk) for rule_id in rules.match(m.value, _norm_unit(m.unit)))
+
+    return _insert_events(pairs)
+
+
+def _insert_events(pairs: List[Tuple[int, int]]) -> List[ProductAlertEvent]:
+    """
+    Inserta eventos (rule_id, measurement_id) ignorando los que ya existen
+    (restricción pae_rule_measurement_uniq) y retorna solo los insertados.
+
+    Solo API pública: se descuentan los pares que ya existían, se inserta con
+    bulk_create(ignore_conflicts=True) (INSERT ... ON CONFLICT DO NOTHING /
+    INSERT IGNORE, que no devuelve pks) y se leen los pares nuevos. Dos
+    procesos con el mismo lote nunca duplican un evento; en una carrera
+    ambos pueden reportarlo como nuevo (reprocesar ya es al-menos-una-vez).
+    """
+    if not pairs:
+        return []
+    pairs = list(dict.fromkeys(pairs))
+    measurement_ids = {m_id for _, m_id in pairs}
+    existing = set(
+        ProductAlertEvent.all_objects
+        .filter(measurement_id__in=measurement_ids)
+        .values_list("product_alert_id", "measurement_id")
     )
+    wanted = {pair for pair in pairs if pair not in existing}
+    if not wanted:
+        return []
+    ProductAlertEvent.objects.bulk_create(
+        [ProductAlertEvent(product_alert_id=rule_id, measurement_id=m_id, is_resolved=False)
+         for rule_id, m_id in pairs if (rule_id, m_id) in wanted],
+        ignore_conflicts=True,
+    )
+    created = [
+        e for e in ProductAlertEvent.objects.filter(measurement_id__in={m_id for _, m_id in wanted})
+        if (e.product_alert_id, e.measurement_id) in wanted
+    ]
+    if created:
+        # bulk_create no dispara post_save: invalidar el dashboard a mano
+        dashboard_cache.bump(*dashboard_cache.sections_for_model(ProductAlertEvent._meta.label))
+    return created
+
 
-    for rule in rules:
-        rule_unit_norm = _norm_unit(rule.unit)
-        # Si la regla trae unidad, debe coincidir; si está vacía, acepta cualquier unidad
-        if rule_unit_norm and rule_unit_norm != mu:
-            continue
-
-        if rule.range_min <= val <= rule.range_max:
-            evt, was_created = ProductAlertEvent.objects.get_or_create(
-                product_alert=rule,
-                measurement=measurement,
-                defaults={"is_resolved": False},
-            )
-            if was_created:
-                created.append(evt)
-
-    return created
\ No newline at end of file
+@transaction.atomic
+def bulk_ingest_measurements(rows: Iterable[dict], evaluate_alerts: bool = True) -> Tuple[List[Measurement], List[ProductAlertEvent]]:
+    """
+    Ingesta masiva de mediciones.
+
+    Cada fila es un dict con product_id, value, unit y measured_at (ya validados).
+    Inserta con bulk_create (no dispara post_save), actualiza rollups y
+    última lectura por producto, y evalúa las reglas de todo el lote en una
+    sola pasada. Con ALERT_EVALUATION_ASYNC solo encola las mediciones
+    (ver alert_queue.py) y retorna una lista vacía de eventos.
+    Con evaluate_alerts=False no evalúa ni encola (el llamador lo hará después,
+    p. ej. con evaluate_measurements_by_pk_range).
+    Las filas de meses particionados (ver partitions.py) no se retornan.
+    """
+    # Filas atrasadas de meses ya desprendidos van directo a su partición:
+    # cuentan para los rollups, pero no para la última lectura ni alertas.
+    rows, archived = partitions.route_rows(list(rows))
+    measurements = Measurement.objects.bulk_create([
+        Measurement(
+            product_id=row["product_id"],
+            value=row["value"],
+            unit=row.get("unit") or "",
+            measured_at=row["measured_at"],
+        )
+        for row in rows
+    ])
+    rollups.apply_measurements(measurements + archived)
+    update_latest(measurements)
+    record_ingest(measurements + archived)
+    if not evaluate_alerts:
+        return measurements, []
+    from .alert_queue import enqueue_measurements, is_async_enabled
+    if is_async_enabled():
+        enqueue_measurements(m.pk for m in measurements)
+        return measurements, []
+    events = generate_alert_events_for_measurements(measurements)
+    return measurements, events
+
+
+def evaluate_measurements_by_pk_range(first_pk: int, last_pk: int, chunk_size: int = 5000) -> int:
+    """
+    Evalúa alertas de las mediciones con pk en [first_pk, last_pk], por tramos
+    de chunk_size (memoria constante). Retorna la cantidad de eventos creados.
+    Evalúa todo lo que haya en el rango: el llamador pasa solo tramos que
+    insertó él (ver import_measurements).
+    """
+    created = 0
+    lo = first_pk
+    while lo <= last_pk:
+        hi = min(lo + chunk_size - 1, last_pk)
+        created += len(generate_alert_events_for_measurements(
+            Measurement.objects.filter(pk__gte=lo, pk__lte=hi)
+        ))
+        lo = hi + 1
+    return created
+
+
+def resolve_events(queryset: QuerySet, source: str = "bulk", chunk_size: int | None = None) -> int:
+    """
+    Marca como resueltos los eventos pendientes del queryset con UPDATE por
+    tramos de pk (cada tramo en su transacción, para no bloquear la tabla
+    entera con millones de filas). Invalida el dashboard y cuenta en
+    ecoenergy_alert_events_resolved_total{source}. Retorna cuántos resolvió.
+    """
+    chunk_size = chunk_size or getattr(settings, "ALERT_RESOLVE_CHUNK_SIZE", 5000)
+    pending = queryset.filter(is_resolved=False).order_by()
+    now = timezone.now()
+    resolved, last_pk = 0, 0
+    while True:
+        # límite superior del tramo: el pk número chunk_size desde last_pk
+        bound = list(pending.filter(pk__gt=last_pk).order_by("pk").values_list("pk", flat=True)[chunk_size - 1:chunk_size])
+        chunk = pending.filter(pk__gt=last_pk)
+        if bound:
+            chunk = chunk.filter(pk__lte=bound[0])
+        with transaction.atomic():
+            resolved += chunk.update(is_resolved=True, resolved_at=now, updated_at=now)
+        if not bound:
+            break
+        last_pk = bound[0]
+    if resolved:
+        # update() no dispara post_save
+        dashboard_cache.bump(*dashboard_cache.sections_for_model(ProductAlertEvent._meta.label))
+        ALERT_EVENTS_RESOLVED.inc(resolved, source=source)
+    return resolved
+
+
+def assign_products(device, product_ids: Iterable[int]) -> int:
+    """
+    Deja asociados a device exactamente los productos product_ids con un solo
+    UPDATE que toca solo las filas que cambian (los que entran y los que
+    salen), sin leer antes los asociados. Retorna cuántas filas cambió.
+    """
+    selected = {int(pk) for pk in product_ids}
+    changed = Product.objects.filter(
+        (Q(device=device) & ~Q(pk__in=selected)) | (Q(pk__in=selected) & ~Q(device=device))
+    ).update(device=Case(When(pk__in=selected, then=Value(device.pk)), default=None))
+    if changed:
+        # update() no dispara post_save
+        dashboard_cache.bump(*dashboard_cache.sections_for_model(Product._meta.label))
+    return changed
@@ -1,10 +1,71 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from .models import Measurement
+from core.models import rows_deleted
+from .models import Measurement, Product, Alert, ProductAlert
+from . import dashboard_cache
+from .rules import rule_index
 from .services import generate_alert_events_for_measurement
+from .alert_queue import enqueue_measurements, is_async_enabled
+from . import rollups
+from .latest import refresh_after_delete, update_latest
+from .metrics import record_ingest
 
 @receiver(post_save, sender=Measurement)
 def measurement_post_save(sender, instance: Measurement, created, **kwargs):
     # Para el test es suficiente con que se ejecute al crear
     if created:
-        generate_alert_events_for_measurement(instance)
+        rollups.apply_measurements([instance])
+        update_latest([instance])
+        record_ingest([instance])
+        if is_async_enabled():
+            # Modo diferido: solo encola; alert_worker evalúa fuera de esta transacción
+            enqueue_measurements([instance.pk])
+        else:
+            generate_alert_events_for_measurement(instance)
+
+
+@receiver(rows_deleted, sender=Measurement)
+def measurement_deleted(sender, pks, hard, **kwargs):
+    # latest_measurement no debe seguir mostrando una lectura borrada
+    refresh_after_delete(pks, hard)
+
+
+# Invalida el índice de reglas compiladas (rules.rule_index).
+# Ojo: QuerySet.update() no dispara señales; tras updates masivos de reglas
+# hay que llamar a rule_index.invalidate() a mano.
+@receiver(post_save, sender=ProductAlert)
+@receiver(post_delete, sender=ProductAlert)
+def product_alert_changed(sender, instance: ProductAlert, **kwargs):
+    rule_index.invalidate(instance.product_id)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def product_changed(sender, instance: Product, **kwargs):
+    rule_index.invalidate(instance.pk)
+
+
+@receiver(post_save, sender=Alert)
+@receiver(post_delete, sender=Alert)
+def alert_changed(sender, instance: Alert, **kwargs):
+    rule_index.invalidate()
+
+
+# Invalida las secciones del dashboard que dependen del modelo que cambió.
+# Los caminos masivos (bulk_create/update) llaman a dashboard_cache.bump() a mano.
+def _bump_dashboard(sender, **kwargs):
+    sections = dashboard_cache.sections_for_model(sender._meta.label)
+    if sections:
+        dashboard_cache.bump(*sections)
+
+
+def _connect_dashboard_invalidation():
+    from django.apps import apps
+    labels = {label for models in dashboard_cache.SECTIONS.values() for label in models}
+    for label in labels:
+        model = apps.get_model(label)
+        post_save.connect(_bump_dashboard, sender=model, dispatch_uid=f"dashboard-save-{label}")
+        post_delete.connect(_bump_dashboard, sender=model, dispatch_uid=f"dashboard-delete-{label}")
+
+
+_connect_dashboard_invalidation()
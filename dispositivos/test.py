@@ -1,11 +1,23 @@
 # Create your tests here.
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+from datetime import timedelta
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
 from django.utils import timezone
+from django.contrib.auth import get_user_model
 from core.models import Organization
+from core.testing import QueryBudgetMixin, url_names
 from dispositivos.models import Zone, Category, Device, Product, Alert, ProductAlert, ProductAlertEvent, Measurement
+from dispositivos.services import bulk_ingest_measurements, generate_alert_events_for_measurements
 
-class AlertPipelineTest(TestCase):
+class AlertRulesMixin:
+    """Producto con tres reglas en °C (MEDIANO 70–80, ALTO 81–90, GRAVE 91+)."""
     def setUp(self):
+        cache.clear()
         org = Organization.objects.create(name="Org Test")
         zone = Zone.objects.create(name="Zona Test", organization=org)
         cat  = Category.objects.create(name="Cat Test")
@@ -20,8 +32,1469 @@ class AlertPipelineTest(TestCase):
         ProductAlert.objects.create(product=self.prod, alert=a_h, range_min=81, range_max=90, unit="°C")
         ProductAlert.objects.create(product=self.prod, alert=a_g, range_min=91, range_max=9_999_999, unit="°C")
 
+
+class AlertPipelineTest(AlertRulesMixin, TestCase):
     def test_event_created_for_high(self):
         m = Measurement.objects.create(product=self.prod, value=85, unit="°C", measured_at=timezone.now())
         evts = ProductAlertEvent.objects.filter(measurement=m)
         self.assertEqual(evts.count(), 1)
         self.assertEqual(evts.first().product_alert.alert.severity, "ALTO")
+
+
+class BulkIngestTest(AlertRulesMixin, TestCase):
+    def test_bulk_matches_single_path(self):
+        now = timezone.now()
+        values = [10, 70, 80, 85, 91, 100_000]
+        measurements, events = bulk_ingest_measurements(
+            [{"product_id": self.prod.pk, "value": v, "unit": "C", "measured_at": now} for v in values]
+        )
+        self.assertEqual(len(measurements), len(values))
+        sev = {e.measurement_id: e.product_alert.alert.severity for e in events}
+        self.assertEqual(
+            [sev.get(m.pk) for m in measurements],
+            [None, "MEDIANO", "MEDIANO", "ALTO", "GRAVE", "GRAVE"],
+        )
+        # reprocesar el lote no duplica eventos
+        self.assertEqual(generate_alert_events_for_measurements(measurements), [])
+        self.assertEqual(ProductAlertEvent.objects.count(), 5)
+
+    def test_reprocessing_returns_only_new_events(self):
+        measurements, events = bulk_ingest_measurements([
+            {"product_id": self.prod.pk, "value": v, "unit": "°C", "measured_at": timezone.now()} for v in (75, 85)
+        ])
+        ProductAlertEvent.all_objects.filter(pk=events[1].pk).hard_delete()
+        again = generate_alert_events_for_measurements(measurements)
+        self.assertEqual([(e.product_alert_id, e.measurement_id) for e in again],
+                         [(events[1].product_alert_id, events[1].measurement_id)])
+        self.assertIsNotNone(again[0].pk)
+        self.assertEqual(ProductAlertEvent.objects.count(), 2)
+
+    def test_bulk_unit_mismatch_and_wildcard(self):
+        a_m = Alert.objects.get(severity="MEDIANO")
+        other = Product.objects.create(name="Otro", category=self.prod.category)
+        ProductAlert.objects.create(product=other, alert=a_m, range_min=0, range_max=5, unit="")
+        _, events = bulk_ingest_measurements([
+            {"product_id": self.prod.pk, "value": 85, "unit": "kW", "measured_at": timezone.now()},
+            {"product_id": other.pk, "value": 3, "unit": "kW", "measured_at": timezone.now()},
+        ])
+        self.assertEqual([e.product_alert.product_id for e in events], [other.pk])
+
+    def test_bulk_endpoint(self):
+        user = get_user_model().objects.create_user(username="op", password="x")
+        self.client.force_login(user)
+        url = reverse("dispositivos:measurement_bulk_ingest")
+        body = {"measurements": [
+            {"product": self.prod.pk, "value": 85, "unit": "°C", "measured_at": "2025-01-01T10:00:00"},
+            {"product": self.prod.pk, "value": 5, "unit": "°C", "measured_at": "2025-01-01T10:01:00"},
+        ]}
+        resp = self.client.post(url, json.dumps(body), content_type="application/json")
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(resp.json()["created"], 2)
+        self.assertEqual(resp.json()["events_created"], 1)
+
+        body["measurements"].append({"product": 999999, "value": 1, "measured_at": "2025-01-01T10:02:00"})
+        resp = self.client.post(url, json.dumps(body), content_type="application/json")
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(Measurement.objects.count(), 2)
+
+        for value in ("nan", "inf", "-inf", "NaN"):
+            bad = {"measurements": [{"product": self.prod.pk, "value": value, "measured_at": "2025-01-01T10:03:00"}]}
+            resp = self.client.post(url, json.dumps(bad), content_type="application/json")
+            self.assertEqual(resp.status_code, 400, value)
+            self.assertEqual(resp.json()["errors"][0]["index"], 0)
+        self.assertEqual(Measurement.objects.count(), 2)
+
+    @override_settings(MEASUREMENT_INGEST_TOKEN="ingest-s3cret")
+    def test_bulk_endpoint_token_or_session_with_csrf(self):
+        from django.test import Client
+        client = Client(enforce_csrf_checks=True)
+        url = reverse("dispositivos:measurement_bulk_ingest")
+        body = json.dumps({"measurements": [
+            {"product": self.prod.pk, "value": 5, "unit": "°C", "measured_at": "2025-01-01T10:00:00"},
+        ]})
+        self.assertEqual(client.post(url, body, content_type="application/json").status_code, 401)
+        resp = client.post(url, body, content_type="application/json", HTTP_AUTHORIZATION="Bearer otro")
+        self.assertEqual(resp.status_code, 401)
+        resp = client.post(url, body, content_type="application/json", HTTP_AUTHORIZATION="Bearer ingest-s3cret")
+        self.assertEqual(resp.status_code, 201)
+        # con sesión sigue haciendo falta el token CSRF
+        client.force_login(get_user_model().objects.create_user(username="op", password="x"))
+        self.assertEqual(client.post(url, body, content_type="application/json").status_code, 403)
+        self.assertEqual(Measurement.objects.count(), 1)
+
+
+class UnitConversionTest(AlertRulesMixin, TestCase):
+    def test_registry(self):
+        from dispositivos import units
+        self.assertEqual({units.normalize(u) for u in ("°C", "C", "c", " degC ", "ºC")}, {"°C"})
+        self.assertEqual((units.normalize("kw"), units.normalize("MW"), units.normalize("mW")), ("kW", "MW", "mW"))
+        self.assertEqual(units.normalize("mw"), "mw")  # ambiguo: queda como unidad desconocida
+        a, b = units.conversion("°F", "C")
+        self.assertAlmostEqual(212 * a + b, 100)
+        self.assertEqual(units.conversion("W", "kW"), (1e-3, 0.0))
+        self.assertIsNone(units.conversion("kW", "°C"))
+        self.assertIsNone(units.conversion("xyz", "°C"))
+        self.assertEqual(units.conversion("XYZ", "xyz"), units.IDENTITY)
+        self.assertEqual(units.conversion("kW", ""), units.IDENTITY)
+
+    def test_ambiguous_unit_still_matches_case_insensitively(self):
+        from dispositivos import units
+        self.assertEqual(units.conversion("mw", "MW"), units.IDENTITY)
+        self.assertEqual(units.conversion("MW", "mw"), units.IDENTITY)
+        self.assertIsNone(units.conversion("mw", "kW"))
+        self.assertAlmostEqual(units.conversion("mW", "MW")[0], 1e-9)  # ambas conocidas: se convierte
+
+        prod = Product.objects.create(name="Generador", category=self.prod.category, device=self.prod.device)
+        grave, alto = Alert.objects.get(severity="GRAVE"), Alert.objects.get(severity="ALTO")
+        ProductAlert.objects.create(product=prod, alert=grave, range_min=5, range_max=10, unit="MW")
+        ProductAlert.objects.create(product=prod, alert=alto, range_min=5, range_max=10, unit="mw")
+        rows = [
+            {"product_id": prod.pk, "value": 7, "unit": u, "measured_at": timezone.now()}
+            for u in ("mw", "MW")
+        ]
+        key = lambda evs: sorted((e.measurement.unit, e.product_alert.alert.severity) for e in evs)  # noqa: E731
+        _, loop_events = bulk_ingest_measurements(rows)
+        with override_settings(ALERT_VECTORIZED_MIN_BATCH=1):
+            _, np_events = bulk_ingest_measurements(rows)
+        expected = [("MW", "ALTO"), ("MW", "GRAVE"), ("mw", "ALTO"), ("mw", "GRAVE")]
+        self.assertEqual(key(loop_events), expected)
+        self.assertEqual(key(np_events), expected)
+
+    def test_rules_match_converted_readings(self):
+        m = Measurement.objects.create(product=self.prod, value=185, unit="°F", measured_at=timezone.now())
+        self.assertEqual([e.product_alert.alert.severity for e in ProductAlertEvent.objects.filter(measurement=m)], ["ALTO"])
+
+        rows = [
+            {"product_id": self.prod.pk, "value": v, "unit": u, "measured_at": timezone.now()}
+            for v, u in ((167, "F"), (364.15, "K"), (75, "c"), (75, "kW"), (75, ""), (75, "xyz"))
+        ]
+        _, loop_events = bulk_ingest_measurements(rows)
+        with override_settings(ALERT_VECTORIZED_MIN_BATCH=1):
+            _, np_events = bulk_ingest_measurements(rows)
+        key = lambda evs: sorted(  # noqa: E731
+            (e.measurement.unit, e.product_alert.alert.severity) for e in evs
+        )
+        self.assertEqual(key(loop_events), [("F", "MEDIANO"), ("K", "GRAVE"), ("c", "MEDIANO")])
+        self.assertEqual(key(np_events), key(loop_events))
+
+    def test_conversion_with_offset_hits_exact_boundary(self):
+        import numpy as np
+        from dispositivos import units
+        from dispositivos.engine import _round_significant
+        a, b = units.conversion("°C", "°F")
+        self.assertNotEqual(100 * a + b, 212)  # sin redondear: 211.99999999999997
+        self.assertEqual(units.convert(100, (a, b)), 212)
+        values = np.random.default_rng(7).uniform(-1e6, 1e6, 500) * a + b
+        self.assertEqual(_round_significant(values).tolist(), [units.round_significant(v) for v in values])
+
+        prod = Product.objects.create(name="Horno °F", category=self.prod.category, device=self.prod.device)
+        rule = ProductAlert.objects.create(product=prod, alert=Alert.objects.get(severity="GRAVE"),
+                                           range_min=212, range_max=300, unit="°F")
+        rows = [
+            {"product_id": prod.pk, "value": v, "unit": u, "measured_at": timezone.now() + timedelta(minutes=i)}
+            for i, (v, u) in enumerate(((100, "°C"), (373.15, "K"), (99.99, "°C")))
+        ]
+        _, loop_events = bulk_ingest_measurements(rows)
+        with override_settings(ALERT_VECTORIZED_MIN_BATCH=1):
+            _, np_events = bulk_ingest_measurements(rows)
+        with override_settings(ALERT_INCIDENT_MODE=True):
+            _, incident_events = bulk_ingest_measurements(rows[:1])
+        self.assertEqual(sorted(e.measurement.unit for e in loop_events), ["K", "°C"])
+        self.assertEqual(sorted(e.measurement.unit for e in np_events), ["K", "°C"])
+        self.assertEqual([e.product_alert_id for e in incident_events], [rule.pk])
+        self.assertEqual(incident_events[0].peak_value, 212)
+
+    def test_rollups_aggregate_in_canonical_unit(self):
+        from datetime import datetime
+        from dispositivos.models import MeasurementRollup
+        from dispositivos.rollups import rebuild_rollups, summarize
+        t = datetime(2025, 3, 1, 10)
+        bulk_ingest_measurements([
+            {"product_id": self.prod.pk, "value": v, "unit": u, "measured_at": t + timedelta(minutes=i)}
+            for i, (v, u) in enumerate(((10, "°C"), (68, "°F"), (303.15, "K")))
+        ])
+        day = MeasurementRollup.objects.get(product=self.prod, granularity=MeasurementRollup.DAY)
+        self.assertEqual(day.unit, "°C")
+        self.assertAlmostEqual(day.avg_value, 20)
+        self.assertAlmostEqual(day.max_value, 30)
+        raw = summarize([self.prod.pk], t, t + timedelta(hours=1))
+        self.assertAlmostEqual(raw["avg"], 20)
+        self.assertAlmostEqual(raw["min"], 10)
+        self.assertEqual(raw["unit"], "°C")
+        rebuild_rollups(t, t + timedelta(days=1))
+        self.assertAlmostEqual(MeasurementRollup.objects.get(product=self.prod, granularity="day").avg_value, 20)
+
+
+class RuleIndexTest(AlertRulesMixin, TestCase):
+    def test_index_hits_and_invalidation(self):
+        from dispositivos.rules import rule_index
+        rule_index.invalidate()
+        Measurement.objects.create(product=self.prod, value=85, unit="°C", measured_at=timezone.now())
+        before = rule_index.stats()
+        with self.assertNumQueries(0):
+            matched = rule_index.get(self.prod.pk).match(75, "c")
+        self.assertEqual(len(matched), 1)
+        self.assertEqual(rule_index.stats()["hits"], before["hits"] + 1)
+
+        # cambiar una regla invalida el producto y se recompila en la siguiente consulta
+        rule = ProductAlert.objects.get(pk=matched[0])
+        rule.range_max = 72
+        rule.save()
+        self.assertEqual(rule_index.get(self.prod.pk).match(75, "c"), [])
+        self.assertEqual(rule_index.stats()["rebuilds"], before["rebuilds"] + 1)
+
+    def test_invalidation_during_compile_is_not_lost(self):
+        from unittest import mock
+        from dispositivos import rules
+        from dispositivos.rules import rule_index
+        rule_index.invalidate()
+        real = rules.CompiledRules
+        rule = ProductAlert.objects.get(product=self.prod, alert__severity="MEDIANO")
+
+        def edit_while_compiling(*args, **kwargs):
+            # las reglas ya se leyeron; otro proceso edita y la señal invalida
+            compiled = real(*args, **kwargs)
+            ProductAlert.objects.filter(pk=rule.pk).update(range_max=72)
+            rule_index.invalidate(scope)
+            return compiled
+
+        # invalidación del producto y del índice completo (p. ej. cambio de Alert)
+        for scope in (self.prod.pk, None):
+            with mock.patch.object(rules, "CompiledRules", side_effect=edit_while_compiling):
+                stale = rule_index.get(self.prod.pk)
+            self.assertEqual(len(stale.match(75, "°C")), 1)  # lo leído antes de la edición
+            self.assertEqual(rule_index.get(self.prod.pk).match(75, "°C"), [])
+            ProductAlert.objects.filter(pk=rule.pk).update(range_max=80)
+            rule_index.invalidate(scope)
+
+
+class VectorizedEngineTest(AlertRulesMixin, TestCase):
+    def test_engine_matches_loop(self):
+        rows = [
+            {"product_id": self.prod.pk, "value": v, "unit": u, "measured_at": timezone.now()}
+            for v in (10, 70, 80, 80.5, 85, 91, 1e9) for u in ("°C", "c", "kW", "")
+        ]
+        _, loop_events = bulk_ingest_measurements(rows)
+        with override_settings(ALERT_VECTORIZED_MIN_BATCH=1):
+            _, np_events = bulk_ingest_measurements(rows)
+        key = lambda evs: sorted(  # noqa: E731
+            (e.product_alert_id, e.measurement.value, e.measurement.unit) for e in evs
+        )
+        self.assertEqual(key(loop_events), key(np_events))
+        self.assertTrue(np_events)
+
+
+@override_settings(ALERT_EVALUATION_ASYNC=True)
+class AsyncEvaluationTest(AlertRulesMixin, TestCase):
+    def test_signal_enqueues_and_worker_drains(self):
+        from dispositivos.alert_queue import drain, enqueue_measurements, queue_stats
+        m = Measurement.objects.create(product=self.prod, value=85, unit="°C", measured_at=timezone.now())
+        self.assertFalse(ProductAlertEvent.objects.exists())
+        self.assertEqual(queue_stats()["depth"], 1)
+
+        self.assertEqual(drain(), 1)
+        self.assertEqual(queue_stats(), {"depth": 0, "lag_seconds": 0.0, "failed": 0})
+        self.assertEqual(ProductAlertEvent.objects.filter(measurement=m).count(), 1)
+
+        # al-menos-una-vez: reprocesar la misma medición no duplica eventos
+        enqueue_measurements([m.pk])
+        drain()
+        self.assertEqual(ProductAlertEvent.objects.filter(measurement=m).count(), 1)
+
+    @override_settings(ALERT_WORKER_MAX_ATTEMPTS=2, ALERT_WORKER_CLAIM_TIMEOUT=0)
+    def test_task_fails_after_max_attempts(self):
+        from unittest import mock
+        from dispositivos.alert_queue import claim_batch, drain, queue_stats
+        from dispositivos.models import AlertEvaluationTask
+        Measurement.objects.create(product=self.prod, value=85, unit="°C", measured_at=timezone.now())
+        with mock.patch("dispositivos.alert_queue.process_batch", side_effect=RuntimeError("boom")), \
+                self.assertLogs("dispositivos.alert_queue", "ERROR") as logs:
+            for _ in range(3):
+                drain()  # el reclamo vence al instante: cada pasada es un intento
+        task = AlertEvaluationTask.objects.get()
+        self.assertEqual(task.attempts, 2)
+        self.assertIsNotNone(task.failed_at)
+        self.assertTrue(any("superaron 2 intentos" in line for line in logs.output))
+        self.assertEqual(claim_batch(10), [])
+        self.assertEqual((queue_stats()["depth"], queue_stats()["failed"]), (0, 1))
+        self.assertFalse(ProductAlertEvent.objects.exists())
+
+    def test_keyboard_interrupt_stops_workers(self):
+        import os
+        import signal
+        import threading
+        import time
+        from unittest import mock
+        from dispositivos.alert_queue import run_workers
+        stop = threading.Event()
+        # el Ctrl-C (SIGINT) llega al hilo principal mientras espera a los workers;
+        # se fija el handler de Python por si el proceso hereda SIGINT ignorado
+        previous = signal.signal(signal.SIGINT, signal.default_int_handler)
+        self.addCleanup(signal.signal, signal.SIGINT, previous)
+        threading.Timer(0.2, os.kill, (os.getpid(), signal.SIGINT)).start()
+        t0 = time.perf_counter()
+        with mock.patch("dispositivos.alert_queue.drain", return_value=0), self.assertRaises(KeyboardInterrupt):
+            run_workers(concurrency=2, batch_size=10, poll_interval=60, stop=stop)
+        self.assertTrue(stop.is_set())
+        self.assertLess(time.perf_counter() - t0, 10)
+
+
+@override_settings(ALERT_INCIDENT_MODE=True, ALERT_INCIDENT_HYSTERESIS=0.05,
+                   ALERT_INCIDENT_CLOSE_AFTER_MISSES=2, ALERT_INCIDENT_CLOSE_AFTER=timedelta(minutes=30))
+class IncidentModeTest(AlertRulesMixin, TestCase):
+    def _ingest(self, values, start, step=timedelta(minutes=1)):
+        return bulk_ingest_measurements([
+            {"product_id": self.prod.pk, "value": v, "unit": "°C", "measured_at": start + i * step}
+            for i, v in enumerate(values)
+        ])
+
+    def test_storm_collapses_into_one_incident(self):
+        t0 = timezone.now() - timedelta(hours=1)
+        # 72 y 79 abren/extienden; 81 cae en ALTO pero sigue en la banda de MEDIANO (80 + 5%)
+        _, events = self._ingest([72, 79, 75, 81], t0)
+        self.assertEqual(len(events), 2)  # MEDIANO y ALTO (81)
+        incident = ProductAlertEvent.objects.get(product_alert__alert__severity="MEDIANO")
+        self.assertEqual((incident.match_count, incident.peak_value, incident.last_value), (4, 81, 81))
+        self.assertEqual(incident.last_seen_at, t0 + timedelta(minutes=3))
+        self.assertFalse(incident.is_resolved)
+
+        # lecturas una a una (señal post_save) extienden el mismo incidente
+        for i, v in enumerate((74, 76)):
+            Measurement.objects.create(product=self.prod, value=v, unit="°C",
+                                       measured_at=t0 + timedelta(minutes=4 + i))
+        incident.refresh_from_db()
+        self.assertEqual(incident.match_count, 6)
+        self.assertEqual(ProductAlertEvent.objects.filter(product_alert=incident.product_alert).count(), 1)
+
+    def test_auto_close_after_misses_and_window(self):
+        t0 = timezone.now() - timedelta(hours=2)
+        self._ingest([75, 10, 75, 10, 10], t0)  # un fallo aislado no cierra; dos seguidos sí
+        incident = ProductAlertEvent.objects.get()
+        self.assertTrue(incident.is_resolved and incident.auto_resolved)
+        self.assertEqual(incident.match_count, 2)
+
+        # sin coincidencias por más de la ventana: la siguiente abre otro incidente
+        self._ingest([75], t0 + timedelta(minutes=10))
+        self._ingest([75], t0 + timedelta(minutes=50))
+        self.assertEqual(ProductAlertEvent.objects.filter(is_resolved=False).count(), 1)
+        self.assertEqual(ProductAlertEvent.objects.filter(auto_resolved=True).count(), 2)
+
+        from dispositivos.incidents import close_stale
+        self.assertEqual(close_stale(), 1)
+        self.assertFalse(ProductAlertEvent.objects.filter(is_resolved=False).exists())
+
+    def test_reprocessing_does_not_reopen(self):
+        measurements, _ = self._ingest([75, 76], timezone.now() - timedelta(minutes=5))
+        self.assertEqual(generate_alert_events_for_measurements(measurements[:1]), [])
+        self.assertEqual(ProductAlertEvent.objects.count(), 1)
+
+
+class BulkResolveTest(AlertRulesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(get_user_model().objects.create_user(username="op", password="x"))
+        now = timezone.now()
+        bulk_ingest_measurements([
+            {"product_id": self.prod.pk, "value": v, "unit": "°C", "measured_at": now} for v in (75, 85, 95) * 4
+        ])
+        self.url = reverse("dispositivos:resolve_events_bulk")
+
+    def _post(self, body):
+        return self.client.post(self.url, json.dumps(body), content_type="application/json")
+
+    def test_resolve_by_filter_in_chunks(self):
+        from dispositivos.dashboard_cache import _version_key
+        before = cache.get(_version_key("sev_map"))
+        with override_settings(ALERT_RESOLVE_CHUNK_SIZE=3), self.captureOnCommitCallbacks(execute=True):
+            resp = self._post({"device": self.prod.device_id, "severity": "GRAVE"})
+        self.assertEqual(resp.json(), {"resolved": 4})
+        self.assertEqual(ProductAlertEvent.objects.filter(is_resolved=False).count(), 8)
+        self.assertNotEqual(cache.get(_version_key("sev_map")), before)
+
+        # por ids: los ya resueltos no cuentan
+        ids = list(ProductAlertEvent.objects.order_by("pk").values_list("pk", flat=True)[:6])
+        pending = ProductAlertEvent.objects.filter(pk__in=ids, is_resolved=False).count()
+        self.assertEqual(self._post({"ids": ids}).json(), {"resolved": pending})
+
+        # el formulario de alert_list resuelve el resto y redirige
+        resp = self.client.post(self.url, {"all": "true"})
+        self.assertRedirects(resp, reverse("dispositivos:alert_list"), fetch_redirect_response=False)
+        self.assertFalse(ProductAlertEvent.objects.filter(is_resolved=False).exists())
+
+    def test_requires_filter_and_validates(self):
+        self.assertEqual(self._post({}).status_code, 400)
+        self.assertEqual(self._post({"severity": "EXTREMA"}).status_code, 400)
+        self.assertEqual(self._post({"since": "ayer"}).status_code, 400)
+        self.assertEqual(self._post({"ids": ["x"]}).status_code, 400)
+        self.assertEqual(self._post({"ids": "12"}).status_code, 400)
+        self.assertEqual(self._post({"ids": ["12"]}).status_code, 400)
+        self.assertEqual(self._post({"ids": [True]}).status_code, 400)
+        self.assertEqual(self._post({"ids": 12}).status_code, 400)
+        with override_settings(ALERT_RESOLVE_MAX_IDS=3):
+            self.assertEqual(self._post({"ids": [1, 2, 3, 4]}).status_code, 400)
+        self.assertEqual(self._post({"ids": list(range(1, 40000))}).status_code, 400)
+        self.assertEqual(ProductAlertEvent.objects.filter(is_resolved=True).count(), 0)
+
+    def test_form_ids_use_every_value(self):
+        ids = list(ProductAlertEvent.objects.order_by("pk").values_list("pk", flat=True)[:3])
+        resp = self.client.post(self.url, {"ids": [str(pk) for pk in ids]})
+        self.assertRedirects(resp, reverse("dispositivos:alert_list"), fetch_redirect_response=False)
+        self.assertEqual(set(ProductAlertEvent.objects.filter(is_resolved=True).values_list("pk", flat=True)), set(ids))
+        # un valor no numérico rechaza todo el envío
+        self.client.post(self.url, {"ids": [str(ProductAlertEvent.objects.filter(is_resolved=False).first().pk), "x"]})
+        self.assertEqual(ProductAlertEvent.objects.filter(is_resolved=True).count(), 3)
+
+
+class ProductAutocompleteTest(AlertRulesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(get_user_model().objects.create_user(username="op", password="x"))
+        self.device = self.prod.device
+        cat = self.prod.category
+        self.free = [Product.objects.create(name=f"Bomba {i:02d}", category=cat) for i in range(5)]
+        other = Device.objects.create(name="Otro", organization=self.device.organization, zone=self.device.zone)
+        Product.objects.create(name="Bomba ocupada", category=cat, device=other)
+        self.url = reverse("dispositivos:product_autocomplete")
+
+    def test_prefix_search_paginates_by_cursor(self):
+        with override_settings(AUTOCOMPLETE_PAGE_SIZE=3):
+            first = self.client.get(self.url, {"q": "bom"}).json()
+            second = self.client.get(self.url, {"q": "bom", "cursor": first["next"]}).json()
+        ids = [r["id"] for r in first["results"] + second["results"]]
+        self.assertEqual(ids, [p.pk for p in self.free])  # sin la ocupada por otro dispositivo
+        self.assertIsNone(second["next"])
+        # los productos del propio dispositivo también se ofrecen
+        own = self.client.get(self.url, {"q": "prod", "device": self.device.pk}).json()
+        self.assertEqual([r["id"] for r in own["results"]], [self.prod.pk])
+        self.assertEqual(self.client.get(self.url, {"q": "prod"}).json()["results"], [])
+
+    def test_form_renders_selected_only_and_assigns_diff(self):
+        from dispositivos.forms import DeviceForm
+        resp = self.client.get(reverse("dispositivos:device_update", args=[self.device.pk]))
+        self.assertContains(resp, f'value="{self.prod.pk}"')
+        self.assertNotContains(resp, f'value="{self.free[0].pk}"')
+        self.assertContains(resp, "js/product_autocomplete.js")
+
+        data = {"name": self.device.name, "zone": self.device.zone_id,
+                "organization": self.device.organization_id,
+                "products": [self.free[0].pk, self.free[1].pk]}
+        form = DeviceForm(data, instance=self.device)
+        self.assertTrue(form.is_valid(), form.errors)
+        form.save()
+        self.assertEqual(set(self.device.products.values_list("pk", flat=True)), {self.free[0].pk, self.free[1].pk})
+        self.prod.refresh_from_db()
+        self.assertIsNone(self.prod.device_id)
+
+
+class ExportTest(AlertRulesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(get_user_model().objects.create_user(username="op", password="x"))
+        base = timezone.now().replace(microsecond=0) - timedelta(hours=1)
+        bulk_ingest_measurements([
+            {"product_id": self.prod.pk, "value": v, "unit": "°C", "measured_at": base + timedelta(minutes=i)}
+            for i, v in enumerate((10, 75, 85, 95, 20))
+        ])
+        dev = self.prod.device
+        other = Device.objects.create(name="Otro", organization=dev.organization, zone=dev.zone)
+        self.other = Product.objects.create(name="Otro prod", category=self.prod.category, device=other)
+        Measurement.objects.create(product=self.other, value=1, unit="°C", measured_at=base)
+
+    def _rows(self, response):
+        return list(csv.DictReader(io.StringIO(b"".join(response.streaming_content).decode())))
+
+    def test_measurements_csv_filtered_and_ordered(self):
+        with override_settings(EXPORT_CHUNK_SIZE=2):
+            resp = self.client.get(reverse("dispositivos:measurement_export"), {"device": self.prod.device_id})
+        self.assertIn("attachment", resp["Content-Disposition"])
+        rows = self._rows(resp)
+        self.assertEqual([float(r["value"]) for r in rows], [10, 75, 85, 95, 20])
+        self.assertEqual({r["product"] for r in rows}, {str(self.prod.pk)})
+        self.assertEqual(rows[0]["device_name"], "Dev Test")
+
+        all_rows = self._rows(self.client.get(reverse("dispositivos:measurement_export")))
+        self.assertEqual(len(all_rows), 6)
+        self.assertEqual(self.client.get(reverse("dispositivos:measurement_export"), {"since": "ayer"}).status_code, 400)
+
+    def test_alerts_ndjson_gzip(self):
+        resp = self.client.get(reverse("dispositivos:alert_export"),
+                               {"product": self.prod.pk, "format": "ndjson", "gzip": "1"})
+        self.assertEqual(resp["Content-Type"], "application/gzip")
+        lines = gzip.decompress(b"".join(resp.streaming_content)).decode().splitlines()
+        events = [json.loads(line) for line in lines]
+        self.assertEqual([e["severity"] for e in events], ["MEDIANO", "ALTO", "GRAVE"])
+        self.assertEqual(events[0]["product_name"], "Prod Test")
+        self.assertEqual(events[0]["value"], 75)
+
+    def test_timestamps_keep_microseconds(self):
+        from datetime import datetime
+        at = datetime(2025, 3, 1, 10, 0, 0, 123456)
+        m = Measurement.objects.create(product=self.prod, value=85, unit="°C", measured_at=at)
+        url = reverse("dispositivos:measurement_export")
+        rows = self._rows(self.client.get(url, {"product": self.prod.pk, "until": "2025-03-02T00:00:00"}))
+        self.assertEqual([datetime.fromisoformat(r["measured_at"]) for r in rows], [at])
+        resp = self.client.get(url, {"product": self.prod.pk, "until": "2025-03-02T00:00:00", "format": "ndjson"})
+        rows = [json.loads(line) for line in b"".join(resp.streaming_content).decode().splitlines()]
+        self.assertEqual([datetime.fromisoformat(r["measured_at"]) for r in rows], [at])
+
+        event = ProductAlertEvent.objects.get(measurement=m)
+        resp = self.client.get(reverse("dispositivos:alert_export"), {"product": self.prod.pk, "format": "ndjson"})
+        lines = b"".join(resp.streaming_content).decode().splitlines()
+        exported = next(e for e in map(json.loads, lines) if e["id"] == event.pk)
+        self.assertEqual(datetime.fromisoformat(exported["created_at"]), event.created_at)
+        self.assertEqual(datetime.fromisoformat(exported["measured_at"]), at)
+
+    def test_user_limited_to_own_organization(self):
+        user = get_user_model().objects.create_user(username="org", password="x", organization=self.prod.device.organization)
+        self.client.force_login(user)
+        other_org = Organization.objects.create(name="Otra")
+        resp = self.client.get(reverse("dispositivos:measurement_export"), {"organization": other_org.pk})
+        self.assertEqual(resp.status_code, 403)
+        self.assertEqual(len(self._rows(self.client.get(reverse("dispositivos:measurement_export")))), 6)
+
+    def test_command_writes_gzip_file_reimportable(self):
+        import os
+        import tempfile
+        from django.core.management import call_command
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "m.csv.gz")
+            call_command("export_data", "measurements", "--product", str(self.other.pk), "-o", path, stderr=io.StringIO())
+            with gzip.open(path, "rt") as fh:
+                content = fh.read()
+            self.assertEqual(content.splitlines()[0], "id,product,product_name,device,device_name,value,unit,measured_at")
+            self.assertEqual(len(content.splitlines()), 2)
+            call_command("import_measurements", path, stdout=io.StringIO(), stderr=io.StringIO())
+        self.assertEqual(Measurement.objects.filter(product=self.other).count(), 2)
+
+
+class MeasurementArchiveTest(AlertRulesMixin, TestCase):
+    def setUp(self):
+        import tempfile
+        super().setUp()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        override = override_settings(MEASUREMENT_ARCHIVE_DIR=tmp.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        from datetime import datetime
+        start = datetime(2025, 1, 30)
+        # 6 h entre lecturas: del 30/01 al 02/02, cruza el cambio de mes
+        Measurement.objects.bulk_create([
+            Measurement(product=self.prod, value=float(i), unit="°C", measured_at=start + timedelta(hours=6 * i))
+            for i in range(16)
+        ])
+
+    def test_archive_and_query(self):
+        import numpy as np
+        from datetime import datetime
+        from django.core.management import call_command
+        from django.db.models import Avg, Max, Min
+        from dispositivos import archive
+        call_command("archive_measurements", "--month", "2025-01", "--month", "2025-02", stdout=io.StringIO())
+        self.assertEqual([m.month for m in archive.archived_months(self.prod.pk)], [1, 2])
+
+        series = archive.load(self.prod.pk)
+        self.assertEqual(len(series.segments), 2)
+        self.assertIsInstance(series.segments[0][1].base, np.memmap)  # vista del archivo, sin copia
+        expected = Measurement.objects.aggregate(min=Min("value"), max=Max("value"), mean=Avg("value"))
+        self.assertEqual(series.stats(), dict(expected, count=16))
+
+        feb = archive.load(self.prod.pk, since=datetime(2025, 2, 1), until=datetime(2025, 2, 2))
+        self.assertEqual(feb.arrays()[1].tolist(), [8.0, 9.0, 10.0, 11.0])
+        self.assertEqual(series.slice(until=datetime(2025, 1, 31)).stats()["count"], 4)
+
+        daily = series.resample(timedelta(days=1))
+        self.assertEqual(daily["count"].tolist(), [4, 4, 4, 4])
+        self.assertEqual(daily["mean"].tolist(), [1.5, 5.5, 9.5, 13.5])
+        self.assertEqual(daily["start"][2], np.datetime64("2025-02-01T00:00:00", "us"))
+
+        # ya archivado: se omite salvo --force
+        Measurement.objects.create(product=self.prod, value=100, unit="°C", measured_at=datetime(2025, 1, 31, 1))
+        self.assertEqual(archive.archive_month(datetime(2025, 1, 1), skip_existing=True), {})
+        call_command("archive_measurements", "--month", "2025-01", "--force", stdout=io.StringIO())
+        self.assertEqual(archive.load(self.prod.pk).stats()["max"], 100)
+
+
+class ConcurrentEventWritesTest(TransactionTestCase):
+    # TransactionTestCase: los hilos usan sus propias conexiones y deben ver los datos confirmados
+    def test_parallel_writers_never_duplicate(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from dispositivos.management.commands.bench_event_writes import Command
+        cmd = Command()
+        out = StringIO()
+        call_command(cmd, "--threads", "4", "--measurements", "300", "--chunk-size", "50", stdout=out, stderr=StringIO())
+        for strategy, r in cmd.results.items():
+            with self.subTest(strategy):
+                self.assertEqual(r["duplicates"], 0)
+                self.assertEqual(r["rows"], r["pairs"])
+        # SQLite serializa las transacciones de escritura (el lote se reintenta si está
+        # bloqueado): cada evento se reporta como nuevo exactamente una vez entre todos los hilos
+        self.assertEqual(cmd.results["insert_ignore"]["reported"], cmd.results["insert_ignore"]["pairs"])
+        self.assertIn("insert_ignore / get_or_create", out.getvalue())
+        self.assertFalse(Product.all_objects.exists())
+
+
+class AdminChangelistToolsTest(AlertRulesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        t0 = timezone.now().replace(microsecond=0) - timedelta(days=40)
+        bulk_ingest_measurements([
+            {"product_id": self.prod.pk, "value": 75, "unit": "°C", "measured_at": t0 + timedelta(days=i)}
+            for i in range(0, 40, 3)
+        ])
+
+    def test_indexed_dates_match_distinct(self):
+        from core.admin_utils import with_indexed_dates
+        qs = Measurement.objects.all()
+        for kind in ("year", "month", "day"):
+            with self.subTest(kind):
+                self.assertEqual(list(with_indexed_dates(qs).datetimes("measured_at", kind)),
+                                 list(qs.datetimes("measured_at", kind)))
+
+    def test_count_is_capped_or_estimated(self):
+        from django.db import connection
+        from core.admin_utils import EstimatedCountPaginator
+        with override_settings(ADMIN_COUNT_CAP=5):
+            self.assertEqual(EstimatedCountPaginator(Measurement.objects.filter(value=75), 2).count, 5)
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+            self.assertEqual(EstimatedCountPaginator(Measurement.objects.all(), 2).count, 14)
+
+    def test_prefix_search(self):
+        admin = get_user_model().objects.create_superuser(username="root", password="x")
+        self.client.force_login(admin)
+        url = reverse("admin:dispositivos_productalertevent_changelist")
+        count = lambda q: self.client.get(url, {"q": q}).context["cl"].result_count  # noqa: E731
+        self.assertEqual(count("prod"), 14)   # prefijo del producto
+        self.assertEqual(count("Dev T"), 14)  # prefijo del dispositivo
+        self.assertEqual(count("rod"), 0)     # no es prefijo
+
+
+class ImportMeasurementsCommandTest(AlertRulesMixin, TestCase):
+    def _run(self, content, suffix, *args):
+        import os
+        import tempfile
+        from io import StringIO
+        from django.core.management import call_command
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            fh.write(content)
+        try:
+            call_command("import_measurements", path, "--chunk-size", "2", *args,
+                         stdout=StringIO(), stderr=StringIO())
+        finally:
+            os.remove(path)
+
+    def test_csv_by_serial_with_deferred_alerts(self):
+        self.prod.serial_number = "SN-1"
+        self.prod.save()
+        self._run(
+            "serial_number,value,unit,measured_at\n"
+            "SN-1,85,°C,2025-01-01T10:00:00\n"
+            "SN-1,10,°C,2025-01-01T10:01:00\n"
+            "NOPE,85,°C,2025-01-01T10:02:00\n"
+            "SN-1,95,°C,2025-01-01T10:03:00\n"
+            "SN-1,nan,°C,2025-01-01T10:04:00\n"
+            "SN-1,inf,°C,2025-01-01T10:05:00\n",
+            ".csv", "--defer-alerts",
+        )
+        self.assertEqual(Measurement.objects.count(), 3)
+        self.assertEqual(ProductAlertEvent.objects.count(), 2)
+
+    def test_deferred_alerts_skip_rows_of_other_writers(self):
+        from unittest import mock
+        from dispositivos.management.commands import import_measurements
+        others = []
+
+        def ingest_then_other_writer(rows, **kwargs):
+            result = bulk_ingest_measurements(rows, **kwargs)
+            # otro escritor (que evalúa por su cuenta) inserta entre dos lotes
+            others.extend(bulk_ingest_measurements([
+                {"product_id": self.prod.pk, "value": 95, "unit": "°C", "measured_at": timezone.now()},
+            ], evaluate_alerts=False)[0])
+            return result
+
+        with mock.patch.object(import_measurements, "bulk_ingest_measurements", ingest_then_other_writer):
+            self._run(
+                "product,value,unit,measured_at\n"
+                + "".join(f"{self.prod.pk},85,°C,2025-01-01T10:0{i}:00\n" for i in range(4)),
+                ".csv", "--defer-alerts",
+            )
+        self.assertEqual(len(others), 2)
+        self.assertEqual(ProductAlertEvent.objects.count(), 4)
+        self.assertFalse(ProductAlertEvent.objects.filter(measurement__in=others).exists())
+
+    def test_ndjson_by_product_id(self):
+        self._run(
+            json.dumps({"product": self.prod.pk, "value": 75, "unit": "C", "measured_at": "2025-01-01T10:00:00"})
+            + "\n{roto\n",
+            ".ndjson",
+        )
+        self.assertEqual(Measurement.objects.count(), 1)
+        self.assertEqual(ProductAlertEvent.objects.count(), 1)
+
+
+class RollupTest(AlertRulesMixin, TestCase):
+    def test_incremental_matches_rebuild(self):
+        from datetime import datetime, timedelta
+        from dispositivos.models import MeasurementRollup
+        from dispositivos.rollups import rebuild_rollups, summarize
+        t = datetime(2025, 3, 1, 10, 15)
+        Measurement.objects.create(product=self.prod, value=5, unit="°C", measured_at=t)
+        bulk_ingest_measurements([
+            {"product_id": self.prod.pk, "value": v, "unit": "°C", "measured_at": t + timedelta(minutes=m)}
+            for v, m in ((7, 5), (3, 50), (9, 70))
+        ])
+        hour = MeasurementRollup.objects.get(product=self.prod, granularity="hour", bucket_start=t.replace(minute=0))
+        self.assertEqual((hour.count, hour.min_value, hour.max_value, hour.sum_value, hour.last_value), (2, 5, 7, 12, 7))
+        day = MeasurementRollup.objects.get(product=self.prod, granularity="day")
+        self.assertEqual((day.count, day.last_value), (4, 9))
+
+        incremental = list(MeasurementRollup.objects.values_list("granularity", "bucket_start", "count", "sum_value"))
+        rebuild_rollups(t, t + timedelta(days=1))
+        rebuilt = list(MeasurementRollup.objects.values_list("granularity", "bucket_start", "count", "sum_value"))
+        self.assertEqual(sorted(incremental), sorted(rebuilt))
+
+        summary = summarize([self.prod.pk], t - timedelta(days=1), t + timedelta(days=1))
+        self.assertEqual((summary["source"], summary["count"], summary["max"], summary["last_value"]), ("rollup", 4, 9, 9))
+        raw = summarize([self.prod.pk], t, t + timedelta(hours=1))
+        self.assertEqual((raw["source"], raw["count"]), ("raw", 3))
+
+
+class RetentionTest(AlertRulesMixin, TestCase):
+    def test_enforce_retention_compacts_and_keeps_pending_events(self):
+        from datetime import timedelta
+        from io import StringIO
+        from django.core.management import call_command
+        from dispositivos.models import MeasurementRollup
+        old = timezone.now() - timedelta(days=200)
+        with override_settings(MEASUREMENT_ROLLUPS_ENABLED=False):  # datos "legados" sin rollups
+            ms, events = bulk_ingest_measurements([
+                {"product_id": self.prod.pk, "value": v, "unit": "°C", "measured_at": old}
+                for v in (10, 85, 95)
+            ])
+        recent = Measurement.objects.create(product=self.prod, value=1, unit="°C", measured_at=timezone.now())
+        resolved, pending = events
+        resolved.is_resolved = True
+        resolved.save()
+
+        with override_settings(MEASUREMENT_RETENTION={"partition_after_days": None}):
+            call_command("enforce_retention", "--raw-days", "90", "--batch-size", "1", stdout=StringIO())
+
+        self.assertEqual(
+            set(Measurement.all_objects.values_list("pk", flat=True)),
+            {pending.measurement_id, recent.pk},
+        )
+        self.assertEqual(list(ProductAlertEvent.objects.values_list("pk", flat=True)), [pending.pk])
+        day = MeasurementRollup.objects.get(granularity="day", bucket_start__lt=timezone.now() - timedelta(days=90))
+        self.assertEqual((day.count, day.max_value), (3, 95))
+
+
+    def test_rebuild_keeps_rollups_of_purged_days(self):
+        from datetime import timedelta
+        from io import StringIO
+        from django.core.management import call_command
+        from dispositivos.models import MeasurementRollup
+        from dispositivos.rollups import rebuild_rollups
+        old = (timezone.now() - timedelta(days=200)).replace(hour=12, minute=0, second=0, microsecond=0)
+        bulk_ingest_measurements([
+            {"product_id": self.prod.pk, "value": v, "unit": "°C", "measured_at": old + timedelta(minutes=v)}
+            for v in (10, 20, 30)
+        ])
+        recent = timezone.now() - timedelta(days=1)
+        Measurement.objects.create(product=self.prod, value=40, unit="°C", measured_at=recent)
+        with override_settings(MEASUREMENT_RETENTION={"partition_after_days": None}):
+            call_command("enforce_retention", "--raw-days", "90", stdout=StringIO())
+        self.assertFalse(Measurement.all_objects.filter(measured_at__lt=recent).exists())
+
+        call_command("rebuild_rollups", "--since", (old - timedelta(days=1)).date().isoformat(),
+                     "--until", timezone.now().date().isoformat(), stdout=StringIO())
+        day = MeasurementRollup.objects.get(granularity="day", bucket_start=old.replace(hour=0))
+        self.assertEqual((day.count, day.min_value, day.max_value), (3, 10, 30))
+        self.assertEqual(MeasurementRollup.objects.filter(granularity="hour", bucket_start__lte=old).count(), 1)
+        # los días con crudos sí se recalculan
+        Measurement.objects.filter(pk__in=Measurement.objects.filter(value=40).values("pk")).delete()
+        rebuild_rollups(recent - timedelta(days=1), recent + timedelta(days=1))
+        self.assertFalse(MeasurementRollup.objects.filter(bucket_start__gt=old).exists())
+
+
+    def test_rebuild_skips_days_with_partially_purged_raw(self):
+        from datetime import timedelta
+        from io import StringIO
+        from django.core.management import call_command
+        from dispositivos.models import MeasurementRollup
+        from dispositivos.rollups import rebuild_rollups, summarize
+        old = (timezone.now() - timedelta(days=200)).replace(hour=12, minute=0, second=0, microsecond=0)
+        # 95 deja un evento GRAVE pendiente: purge_raw conserva esa medición
+        bulk_ingest_measurements([
+            {"product_id": self.prod.pk, "value": v, "unit": "°C", "measured_at": old + timedelta(minutes=i)}
+            for i, v in enumerate((10, 20, 95))
+        ])
+        with override_settings(MEASUREMENT_RETENTION={"partition_after_days": None}):
+            call_command("enforce_retention", "--raw-days", "90", stdout=StringIO())
+        self.assertEqual(Measurement.all_objects.count(), 1)
+
+        with self.assertLogs("dispositivos.rollups", "WARNING"):
+            self.assertEqual(rebuild_rollups(old - timedelta(days=1), old + timedelta(days=1)), 0)
+        day = MeasurementRollup.objects.get(granularity="day", bucket_start=old.replace(hour=0))
+        self.assertEqual((day.count, day.min_value, day.max_value), (3, 10, 95))
+        stats = summarize([self.prod.pk], old - timedelta(days=1), old + timedelta(days=1))
+        self.assertEqual((stats["source"], stats["count"]), ("rollup", 3))
+
+
+class KeysetPaginationTest(AlertRulesMixin, TestCase):
+    def test_walks_forward_and_back_with_ties(self):
+        from datetime import datetime
+        from dispositivos.pagination import keyset_paginate
+        t = datetime(2025, 1, 1)
+        ms, _ = bulk_ingest_measurements([
+            {"product_id": self.prod.pk, "value": i, "unit": "°C", "measured_at": t.replace(minute=i // 2)}
+            for i in range(7)
+        ])
+        qs = Measurement.objects.all()
+        ordering = ["-measured_at", "-id"]
+        expected = list(qs.order_by(*ordering).values_list("pk", flat=True))
+
+        seen, cursor, pages = [], None, []
+        while True:
+            page = keyset_paginate(qs, ordering, cursor, 3)
+            pages.append(page)
+            seen += [m.pk for m in page]
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        self.assertEqual(seen, expected)
+        self.assertEqual([len(p) for p in pages], [3, 3, 1])
+
+        back = keyset_paginate(qs, ordering, pages[-1].prev_cursor, 3)
+        self.assertEqual([m.pk for m in back], [m.pk for m in pages[1]])
+        self.assertTrue(back.has_previous and back.has_next)
+        # cursor corrupto = primera página
+        self.assertEqual([m.pk for m in keyset_paginate(qs, ordering, "basura", 3)], expected[:3])
+
+    def test_sub_millisecond_ties_walk_every_row_once(self):
+        from datetime import datetime
+        from dispositivos.pagination import keyset_paginate
+        t = datetime(2025, 1, 1, 10, 0, 0, 123000)
+        # 30 filas en el mismo milisegundo: 10 por cada microsegundo distinto
+        Measurement.objects.bulk_create([
+            Measurement(product=self.prod, value=i, unit="°C", measured_at=t + timedelta(microseconds=100 * (i % 3) + 1))
+            for i in range(30)
+        ])
+        qs = Measurement.objects.all()
+        for ordering in (["-measured_at", "-id"], ["measured_at", "id"]):
+            expected = list(qs.order_by(*ordering).values_list("pk", flat=True))
+            seen, cursor, pages = [], None, []
+            while True:
+                page = keyset_paginate(qs, ordering, cursor, 4)
+                pages.append(page)
+                seen += [m.pk for m in page]
+                if not page.has_next:
+                    break
+                cursor = page.next_cursor
+            self.assertEqual(seen, expected, ordering)
+            self.assertEqual(len(set(seen)), 30)
+            # y hacia atrás desde la última página
+            back, cursor = [], pages[-1].prev_cursor
+            while cursor:
+                page = keyset_paginate(qs, ordering, cursor, 4)
+                back = [m.pk for m in page] + back
+                cursor = page.prev_cursor if page.has_previous else None
+            self.assertEqual(back + [m.pk for m in pages[-1]], expected, ordering)
+
+    def test_list_views_render(self):
+        user = get_user_model().objects.create_user(username="op", password="x")
+        self.client.force_login(user)
+        Measurement.objects.create(product=self.prod, value=85, unit="°C", measured_at=timezone.now())
+        for name in ("product_list", "device_list", "measurement_list", "alert_list"):
+            resp = self.client.get(reverse(f"dispositivos:{name}"), {"q": "Prod", "show": "all"})
+            self.assertEqual(resp.status_code, 200, name)
+        resp = self.client.get(reverse("dispositivos:alert_list"))
+        self.assertContains(resp, "Prod Test")
+
+
+class LatestMeasurementTest(AlertRulesMixin, TestCase):
+    def test_only_newer_reading_wins(self):
+        from datetime import datetime
+        from dispositivos.models import LatestMeasurement
+        t = datetime(2025, 1, 1, 12)
+        Measurement.objects.create(product=self.prod, value=1, unit="°C", measured_at=t)
+        bulk_ingest_measurements([
+            {"product_id": self.prod.pk, "value": 2, "unit": "°C", "measured_at": t.replace(hour=11)},
+            {"product_id": self.prod.pk, "value": 3, "unit": "°C", "measured_at": t.replace(hour=13)},
+            {"product_id": self.prod.pk, "value": 4, "unit": "°C", "measured_at": t.replace(hour=10)},
+        ])
+        Measurement.objects.create(product=self.prod, value=5, unit="°C", measured_at=t.replace(hour=9))
+        latest = LatestMeasurement.objects.get(product=self.prod)
+        self.assertEqual((latest.value, latest.measured_at), (3, t.replace(hour=13)))
+
+    def test_deleting_the_latest_reading_recomputes_it(self):
+        from datetime import datetime
+        from dispositivos.models import LatestMeasurement
+        t = datetime(2025, 1, 1, 12)
+        a, b, c = (Measurement.objects.create(product=self.prod, value=v, unit="°C", measured_at=t.replace(hour=h))
+                   for v, h in ((1, 10), (2, 11), (3, 12)))
+        latest = lambda: LatestMeasurement.objects.filter(product=self.prod).first()  # noqa: E731
+        a.delete()  # no era la vigente
+        self.assertEqual(latest().measurement_id, c.pk)
+        c.delete()
+        self.assertEqual((latest().measurement_id, latest().value), (b.pk, 2))
+        Measurement.objects.filter(pk=b.pk).delete()  # soft delete en lote (UPDATE)
+        self.assertIsNone(latest())
+
+        d = Measurement.objects.create(product=self.prod, value=4, unit="°C", measured_at=t)
+        e = Measurement.objects.create(product=self.prod, value=5, unit="°C", measured_at=t.replace(hour=13))
+        e.hard_delete()
+        self.assertEqual((latest().measurement_id, latest().value), (d.pk, 4))
+        Measurement.all_objects.filter(pk=d.pk).hard_delete()
+        self.assertIsNone(latest())
+
+    def test_dashboard_and_detail_views_read_latest(self):
+        user = get_user_model().objects.create_user(username="op", password="x")
+        self.client.force_login(user)
+        Measurement.objects.create(product=self.prod, value=42.5, unit="°C", measured_at=timezone.now())
+        resp = self.client.get(reverse("dispositivos:dashboard"))
+        self.assertContains(resp, "42,5")
+        self.assertEqual(resp.context["device_cards"][0].latest.value, 42.5)
+        for url in (
+            reverse("dispositivos:device_detail", args=[self.prod.device_id]),
+            reverse("dispositivos:product_detail", args=[self.prod.pk]),
+        ):
+            self.assertEqual(self.client.get(url).status_code, 200, url)
+
+
+class DashboardCacheTest(AlertRulesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        user = get_user_model().objects.create_user(username="op", password="x")
+        self.client.force_login(user)
+        self.url = reverse("dispositivos:dashboard")
+
+    def _count_queries(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+        return len(ctx)
+
+    def test_second_request_is_served_from_cache(self):
+        from dispositivos import dashboard_cache
+        cold = self._count_queries()
+        warm = self._count_queries()
+        self.assertLess(warm, cold)
+        self.assertGreater(dashboard_cache.stats()["sev_map"]["hits"], 0)
+
+    def test_writes_invalidate_their_sections(self):
+        self._count_queries()
+        with self.captureOnCommitCallbacks(execute=True):
+            Device.objects.create(name="Nuevo", zone=self.prod.device.zone, organization=self.prod.device.organization)
+        self.assertContains(self.client.get(self.url), "Nuevo")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk_ingest_measurements([
+                {"product_id": self.prod.pk, "value": 95, "unit": "°C", "measured_at": timezone.now()},
+            ])
+        resp = self.client.get(self.url)
+        self.assertEqual(resp.context["sev_map"]["GRAVE"], 1)
+        self.assertEqual(len(resp.context["recent_alerts_ms"]), 1)
+
+
+class PartitionTest(AlertRulesMixin, TransactionTestCase):
+    # TransactionTestCase: en SQLite el schema editor no corre dentro de atomic()
+    def tearDown(self):
+        from dispositivos import partitions
+        from dispositivos.models import MeasurementPartition
+        for month in MeasurementPartition.objects.values_list("month", flat=True):
+            partitions.drop_partition(month)
+
+    def test_detach_route_prune_and_drop(self):
+        from datetime import date, datetime, timedelta
+        from dispositivos import partitions
+        from dispositivos.models import MeasurementPartition, MeasurementRollup
+        from dispositivos.rollups import rebuild_rollups, summarize
+        jan = datetime(2025, 1, 10, 12)
+        ms, events = bulk_ingest_measurements([
+            {"product_id": self.prod.pk, "value": v, "unit": "°C", "measured_at": jan}
+            for v in (10, 20, 95)
+        ])
+        feb = Measurement.objects.create(product=self.prod, value=30, unit="°C", measured_at=datetime(2025, 2, 3))
+
+        self.assertEqual(partitions.detach_month(date(2025, 1, 1)), 2)
+        # la medición con evento se queda en la caliente
+        self.assertEqual(set(Measurement.objects.values_list("pk", flat=True)), {events[0].measurement_id, feb.pk})
+
+        # una lectura atrasada de enero va directo a la partición
+        hot, _ = bulk_ingest_measurements([
+            {"product_id": self.prod.pk, "value": 40, "unit": "°C", "measured_at": jan + timedelta(hours=1)},
+        ])
+        self.assertEqual(hot, [])
+        jan_model = partitions.partition_model(date(2025, 1, 1))
+        self.assertEqual(jan_model.objects.count(), 3)
+        self.assertEqual(MeasurementPartition.objects.get().row_count, 3)
+
+        # poda: una ventana de febrero no toca la partición de enero
+        self.assertEqual(len(partitions.querysets(datetime(2025, 2, 1), datetime(2025, 2, 8))), 1)
+        stats = summarize([self.prod.pk], jan, jan + timedelta(hours=2))
+        self.assertEqual((stats["count"], stats["max"], stats["last_value"]), (4, 95, 40))
+
+        rebuild_rollups(datetime(2025, 1, 10), datetime(2025, 1, 11))
+        day = MeasurementRollup.objects.get(granularity="day", bucket_start=datetime(2025, 1, 10))
+        self.assertEqual((day.count, day.min_value, day.max_value), (4, 10, 95))
+
+        self.assertEqual(partitions.expired_partitions(datetime(2025, 2, 1)), [date(2025, 1, 1)])
+        self.assertTrue(partitions.drop_partition(date(2025, 1, 1)))
+        self.assertFalse(MeasurementPartition.objects.exists())
+        self.assertNotIn(jan_model._meta.db_table, connection_tables())
+
+    def test_lists_read_detached_months(self):
+        from datetime import date, datetime
+        from dispositivos import partitions
+        self.client.force_login(get_user_model().objects.create_user(username="op", password="x"))
+        jan = datetime(2025, 1, 10, 12)
+        bulk_ingest_measurements([
+            {"product_id": self.prod.pk, "value": i, "unit": "°C", "measured_at": jan + timedelta(minutes=i // 2)}
+            for i in range(60)  # pares de filas con el mismo measured_at
+        ])
+        bulk_ingest_measurements([
+            {"product_id": self.prod.pk, "value": 100 + i, "unit": "°C", "measured_at": datetime(2025, 2, 3) + timedelta(minutes=i)}
+            for i in range(30)
+        ])
+        partitions.detach_month(date(2025, 1, 1))
+        self.assertEqual(Measurement.objects.count(), 30)
+
+        url = reverse("dispositivos:measurement_list")
+        pages, cursor = [], None
+        while True:
+            page = self.client.get(url, {"cursor": cursor} if cursor else {}).context["measurements"]
+            pages.append(page)
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        seen = [m.value for page in pages for m in page]
+        self.assertEqual(len(pages), 2)
+        self.assertEqual(sorted(seen), list(range(60)) + list(range(100, 130)))
+        self.assertEqual(seen, sorted(seen, key=lambda v: (v // 2 if v < 100 else 100 + v, v), reverse=True))
+        self.assertEqual(pages[1][0].product.name, "Prod Test")
+        back = self.client.get(url, {"cursor": pages[1].prev_cursor}).context["measurements"]
+        self.assertEqual([m.value for m in back], [m.value for m in pages[0]])
+
+        filtered = self.client.get(url, {"device": self.prod.device_id, "cursor": pages[0].next_cursor})
+        self.assertEqual(len(filtered.context["measurements"]), 40)
+        self.assertContains(filtered, "Prod Test")
+        self.assertEqual(len(self.client.get(url, {"product": 0}).context["measurements"]), 0)
+
+        Measurement.objects.filter(value__gte=110).delete()
+        detail = self.client.get(reverse("dispositivos:product_detail", args=[self.prod.pk]))
+        self.assertEqual([m.value for m in detail.context["measurements"]], list(range(109, 99, -1)) + list(range(59, 49, -1)))
+
+    def test_routed_rows_keep_unique_ids_and_are_counted(self):
+        from datetime import date, datetime
+        from dispositivos import partitions
+        self.client.force_login(get_user_model().objects.create_user(username="op", password="x"))
+        jan = datetime(2025, 1, 10, 12)
+        bulk_ingest_measurements([
+            {"product_id": self.prod.pk, "value": v, "unit": "°C", "measured_at": jan} for v in (10, 20)
+        ])
+        partitions.detach_month(date(2025, 1, 1))
+        _, archived = partitions.route_rows([
+            {"product_id": self.prod.pk, "value": 30, "unit": "°C", "measured_at": jan},
+        ])
+        hot, _ = bulk_ingest_measurements([
+            {"product_id": self.prod.pk, "value": 40, "unit": "°C", "measured_at": datetime(2025, 2, 3)},
+        ])
+
+        # los ids de la partición (movidos y atrasados) no se repiten en la caliente
+        jan_ids = list(partitions.partition_model(date(2025, 1, 1)).objects.values_list("pk", flat=True))
+        self.assertEqual(len(set(jan_ids)), 3)
+        self.assertIn(archived[0].pk, jan_ids)
+        self.assertNotIn(hot[0].pk, jan_ids)
+        self.assertFalse(Measurement.all_objects.filter(pk__in=jan_ids).exists())
+
+        detail = self.client.get(reverse("dispositivos:product_detail", args=[self.prod.pk]))
+        self.assertEqual(detail.context["product"].measurement_count, 4)
+        delete = self.client.get(reverse("dispositivos:product_delete", args=[self.prod.pk]))
+        self.assertEqual(delete.context["product"].measurement_count, 4)
+        device = self.client.get(reverse("dispositivos:device_delete", args=[self.prod.device_id]))
+        self.assertEqual(device.context["device"].measurement_count, 4)
+
+    def test_enforce_retention_detaches_and_drops_months(self):
+        from datetime import timedelta
+        from io import StringIO
+        from django.core.management import call_command
+        from dispositivos.models import MeasurementPartition
+        old = timezone.now() - timedelta(days=200)
+        mid = timezone.now() - timedelta(days=70)
+        bulk_ingest_measurements([
+            {"product_id": self.prod.pk, "value": 10, "unit": "°C", "measured_at": t} for t in (old, mid)
+        ])
+        call_command("enforce_retention", "--raw-days", "90", "--partition-days", "35", stdout=StringIO())
+
+        # el mes de hace 200 días se desprende y se elimina entero; el de hace 70 queda particionado
+        self.assertFalse(Measurement.objects.exists())
+        months = list(MeasurementPartition.objects.values_list("month", flat=True))
+        self.assertEqual(months, [mid.date().replace(day=1)])
+
+
+def connection_tables():
+    from django.db import connection
+    with connection.cursor() as cursor:
+        return connection.introspection.table_names(cursor)
+
+
+class IndexPlanTest(TestCase):
+    def test_view_queries_use_live_indexes_and_bench_rolls_back(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from dispositivos.management.commands.bench_indexes import view_queries
+        from dispositivos.seed import seed_fleet
+        seed_fleet(products=4, measurements=80, prefix="plan", derived=False)
+        plans = {name: qs.explain() for name, qs in view_queries()}
+        self.assertIn("meas_live_time_idx", plans["measurement_list"])
+        self.assertIn("meas_live_prod_time_idx", plans["product_detail.measurements"])
+        self.assertIn("pae_open_time_idx", plans["alert_list"])
+
+        before = Product.objects.count()
+        out = StringIO()
+        call_command("bench_indexes", "--products", "4", "--per-product", "10", "--repeat", "1", stdout=out)
+        self.assertIn("alert_list", out.getvalue())
+        self.assertEqual(Product.objects.count(), before)
+
+
+class FleetBenchmarkTest(TestCase):
+    def test_seed_fleet_and_bench_views_write_json(self):
+        import os
+        import tempfile
+        from io import StringIO
+        from django.core.management import call_command
+        from dispositivos.models import LatestMeasurement
+        call_command("seed_fleet", "--measurements", "2k", "--products", "20", "--days", "5", stdout=StringIO())
+        self.assertEqual(Product.objects.count(), 20)
+        self.assertAlmostEqual(Measurement.all_objects.count(), 2000, delta=20)  # redondeo por producto
+        self.assertEqual(LatestMeasurement.objects.count(), 20)
+        self.assertEqual(ProductAlert.objects.filter(alert__severity="GRAVE").count(), 20)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "run.json")
+            call_command("bench_views", "--repeat", "1", "--ingest-batches", "1",
+                         "--ingest-batch-size", "10", "--output", path, stdout=StringIO())
+            with open(path, encoding="utf-8") as fh:
+                report = json.load(fh)
+        self.assertEqual(
+            set(report["results"]),
+            {"dashboard", "dashboard_warm", "product_list", "measurement_list", "alert_list",
+             "device_detail", "product_detail", "ingest_service", "ingest_http"},
+        )
+        self.assertLess(report["results"]["dashboard_warm"]["queries"], report["results"]["dashboard"]["queries"])
+        # la corrida se revierte: no deja mediciones ni usuarios de benchmark
+        self.assertEqual(report["dataset"]["measurements"], Measurement.objects.count())
+        self.assertFalse(get_user_model().objects.filter(username__startswith="bench-").exists())
+
+
+class TimeSeriesTest(AlertRulesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        user = get_user_model().objects.create_user(username="op", password="x")
+        self.client.force_login(user)
+        self.t0 = timezone.now().replace(minute=0, second=0, microsecond=0) - timedelta(days=3)
+        # una lectura por minuto durante 3 días, con un pico aislado
+        bulk_ingest_measurements([
+            {"product_id": self.prod.pk, "value": 500 if i == 2000 else 20 + (i % 60) / 10,
+             "unit": "°C", "measured_at": self.t0 + timedelta(minutes=i)}
+            for i in range(3 * 24 * 60)
+        ], evaluate_alerts=False)
+
+    def _series(self, url, **params):
+        resp = self.client.get(url, params)
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.streaming)
+        return json.loads(b"".join(resp.streaming_content))
+
+    def test_raw_and_rollup_sources(self):
+        url = reverse("dispositivos:product_series", args=[self.prod.pk])
+        short = self._series(url, since=(self.t0 + timedelta(hours=1)).isoformat(),
+                             until=(self.t0 + timedelta(hours=2)).isoformat(), points=20)
+        self.assertEqual(short["source"], "raw")
+        points = short["series"][0]["points"]
+        self.assertLessEqual(len(points), 20)
+        self.assertEqual(points[0][0], (self.t0 + timedelta(hours=1)).isoformat())
+        self.assertEqual(points[-1][0], (self.t0 + timedelta(hours=1, minutes=59)).isoformat())
+
+        whole = self._series(url, since=self.t0.isoformat(), until=(self.t0 + timedelta(days=3)).isoformat(),
+                             points=30, mode="minmax")
+        self.assertEqual((whole["source"], whole["granularity"]), ("rollup", "hour"))
+        values = [v for _, v in whole["series"][0]["points"]]
+        self.assertLessEqual(len(values), 30)
+        self.assertIn(500, values)  # minmax conserva el pico
+
+    def test_rollup_bucket_before_since_stays_in_window(self):
+        url = reverse("dispositivos:product_series", args=[self.prod.pk])
+        since = self.t0 + timedelta(minutes=30)  # a mitad del primer bucket horario
+        for mode in ("lttb", "minmax"):
+            data = self._series(url, since=since.isoformat(), until=(self.t0 + timedelta(days=3)).isoformat(),
+                                points=30, mode=mode)
+            self.assertEqual(data["source"], "rollup")
+            points = data["series"][0]["points"]
+            self.assertLessEqual(len(points), 30, mode)
+            self.assertGreaterEqual(points[0][0], since.isoformat(), mode)
+
+    def test_lttb_keeps_spike_and_device_series(self):
+        from dispositivos.timeseries import lttb
+        rows = [(self.t0 + timedelta(minutes=i), float(v), float(v), float(v))
+                for i, v in enumerate([1] * 50 + [90] + [1] * 49)]
+        picked = list(lttb(rows, rows[0][0], rows[-1][0], 10))
+        self.assertLessEqual(len(picked), 10)
+        self.assertEqual((picked[0], picked[-1]), (rows[0][:2], rows[-1][:2]))
+        self.assertIn(90.0, [v for _, v in picked])
+
+        Product.objects.create(name="Otro", category=self.prod.category, device=self.prod.device)
+        data = self._series(reverse("dispositivos:device_series", args=[self.prod.device_id]),
+                            since=self.t0.isoformat(), until=(self.t0 + timedelta(days=3)).isoformat())
+        self.assertEqual([s["product"] for s in data["series"]], [self.prod.pk])  # sin datos: se omite
+
+    def test_invalid_params(self):
+        url = reverse("dispositivos:product_series", args=[self.prod.pk])
+        for params in ({"points": "1"}, {"mode": "x"}, {"since": "nope"},
+                       {"since": "2025-01-02T00:00:00", "until": "2025-01-01T00:00:00"}):
+            self.assertEqual(self.client.get(url, params).status_code, 400, params)
+
+
+class LiveFeedTest(AlertRulesMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username="op", password="x")
+
+    def _ingest(self, value):
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk_ingest_measurements([
+                {"product_id": self.prod.pk, "value": value, "unit": "°C", "measured_at": timezone.now()},
+            ])
+
+    async def test_stream_receives_reading_and_alert(self):
+        import asyncio
+        import contextlib
+        from asgiref.sync import sync_to_async
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        await self.async_client.aforce_login(self.user)
+        ctx = CaptureQueriesContext(connection)
+        await sync_to_async(ctx.__enter__)()  # la conexión vive en el hilo sync
+        response = await self.async_client.get(reverse("dispositivos:live_feed"))
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        stream = response.streaming_content.__aiter__()
+        self.assertEqual(await stream.__anext__(), b"retry: 3000\n\n")  # ya suscrito
+        await sync_to_async(ctx.__exit__)(None, None, None)
+        self.assertLessEqual(len(ctx), QueryBudgetTest.BUDGETS["dispositivos:live_feed"])
+        try:
+            await sync_to_async(self._ingest)(95)
+            reading = (await asyncio.wait_for(stream.__anext__(), 2)).decode()
+            alert = (await asyncio.wait_for(stream.__anext__(), 2)).decode()
+        finally:
+            # como al desconectarse el cliente en ASGI: se cancela la tarea que espera
+            pending = asyncio.ensure_future(stream.__anext__())
+            await asyncio.sleep(0)
+            pending.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await pending
+        self.assertTrue(reading.startswith("event: reading\n"))
+        self.assertTrue(alert.startswith("event: alert\n"))
+        payload = json.loads(alert.split("data: ", 1)[1])
+        self.assertEqual((payload["severity"], payload["value"], payload["product"]), ("GRAVE", 95, "Prod Test"))
+        from dispositivos.live import broker
+        self.assertFalse(broker.has_local_subscribers())
+
+    def test_no_subscribers_no_work(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as ctx:
+            self._ingest(5)
+        self.assertFalse(any("device__organization" in q["sql"] or '"organization_id"' in q["sql"]
+                             for q in ctx.captured_queries))
+
+    def test_fan_out_to_other_processes(self):
+        import os
+        import socket
+        import tempfile
+        from dispositivos.live import broker
+        with tempfile.TemporaryDirectory() as tmp, self.settings(LIVE_BROKER_DIR=tmp):
+            other = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            other.bind(os.path.join(tmp, "999999.sock"))
+            dead = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            dead.bind(os.path.join(tmp, "999998.sock"))
+            dead.close()  # queda el archivo sin proceso detrás
+            try:
+                broker.fan_out([{"type": "alert", "organization": 1, "id": 7}])
+                self.assertEqual(json.loads(other.recv(65536)), [{"type": "alert", "organization": 1, "id": 7}])
+            finally:
+                other.close()
+            self.assertFalse(os.path.exists(os.path.join(tmp, "999998.sock")))
+
+    async def test_socket_released_with_last_subscriber(self):
+        import asyncio
+        import os
+        import socket
+        import tempfile
+        from dispositivos.live import broker
+        with tempfile.TemporaryDirectory() as tmp, self.settings(LIVE_BROKER_DIR=tmp):
+            queue = broker.subscribe("org")
+            path, sock = broker._sock_path, broker._sock
+            self.assertTrue(os.path.exists(path))
+            with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sender:
+                sender.sendto(json.dumps([{"organization": "org", "id": 1}]).encode(), path)
+            self.assertEqual((await asyncio.wait_for(queue.get(), 2))["id"], 1)
+
+            broker.unsubscribe("org", queue)
+            self.assertFalse(os.path.exists(path))
+            self.assertIsNone(broker._sock)
+            for _ in range(40):  # el receptor lo cierra en su próxima vuelta
+                if sock.fileno() == -1:
+                    break
+                await asyncio.sleep(0.1)
+            self.assertEqual(sock.fileno(), -1)
+
+    def test_receive_backs_off_on_socket_errors(self):
+        from unittest import mock
+        from dispositivos.live import Broker
+
+        class Broken:
+            def recv(self, size):
+                raise OSError("EIO")
+
+            def close(self):
+                pass
+
+        b, sock = Broker(), Broken()
+        b._sock = sock
+        delays = []
+
+        def sleep(seconds):
+            delays.append(seconds)
+            if len(delays) == 8:
+                b._sock = None  # se fue el último suscriptor
+
+        with mock.patch("dispositivos.live.time.sleep", sleep), self.assertLogs("dispositivos.live", "ERROR"):
+            b._receive(sock)
+        self.assertEqual(delays, sorted(delays))
+        self.assertGreater(delays[1], delays[0])
+        self.assertLessEqual(delays[-1], 5.0)
+
+
+class QueryBudgetTest(QueryBudgetMixin, TestCase):
+    """
+    Presupuesto de consultas por vista con varias filas por lista: un N+1 lo
+    rompe. Al agregar una ruta a dispositivos/urls.py hay que darle presupuesto.
+    """
+    BUDGETS = {
+        "dispositivos:dashboard": 11,
+        "dispositivos:zone_list": 3,
+        "dispositivos:zone_detail": 4,
+        "dispositivos:category_list": 3,
+        "dispositivos:device_list": 5,
+        "dispositivos:device_create": 5,
+        "dispositivos:device_detail": 6,
+        "dispositivos:device_update": 7,
+        "dispositivos:device_delete": 3,
+        "dispositivos:device_series": 5,
+        "dispositivos:product_list": 5,
+        "dispositivos:product_create": 4,
+        "dispositivos:product_detail": 9,  # + meses desprendidos (partitions.paginate_measurements)
+        "dispositivos:product_update": 5,
+        "dispositivos:product_delete": 3,
+        "dispositivos:product_series": 4,
+        "dispositivos:product_autocomplete": 3,
+        "dispositivos:measurement_list": 5,  # sesión, usuario, mediciones, eventos y meses desprendidos
+        "dispositivos:measurement_bulk_ingest": 18,
+        "dispositivos:measurement_export": 5,  # sesión, usuario, productos, particiones y filas
+        "dispositivos:alert_list": 3,
+        "dispositivos:resolve_event": 4,
+        "dispositivos:resolve_events_bulk": 6,
+        "dispositivos:alert_export": 4,  # sesión, usuario, productos y filas
+        "dispositivos:live_feed": 2,  # sesión y usuario; luego no consulta (ver LiveFeedTest)
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        from dispositivos.seed import seed_fleet
+        seed_fleet(products=12, measurements=600, products_per_device=4, devices_per_zone=2,
+                   days=3, deleted_ratio=0, resolved_ratio=0.5)
+        cls.user = get_user_model().objects.create_user(username="op", password="x")
+        cls.device = Device.objects.order_by("pk").first()
+        cls.product = cls.device.products.order_by("pk").first()
+        cls.event = ProductAlertEvent.objects.order_by("pk").first()
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_budgets_cover_every_route(self):
+        from dispositivos.urls import urlpatterns
+        self.assertEqual(url_names(urlpatterns, "dispositivos"), set(self.BUDGETS))
+
+    def test_views_within_budget(self):
+        dev, prod = self.device.pk, self.product.pk
+        bulk = json.dumps({"measurements": [
+            {"product": p.pk, "value": 1, "unit": "°C", "measured_at": "2025-01-01T10:00:00"}
+            for p in Product.objects.all()[:5]
+        ]})
+        requests = [
+            ("dispositivos:dashboard", (), {}),
+            ("dispositivos:zone_list", (), {}),
+            ("dispositivos:zone_detail", (self.device.zone_id,), {}),
+            ("dispositivos:category_list", (), {}),
+            ("dispositivos:device_list", (), {}),
+            ("dispositivos:device_create", (), {}),
+            ("dispositivos:device_detail", (dev,), {}),
+            ("dispositivos:device_update", (dev,), {}),
+            ("dispositivos:device_delete", (dev,), {}),
+            ("dispositivos:device_series", (dev,), {"data": {"since": "2000-01-01T00:00:00"}}),
+            ("dispositivos:product_list", (), {}),
+            ("dispositivos:product_create", (), {}),
+            ("dispositivos:product_detail", (prod,), {}),
+            ("dispositivos:product_update", (prod,), {}),
+            ("dispositivos:product_delete", (prod,), {}),
+            ("dispositivos:product_series", (prod,), {}),
+            ("dispositivos:product_autocomplete", (), {"data": {"q": "a", "device": dev}}),
+            ("dispositivos:measurement_list", (), {}),
+            ("dispositivos:measurement_bulk_ingest", (), {
+                "method": "post", "data": bulk, "content_type": "application/json", "status": 201}),
+            ("dispositivos:measurement_export", (), {"data": {"device": dev}}),
+            ("dispositivos:alert_list", (), {"data": {"show": "all"}}),
+            ("dispositivos:resolve_event", (self.event.pk,), {"method": "post", "status": 302}),
+            ("dispositivos:resolve_events_bulk", (), {
+                "method": "post", "data": json.dumps({"device": dev, "severity": "GRAVE"}),
+                "content_type": "application/json"}),
+            ("dispositivos:alert_export", (), {"data": {"format": "ndjson"}}),
+            # live_feed es un stream sin fin: se mide en LiveFeedTest
+        ]
+        for name, args, kwargs in requests:
+            with self.subTest(name):
+                self.assertQueryBudget(self.BUDGETS[name], reverse(name, args=args), **kwargs)
+
+    def test_measurement_admin_changelist_within_budget(self):
+        admin = get_user_model().objects.create_superuser(username="root", password="x")
+        self.client.force_login(admin)
+        # eventos de toda la página en una consulta (prefetch), no una por fila;
+        # date_hierarchy: un salto por índice por día con datos (+1 final)
+        self.assertQueryBudget(16, reverse("admin:dispositivos_measurement_changelist"))
+
+    def test_admin_changelists_within_budget(self):
+        admin = get_user_model().objects.create_superuser(username="root", password="x")
+        self.client.force_login(admin)
+        m = Measurement.objects.order_by("measured_at").first().measured_at
+        e = ProductAlertEvent.objects.order_by("created_at").first().created_at
+        cases = [
+            (15, "admin:dispositivos_measurement_changelist", {"q": self.product.name[:4]}),
+            (14, "admin:dispositivos_measurement_changelist",
+             {"measured_at__year": m.year, "measured_at__month": m.month}),
+            (11, "admin:dispositivos_productalertevent_changelist", {}),
+            (9, "admin:dispositivos_productalertevent_changelist",
+             {"q": self.device.name[:4], "product_alert__alert__severity__exact": "GRAVE"}),
+            (9, "admin:dispositivos_productalertevent_changelist",
+             {"created_at__year": e.year, "created_at__month": e.month}),
+            (7, "admin:dispositivos_product_changelist", {}),
+            (7, "admin:dispositivos_device_changelist", {}),
+            (6, "admin:dispositivos_productalert_changelist", {}),
+        ]
+        for budget, name, params in cases:
+            with self.subTest(name, **params):
+                self.assertQueryBudget(budget, reverse(name), data=params)
@@ -0,0 +1,143 @@
+# dispositivos/timeseries.py
+"""
+Series de tiempo para gráficos, reducidas en el servidor.
+
+La fuente se elige como en rollups.summarize: ventanas cortas (hasta
+ROLLUP_READ_MIN_WINDOW) leen las mediciones crudas (tabla caliente y
+particiones); las largas, los rollups horarios o diarios (desde
+ROLLUP_DAILY_MIN_WINDOW). Así un año cuesta ~365 filas por producto,
+lo mismo que una hora de crudas.
+
+Las filas se reducen a `points` puntos mientras se leen:
+
+- lttb: Largest-Triangle-Three-Buckets con buckets de igual ancho en el
+  tiempo (no de igual cantidad de filas), así no hace falta contar antes y
+  solo se guardan dos buckets en memoria.
+- minmax: por bucket, el mínimo y el máximo (conserva los picos).
+
+Cada fila es (t, valor, mínimo, máximo); en crudas los tres valores son el
+mismo, en rollups valor es el promedio del bucket. Ambas fuentes vienen en
+la unidad canónica (las crudas se convierten al leerlas, ver units.py).
+"""
+from __future__ import annotations
+import heapq
+from datetime import datetime, timedelta
+from itertools import groupby
+from operator import itemgetter
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+
+from . import partitions, rollups
+from .models import MeasurementRollup
+from .units import to_canonical
+
+Row = Tuple[datetime, float, float, float]
+MODES = ("lttb", "minmax")
+
+
+def choose_source(since: datetime, until: datetime) -> Optional[str]:
+    """Granularidad de rollup para la ventana, o None para leer crudas."""
+    window = until - since
+    if not rollups.is_enabled() or window <= getattr(settings, "ROLLUP_READ_MIN_WINDOW", timedelta(hours=6)):
+        return None
+    if window >= getattr(settings, "ROLLUP_DAILY_MIN_WINDOW", timedelta(days=31)):
+        return MeasurementRollup.DAY
+    return MeasurementRollup.HOUR
+
+
+def rows_by_product(product_ids: List[int], since: datetime, until: datetime,
+                    granularity: Optional[str]) -> Iterator[Tuple[int, Iterator[Row]]]:
+    """(product_id, filas ordenadas por t) con una consulta por fuente, no por producto."""
+    if granularity:
+        qs = (
+            MeasurementRollup.objects
+            .filter(product_id__in=product_ids, granularity=granularity,
+                    bucket_start__gte=rollups.bucket_start(since, granularity), bucket_start__lt=until)
+            .order_by("product_id", "bucket_start")
+            .values_list("product_id", "bucket_start", "sum_value", "count", "min_value", "max_value")
+            .iterator(chunk_size=2000)
+        )
+        # el primer bucket puede empezar antes de since: se ubica en since para
+        # no sacar puntos de la ventana ni abrir un bucket de más al reducir
+        rows = ((pid, max(t, since), total / n, lo, hi) for pid, t, total, n, lo, hi in qs)
+    else:
+        # la caliente y las particiones se mezclan ya ordenadas
+        sources = [
+            qs.order_by("product_id", "measured_at")
+            .values_list("product_id", "measured_at", "value", "unit").iterator(chunk_size=2000)
+            for qs in partitions.querysets(since, until, product_ids)
+        ]
+        rows = _canonical_rows(heapq.merge(*sources, key=itemgetter(0, 1)))
+    for pid, group in groupby(rows, key=itemgetter(0)):
+        yield pid, (row[1:] for row in group)
+
+
+def _canonical_rows(rows) -> Iterator[tuple]:
+    for pid, t, value, unit in rows:
+        v = to_canonical(value, unit)[0]
+        yield pid, t, v, v, v
+
+
+def _time_buckets(rows: Iterable[Row], since: datetime, width: float) -> Iterator[List[Row]]:
+    """
+    Agrupa filas ordenadas en buckets de `width` segundos desde since (omite
+    los vacíos). Una fila anterior a since cae en el primer bucket.
+    """
+    origin = since.timestamp()
+    for _, bucket in groupby(rows, key=lambda r: max(int((r[0].timestamp() - origin) // width), 0)):
+        yield list(bucket)
+
+
+def lttb(rows: Iterable[Row], since: datetime, until: datetime, points: int) -> Iterator[Tuple[datetime, float]]:
+    """Largest-Triangle-Three-Buckets en streaming: primer y último punto más uno por bucket."""
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        return
+    yield first[0], first[1]
+    width = max((until - since).total_seconds() / max(points - 2, 1), 1e-6)
+
+    prev_t, prev_v = first[0].timestamp(), first[1]
+    current = last = None
+    for bucket in _time_buckets(rows, since, width):
+        if current is not None:
+            avg_t = sum(r[0].timestamp() for r in bucket) / len(bucket)
+            avg_v = sum(r[1] for r in bucket) / len(bucket)
+            chosen = _largest_triangle(current, prev_t, prev_v, avg_t, avg_v)
+            yield chosen[0], chosen[1]
+            prev_t, prev_v = chosen[0].timestamp(), chosen[1]
+        current = bucket
+    if current is None:
+        return
+    last = current.pop()
+    if current:
+        chosen = _largest_triangle(current, prev_t, prev_v, last[0].timestamp(), last[1])
+        yield chosen[0], chosen[1]
+    yield last[0], last[1]
+
+
+def _largest_triangle(bucket: List[Row], at: float, av: float, ct: float, cv: float) -> Row:
+    best, best_area = bucket[0], -1.0
+    for row in bucket:
+        bt, bv = row[0].timestamp(), row[1]
+        area = abs((at - ct) * (bv - av) - (at - bt) * (cv - av))
+        if area > best_area:
+            best, best_area = row, area
+    return best
+
+
+def minmax(rows: Iterable[Row], since: datetime, until: datetime, points: int) -> Iterator[Tuple[datetime, float]]:
+    """Mínimo y máximo de cada bucket (points/2 buckets), en orden temporal."""
+    width = max((until - since).total_seconds() / max(points // 2, 1), 1e-6)
+    for bucket in _time_buckets(rows, since, width):
+        lo = min(bucket, key=itemgetter(2))
+        hi = max(bucket, key=itemgetter(3))
+        if lo is hi and lo[2] == hi[3]:
+            yield lo[0], lo[2]
+            continue
+        for t, v in sorted(((lo[0], lo[2]), (hi[0], hi[3])), key=itemgetter(0)):
+            yield t, v
+
+
+DOWNSAMPLERS = {"lttb": lttb, "minmax": minmax}
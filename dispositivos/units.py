@@ -0,0 +1,166 @@
+# dispositivos/units.py
+"""
+Registro de unidades para comparar mediciones con reglas en otra unidad.
+
+Cada unidad conocida tiene (dimensión, escala, desplazamiento) respecto de
+la unidad canónica de su dimensión: canónico = valor * escala + desplazamiento
+(°F -> °C, W -> kW, psi -> bar...). Con eso:
+
+- normalize(): símbolo canónico de lo que escriben los sensores ('C', 'degC',
+  '°C' -> '°C'; 'kw' -> 'kW'). Primero se busca tal cual (distingue 'MW' de
+  'mW'); si no, sin mayúsculas, solo cuando no hay ambigüedad. Lo
+  desconocido queda como antes: minúsculas y solo caracteres alfanuméricos.
+- conversion(desde, hacia): (a, b) tal que hacia = desde * a + b, o None si
+  no son convertibles (otra dimensión, o una unidad desconocida distinta).
+  Si un lado es desconocido y ambos coinciden sin mayúsculas ('mw' y 'MW'),
+  es la identidad, como antes del registro: los datos guardados siguen
+  calzando.
+  Hacia '' (regla comodín) es la identidad. Está cacheada por par, así que
+  en la evaluación de alertas convertir cuesta una multiplicación y una suma.
+- convert(): aplica (a, b) y redondea a SIGNIFICANT_DIGITS cifras, para que
+  100 °C en °F dé 212 y no 211.99999999999997 (que no calzaría con una
+  regla range_min=212). Los tres evaluadores (rules, engine, incidents) lo
+  usan; la identidad no se redondea.
+- to_canonical(): valor en la unidad canónica de su dimensión; lo usan los
+  rollups, los resúmenes y las series para agregar unidades mezcladas.
+"""
+from __future__ import annotations
+import math
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+# dimensión -> unidad canónica
+CANONICAL = {
+    "temperature": "°C",
+    "power": "kW",
+    "energy": "kWh",
+    "voltage": "V",
+    "current": "A",
+    "pressure": "bar",
+    "ratio": "%",
+    "frequency": "Hz",
+}
+
+# símbolo -> (dimensión, escala, desplazamiento, alias)
+_UNITS = {
+    "°C": ("temperature", 1.0, 0.0, ("C", "degC", "celsius", "Celsius")),
+    "°F": ("temperature", 5 / 9, -160 / 9, ("F", "degF", "fahrenheit", "Fahrenheit")),
+    "K": ("temperature", 1.0, -273.15, ("kelvin", "Kelvin")),
+    "mW": ("power", 1e-6, 0.0, ()),
+    "W": ("power", 1e-3, 0.0, ("watt", "watts")),
+    "kW": ("power", 1.0, 0.0, ()),
+    "MW": ("power", 1e3, 0.0, ()),
+    "Wh": ("energy", 1e-3, 0.0, ()),
+    "kWh": ("energy", 1.0, 0.0, ()),
+    "MWh": ("energy", 1e3, 0.0, ()),
+    "J": ("energy", 1 / 3.6e6, 0.0, ()),
+    "kJ": ("energy", 1 / 3.6e3, 0.0, ()),
+    "MJ": ("energy", 1 / 3.6, 0.0, ()),
+    "mV": ("voltage", 1e-3, 0.0, ()),
+    "V": ("voltage", 1.0, 0.0, ("volt", "volts")),
+    "kV": ("voltage", 1e3, 0.0, ()),
+    "mA": ("current", 1e-3, 0.0, ()),
+    "A": ("current", 1.0, 0.0, ("amp", "amps")),
+    "kA": ("current", 1e3, 0.0, ()),
+    "mbar": ("pressure", 1e-3, 0.0, ()),
+    "bar": ("pressure", 1.0, 0.0, ()),
+    "Pa": ("pressure", 1e-5, 0.0, ()),
+    "hPa": ("pressure", 1e-3, 0.0, ()),
+    "kPa": ("pressure", 1e-2, 0.0, ()),
+    "MPa": ("pressure", 10.0, 0.0, ()),
+    "psi": ("pressure", 0.0689475729, 0.0, ()),
+    "atm": ("pressure", 1.01325, 0.0, ()),
+    "%": ("ratio", 1.0, 0.0, ("pct", "percent")),
+    "ppm": ("ratio", 1e-4, 0.0, ()),
+    "Hz": ("frequency", 1.0, 0.0, ()),
+    "kHz": ("frequency", 1e3, 0.0, ()),
+}
+
+IDENTITY = (1.0, 0.0)
+
+# cifras significativas que se conservan tras convertir; los sensores no
+# llegan a tanta precisión y sobra margen para el error de (a, b) en float64
+SIGNIFICANT_DIGITS = 12
+
+
+def _fold(u: str) -> str:
+    """Forma antigua de normalizar (minúsculas, solo alfanuméricos)."""
+    return "".join(ch for ch in u.lower() if ch.isalnum())
+
+
+def _build_aliases() -> Tuple[Dict[str, str], Dict[str, str]]:
+    exact, folded, ambiguous = {}, {}, set()
+    for symbol, (_, _, _, aliases) in _UNITS.items():
+        for alias in (symbol, symbol.replace("°", ""), *aliases):
+            exact[alias] = symbol
+            key = _fold(alias)
+            if not key:
+                continue
+            if folded.get(key, symbol) != symbol:
+                ambiguous.add(key)  # p. ej. 'mw': mW o MW
+            folded[key] = symbol
+    for key in ambiguous:
+        del folded[key]
+    return exact, folded
+
+
+_EXACT, _FOLDED = _build_aliases()
+
+
+@lru_cache(maxsize=1024)
+def normalize(u: Optional[str]) -> str:
+    if not u:
+        return ""
+    compact = "".join(u.split()).replace("º", "°")
+    symbol = _EXACT.get(compact) or _EXACT.get(compact.replace("°", "")) or _FOLDED.get(_fold(compact))
+    return symbol or _fold(compact)
+
+
+def dimension(u: Optional[str]) -> Optional[str]:
+    info = _UNITS.get(normalize(u))
+    return info[0] if info else None
+
+
+@lru_cache(maxsize=4096)
+def conversion(from_unit: Optional[str], to_unit: Optional[str]) -> Optional[Tuple[float, float]]:
+    """(a, b) tal que valor_en_to = valor_en_from * a + b; None si no son convertibles."""
+    source, target = normalize(from_unit), normalize(to_unit)
+    if not target or source == target:
+        return IDENTITY
+    src, dst = _UNITS.get(source), _UNITS.get(target)
+    if (src is None or dst is None) and _fold(source) == _fold(target):
+        # compatibilidad: antes todo se comparaba sin mayúsculas, así que una
+        # unidad ambigua ('mw') sigue calzando con 'MW'/'mW' como identidad
+        return IDENTITY
+    if src is None or dst is None or src[0] != dst[0]:
+        return None
+    # from -> canónico -> to
+    return src[1] / dst[1], (src[2] - dst[2]) / dst[1]
+
+
+def round_significant(value: float) -> float:
+    """Redondea a SIGNIFICANT_DIGITS cifras (misma cuenta que engine._round_significant)."""
+    if not value or not math.isfinite(value):
+        return value
+    digits = min(SIGNIFICANT_DIGITS - 1 - math.floor(math.log10(abs(value))), 300)
+    scale = 10.0 ** digits
+    return round(value * scale) / scale
+
+
+def convert(value: float, factors: Tuple[float, float]) -> float:
+    """value * a + b (factors de conversion()), sin ruido de punto flotante."""
+    if factors == IDENTITY:
+        return value
+    return round_significant(value * factors[0] + factors[1])
+
+
+def canonical_unit(u: Optional[str]) -> str:
+    """Unidad canónica de la dimensión; una desconocida es su propia canónica."""
+    unit = normalize(u)
+    info = _UNITS.get(unit)
+    return CANONICAL[info[0]] if info else unit
+
+
+def to_canonical(value: float, u: Optional[str]) -> Tuple[float, str]:
+    target = canonical_unit(u)
+    return convert(value, conversion(u, target)), target
@@ -21,18 +21,28 @@ urlpatterns = [
     path("devices/<int:pk>/", views.device_detail, name="device_detail"),
     path("devices/<int:pk>/edit/", views.device_update, name="device_update"),
     path("devices/<int:pk>/delete/", views.device_delete, name="device_delete"),
+    path("devices/<int:pk>/series/", views.device_series, name="device_series"),
 
     # Products
     path("products/", views.product_list, name="product_list"),
     path("products/create/", views.product_create, name="product_create"),
+    path("products/autocomplete/", views.product_autocomplete, name="product_autocomplete"),
     path("products/<int:pk>/", views.product_detail, name="product_detail"),
     path("products/<int:pk>/edit/", views.product_update, name="product_update"),
     path("products/<int:pk>/delete/", views.product_delete, name="product_delete"),
+    path("products/<int:pk>/series/", views.product_series, name="product_series"),
 
     # Measurements (tope 50 en la vista)
     path("measurements/", views.measurement_list, name="measurement_list"),
+    path("measurements/bulk/", views.measurement_bulk_ingest, name="measurement_bulk_ingest"),
+    path("measurements/export/", views.measurement_export, name="measurement_export"),
 
     # Alerts
     path("alerts/", views.alert_list, name="alert_list"),
     path("alerts/<int:pk>/resolve/", views.resolve_event, name="resolve_event"),
+    path("alerts/resolve/", views.resolve_events_bulk, name="resolve_events_bulk"),
+    path("alerts/export/", views.alert_export, name="alert_export"),
+
+    # Feed en vivo (SSE, requiere ASGI)
+    path("live/", views.live_feed, name="live_feed"),
 ]
@@ -1,36 +1,84 @@
 # dispositivos/views.py
+import asyncio
+import json
+import math
 from datetime import timedelta
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
 from django.utils import timezone
-from django.db.models import Count
-from django.core.paginator import Paginator
+from django.utils.dateparse import parse_datetime
+from django.db.models import Count, F, Func, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.middleware.csrf import CsrfViewMiddleware
+from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
-from .models import Device, Product, Measurement, Alert, Category, Zone, ProductAlertEvent
-from .forms import DeviceForm, ProductForm
+from core.auth import bearer_token_matches
+from .models import Alert, Device, Product, Measurement, Category, Zone, ProductAlert, ProductAlertEvent, LatestMeasurement, MeasurementPartitionCount
+from .forms import DeviceForm, ProductForm, assignable_products
+from .services import bulk_ingest_measurements, resolve_events
+from .rollups import summarize
+from .pagination import keyset_paginate, page_querystring
+from .dashboard_cache import DashboardCache
+from . import exports, live, partitions, timeseries
+from .metrics import ALERT_EVENTS_RESOLVED
+
+
+# Conteo de productos vivos (el related manager también excluye los borrados)
+_LIVE_PRODUCTS = Count("products", filter=Q(products__deleted_at__isnull=True))
+
+
+def _count_of(qs, outer_field):
+    """COUNT(*) correlado de qs por fila externa (qs.filter(outer_field=OuterRef("pk")))."""
+    counted = (
+        qs.filter(**{outer_field: OuterRef("pk")}).order_by()
+        .values(outer_field).annotate(c=Count("pk")).values("c")
+    )
+    return Coalesce(Subquery(counted, output_field=IntegerField()), 0)
 
 
-@login_required
-def dashboard(request):
-    cat = request.GET.get("category") or ""
-    zon = request.GET.get("zone") or ""
+def _archived_count(**lookups):
+    """Filas en particiones (catálogo por producto) que cumplen lookups; correlado vía OuterRef."""
+    total = (
+        MeasurementPartitionCount.objects.filter(**lookups).order_by()
+        .annotate(total=Func(F("row_count"), function="SUM")).values("total")[:1]
+    )
+    return Coalesce(Subquery(total, output_field=IntegerField()), 0)
 
-    devices = Device.objects.select_related("zone").all()
-    if cat:
-        devices = devices.filter(products__category_id=cat).distinct()
-    if zon:
-        devices = devices.filter(zone_id=zon)
 
-    counts_by_cat = (
-        Category.objects.annotate(n=Count("products"))
-        .values("id", "name", "n").order_by("name")
-    )
-    counts_by_zone = (
-        Zone.objects.annotate(n=Count("devices"))
-        .values("id", "name", "n").order_by("name")
-    )
+def _product_measurement_count():
+    """Mediciones de cada producto: tabla caliente más los meses desprendidos."""
+    return _count_of(Measurement.objects.all(), "product") + _archived_count(product_id=OuterRef("pk"))
+
+
+def _product_totals():
+    return {
+        "measurement_count": _product_measurement_count(),
+        "alerts_active_count": _count_of(
+            ProductAlertEvent.objects.filter(is_resolved=False), "product_alert__product"
+        ),
+    }
+
+
+def _with_latest_reading(devices):
+    """Adjunta a cada dispositivo su lectura más reciente (d.latest) en una sola consulta."""
+    devices = list(devices)
+    latest = {}
+    for row in (
+        LatestMeasurement.objects
+        .filter(product__device__in=devices)
+        .select_related("product")
+        .order_by("measured_at")
+    ):
+        latest[row.product.device_id] = row  # ordenado: el último gana
+    for d in devices:
+        d.latest = latest.get(d.pk)
+    return devices
+
 
+def _severity_counts_week():
     since = timezone.now() - timedelta(days=7)
 
     # ✅ Conteo semanal por severidad usando eventos
@@ -45,19 +93,52 @@ def dashboard(request):
         sev = row["product_alert__alert__severity"]
         if sev in sev_map:
             sev_map[sev] = row["n"]
+    return sev_map
+
 
-    # Últimas mediciones (todas)
-    last_measurements = (
-        Measurement.objects.select_related("product", "product__device")
+def _device_cards(cat, zon):
+    devices = Device.objects.select_related("zone").all()
+    if cat:
+        devices = devices.filter(products__category_id=cat).distinct()
+    if zon:
+        devices = devices.filter(zone_id=zon)
+    return _with_latest_reading(devices[:6])
+
+
+@login_required
+def dashboard(request):
+    cat = request.GET.get("category") or ""
+    zon = request.GET.get("zone") or ""
+
+    # Cada sección se cachea por organización (y filtros, si aplica);
+    # las señales suben la versión de la sección al cambiar sus modelos.
+    cached = DashboardCache(getattr(request.user, "organization_id", None))
+
+    counts_by_cat = cached.get("counts_by_cat", lambda: list(
+        Category.objects.annotate(n=Count("products"))
+        .values("id", "name", "n").order_by("name")
+    ))
+    counts_by_zone = cached.get("counts_by_zone", lambda: list(
+        Zone.objects.annotate(n=Count("devices"))
+        .values("id", "name", "n").order_by("name")
+    ))
+    sev_map = cached.get("sev_map", _severity_counts_week)
+
+    # Últimas mediciones: una por producto, desde latest_measurement
+    # (tabla del tamaño del catálogo, no de las mediciones)
+    last_measurements = cached.get("last_measurements", lambda: list(
+        LatestMeasurement.objects.select_related("product", "product__device")
         .order_by("-measured_at")[:10]
-    )
+    ))
 
     # ✅ Alertas recientes = últimos eventos
-    recent_events = (
+    recent_events = cached.get("recent_events", lambda: list(
         ProductAlertEvent.objects
         .select_related("product_alert__alert", "product_alert__product", "measurement", "product_alert__product__device")
         .order_by("-created_at")[:6]
-    )
+    ))
+
+    categories, zones = cached.get("filters", lambda: (list(Category.objects.all()), list(Zone.objects.all())))
 
     context = {
         "counts_by_cat": counts_by_cat,
@@ -65,11 +146,11 @@ def dashboard(request):
         "sev_map": sev_map,
         "last_measurements": last_measurements,
         "recent_alerts_ms": recent_events,   # ← el template ya espera esta clave
-        "categories": Category.objects.all(),
-        "zones": Zone.objects.all(),
+        "categories": categories,
+        "zones": zones,
         "cat_selected": cat,
         "zone_selected": zon,
-        "device_cards": devices[:6],
+        "device_cards": cached.get("device_cards", lambda: _device_cards(cat, zon), params=(cat, zon)),
     }
     return render(request, "dispositivos/dashboard.html", context)
 
@@ -87,45 +168,78 @@ def product_list(request):
     if q:
         products_qs = products_qs.filter(name__icontains=q)
 
-    paginator = Paginator(products_qs, 25)
-    products_page = paginator.get_page(request.GET.get("page"))
+    products_page = keyset_paginate(products_qs, ["name", "id"], request.GET.get("cursor"), 25)
 
     context = {
         "products": products_page,
+        "page_query": page_querystring(request),
         "categories": Category.objects.all(),
         "devices": Device.objects.select_related("zone").all(),
         "cat_selected": cat,
         "device_selected": device_id,
         "q": q,
-        "is_empty_products": products_page.paginator.count == 0,
+        "is_empty_products": not products_page.object_list,
     }
     return render(request, "dispositivos/product_list.html", context)
 
 
+@login_required
+def product_autocomplete(request):
+    """
+    Búsqueda mientras se escribe para el selector de productos de un
+    dispositivo (forms.ProductAutocompleteWidget): productos sin dispositivo
+    (o del `device` indicado) cuyo nombre empieza con `q`, en orden
+    (name, id) como product_live_name_idx y paginados por cursor.
+    JSON: {"results": [{"id": 1, "text": "..."}], "next": cursor | null}.
+    """
+    device = None
+    if (request.GET.get("device") or "").isdigit():
+        device = Device(pk=int(request.GET["device"]))
+    qs = assignable_products(device)
+    q = (request.GET.get("q") or "").strip()
+    if q:
+        qs = qs.filter(name__istartswith=q)
+    page = keyset_paginate(qs, ["name", "id"], request.GET.get("cursor"),
+                           getattr(settings, "AUTOCOMPLETE_PAGE_SIZE", 20))
+    return JsonResponse({
+        "results": [{"id": p.pk, "text": str(p)} for p in page],
+        "next": page.next_cursor,
+    })
+
+
 @login_required
 def product_detail(request, pk):
+    # Los totales vienen como subconsultas en la misma consulta del producto
     product = get_object_or_404(
-        Product.objects.select_related("device", "device__zone", "device__organization", "category"),
+        Product.objects.select_related("device", "device__zone", "device__organization", "category")
+        .annotate(**_product_totals()),
         pk=pk
     )
 
-    measurements = product.measurements.order_by("-measured_at")[:20]
+    # las 20 últimas, aunque ya estén en una partición mensual
+    measurements = partitions.paginate_measurements(
+        product.measurements.all(), None, 20, {"product_id": product.pk}
+    ).object_list
 
     # ✅ eventos (alertas) del producto
-    events = (
+    events = list(
         ProductAlertEvent.objects
         .filter(product_alert__product=product)
         .select_related("product_alert__alert", "measurement")
         .order_by("-created_at")[:10]
     )
 
-    alerts_active_count = events.filter(is_resolved=False).count()
+    # Resumen de 7 días: sale de los rollups, no de las mediciones crudas
+    now = timezone.now()
+    stats_7d = summarize([product.pk], now - timedelta(days=7), now)
 
     context = {
         "product": product,
+        "latest": LatestMeasurement.objects.filter(product=product).first(),
         "measurements": measurements,
         "alerts": events,                 # el template puede llamarlas "alerts" pero son eventos
-        "alerts_active_count": alerts_active_count,
+        "alerts_active_count": product.alerts_active_count,
+        "stats_7d": stats_7d,
     }
     return render(request, "dispositivos/product_detail.html", context)
 
@@ -145,7 +259,7 @@ def product_create(request):
 
 @login_required
 def product_update(request, pk):
-    product = get_object_or_404(Product, pk=pk)
+    product = get_object_or_404(Product.objects.annotate(**_product_totals()), pk=pk)
     if request.method == "POST":
         form = ProductForm(request.POST, instance=product)
         if form.is_valid():
@@ -160,7 +274,14 @@ def product_update(request, pk):
 
 @login_required
 def product_delete(request, pk):
-    product = get_object_or_404(Product, pk=pk)
+    product = get_object_or_404(
+        Product.objects.select_related("category", "device", "device__zone").annotate(
+            measurement_count=_product_measurement_count(),
+            event_count=_count_of(ProductAlertEvent.objects.all(), "product_alert__product"),
+            rule_count=_count_of(ProductAlert.objects.all(), "product"),
+        ),
+        pk=pk
+    )
     if request.method == "POST":
         name = product.name
         product.delete()
@@ -176,25 +297,26 @@ def device_list(request):
     zon = request.GET.get("zone") or ""
     q = request.GET.get("q") or ""
 
-    devices_qs = Device.objects.select_related("zone").all()
+    devices_qs = Device.objects.select_related("zone").annotate(product_count=_LIVE_PRODUCTS)
     if cat:
-        devices_qs = devices_qs.filter(products__category_id=cat).distinct()
+        # subconsulta en vez de JOIN + DISTINCT: no altera el conteo de productos
+        devices_qs = devices_qs.filter(pk__in=Product.objects.filter(category_id=cat).values("device_id"))
     if zon:
         devices_qs = devices_qs.filter(zone_id=zon)
     if q:
         devices_qs = devices_qs.filter(name__icontains=q)
 
-    paginator = Paginator(devices_qs, 25)
-    devices_page = paginator.get_page(request.GET.get("page"))
+    devices_page = keyset_paginate(devices_qs, ["name", "id"], request.GET.get("cursor"), 25)
 
     context = {
         "devices": devices_page,
+        "page_query": page_querystring(request),
         "categories": Category.objects.all(),
         "zones": Zone.objects.all(),
         "cat_selected": cat,
         "zone_selected": zon,
         "q": q,
-        "is_empty_devices": devices_page.paginator.count == 0,
+        "is_empty_devices": not devices_page.object_list,
     }
     return render(request, "dispositivos/device_list.html", context)
 
@@ -206,19 +328,20 @@ def device_detail(request, pk: int):
         pk=pk
     )
 
-    products = device.products.select_related("category").all()
+    products = list(device.products.select_related("category"))
 
-    recent_measurements = (
-        Measurement.objects
+    # Última lectura de cada producto del dispositivo
+    recent_measurements = list(
+        LatestMeasurement.objects
         .select_related("product")
         .filter(product__device=device)
         .order_by("-measured_at")[:20]
     )
 
-    recent_alerts = (
-        Alert.objects
-        .filter(measurements__product__device=device)
-        .distinct()
+    recent_alerts = list(
+        ProductAlertEvent.objects
+        .select_related("product_alert__alert", "product_alert__product", "measurement")
+        .filter(product_alert__product__device=device)
         .order_by("-created_at")[:10]
     )
 
@@ -227,9 +350,10 @@ def device_detail(request, pk: int):
         "products": products,
         "measurements": recent_measurements,
         "alerts": recent_alerts,
-        "is_empty_products": products.count() == 0,
-        "is_empty_measurements": recent_measurements.count() == 0,
-        "is_empty_alerts": recent_alerts.count() == 0,
+        # listas ya evaluadas: sin COUNT(*) extra por sección
+        "is_empty_products": not products,
+        "is_empty_measurements": not recent_measurements,
+        "is_empty_alerts": not recent_alerts,
     }
     return render(request, "dispositivos/device_detail.html", context)
 
@@ -250,7 +374,7 @@ def device_create(request):
 
 @login_required
 def device_update(request, pk):
-    device = get_object_or_404(Device, pk=pk)
+    device = get_object_or_404(Device.objects.annotate(product_count=_LIVE_PRODUCTS), pk=pk)
     if request.method == "POST":
         form = DeviceForm(request.POST, instance=device)
         if form.is_valid():
@@ -265,7 +389,15 @@ def device_update(request, pk):
 
 @login_required
 def device_delete(request, pk):
-    device = get_object_or_404(Device, pk=pk)
+    device = get_object_or_404(
+        Device.objects.select_related("zone", "organization").annotate(
+            product_count=_LIVE_PRODUCTS,
+            measurement_count=_count_of(Measurement.objects.all(), "product__device") + _archived_count(
+                product_id__in=Product.all_objects.filter(device_id=OuterRef(OuterRef("pk"))).values("pk")
+            ),
+        ),
+        pk=pk
+    )
     if request.method == "POST":
         name = device.name
         device.delete()
@@ -277,60 +409,85 @@ def device_delete(request, pk):
 # ------------------------ Zonas / Categorías ------------------------
 @login_required
 def zone_list(request):
-    zones = Zone.objects.select_related("organization").all()
+    zones = list(
+        Zone.objects.select_related("organization")
+        .annotate(device_count=Count("devices", filter=Q(devices__deleted_at__isnull=True)))
+    )
     return render(request, "dispositivos/zone_list.html", {
         "zones": zones,
-        "is_empty_zones": not zones.exists(),
+        "is_empty_zones": not zones,
     })
 
 
 @login_required
 def zone_detail(request, pk):
-    zone = get_object_or_404(Zone, pk=pk)
-    devices = zone.devices.all()
+    zone = get_object_or_404(Zone.objects.select_related("organization"), pk=pk)
+    devices = list(zone.devices.annotate(product_count=_LIVE_PRODUCTS))
     return render(request, "dispositivos/zone_detail.html", {
         "zone": zone,
         "devices": devices,
-        "is_empty_zone_devices": not devices.exists(),
+        "products_total": sum(d.product_count for d in devices),
+        "is_empty_zone_devices": not devices,
     })
 
 
 @login_required
 def category_list(request):
-    categories = Category.objects.annotate(product_count=Count("products")).all()
+    categories = list(Category.objects.annotate(product_count=_LIVE_PRODUCTS))
     return render(request, "dispositivos/category_list.html", {
         "categories": categories,
-        "is_empty_categories": not categories.exists(),
+        "is_empty_categories": not categories,
     })
 
 
 @login_required
 def measurement_list(request):
+    product_id = request.GET.get("product") or ""
+    device_id = request.GET.get("device") or ""
+
     qs = (
         Measurement.objects
         .select_related("product", "product__device", "product__category")
         .prefetch_related("alert_events__product_alert__alert")  # eventos de alerta
-        .order_by("-measured_at")
     )
+    # las particiones no tienen FK: se filtran por product_id
+    archived = {}
+    if product_id:
+        qs = qs.filter(product_id=product_id)
+        archived["product_id"] = product_id
+    if device_id:
+        qs = qs.filter(product__device_id=device_id)
+        archived["product_id__in"] = Product.all_objects.filter(device_id=device_id).values("pk")
 
-    paginator = Paginator(qs, 50)
-    page = request.GET.get("page")
-    measurements = paginator.get_page(page)
+    # Cursor por (measured_at, id): sin COUNT(*) ni OFFSET; los meses
+    # desprendidos (partitions.py) se leen cuando la página llega a ellos
+    measurements = partitions.paginate_measurements(qs, request.GET.get("cursor"), 50, archived)
 
     context = {
         "measurements": measurements,
-        "is_empty_measurements": measurements.paginator.count == 0,
+        "page_query": page_querystring(request),
+        "is_empty_measurements": not measurements.object_list,
     }
     return render(request, "dispositivos/measurement_list.html", context)
 
 @login_required
 def alert_list(request):
+    show = request.GET.get("show") or ""
+
     qs = (
         ProductAlertEvent.objects
         .select_related("product_alert__alert", "product_alert__product", "product_alert__product__device", "measurement")
-        .order_by("-created_at")
     )
-    return render(request, "dispositivos/alert_list.html", {"events": qs})
+    if show != "all":
+        qs = qs.filter(is_resolved=False)
+
+    events = keyset_paginate(qs, ["-created_at", "-id"], request.GET.get("cursor"), 50)
+    return render(request, "dispositivos/alert_list.html", {
+        "events": events,
+        "show": show,
+        "page_query": page_querystring(request),
+        "is_empty_alerts": not events.object_list,
+    })
 
 @login_required
 @require_POST
@@ -340,5 +497,328 @@ def resolve_event(request, pk):
         event.is_resolved = True
         event.resolved_at = timezone.now()
         event.save(update_fields=["is_resolved", "resolved_at", "updated_at"])
+        ALERT_EVENTS_RESOLVED.inc(source="single")
         messages.success(request, "Alerta marcada como resuelta.")
-    return redirect(request.META.get("HTTP_REFERER", "dispositivos:alert_list"))
\ No newline at end of file
+    return redirect(request.META.get("HTTP_REFERER", "dispositivos:alert_list"))
+
+
+# Filtros de la resolución masiva -> lookup sobre ProductAlertEvent
+_RESOLVE_FILTERS = {
+    "product": "product_alert__product_id",
+    "device": "product_alert__product__device_id",
+    "zone": "product_alert__product__device__zone_id",
+}
+
+
+def _resolve_queryset(params):
+    """
+    Eventos a resolver según ids o filtros (product, device, zone, severity,
+    since/until sobre la fecha del evento); (queryset, error).
+    Sin ids ni filtros se exige all=true para no resolver todo por accidente.
+    """
+    qs = ProductAlertEvent.objects.all()
+    if params.get("ids") is not None:
+        ids = params["ids"]
+        # un str se iteraría carácter por carácter ("12" -> 1, 2); bool es int en Python
+        if not isinstance(ids, list) or not all(isinstance(pk, int) and not isinstance(pk, bool) for pk in ids):
+            return None, "ids debe ser una lista de enteros."
+        max_ids = getattr(settings, "ALERT_RESOLVE_MAX_IDS", 500)
+        if len(ids) > max_ids:
+            return None, f"Máximo {max_ids} ids por solicitud; usa filtros para lotes mayores."
+        return qs.filter(pk__in=ids), None
+
+    lookups = {}
+    for key, lookup in _RESOLVE_FILTERS.items():
+        if params.get(key) not in (None, ""):
+            try:
+                lookups[lookup] = int(params[key])
+            except (TypeError, ValueError):
+                return None, f"{key} debe ser un entero."
+    severity = params.get("severity")
+    if severity:
+        if severity not in dict(Alert.SEVERITIES):
+            return None, f"severity debe ser uno de: {', '.join(dict(Alert.SEVERITIES))}."
+        lookups["product_alert__alert__severity"] = severity
+    for key, lookup in (("since", "created_at__gte"), ("until", "created_at__lt")):
+        if params.get(key):
+            try:
+                value = parse_datetime(str(params[key]))
+            except ValueError:
+                value = None
+            if value is None:
+                return None, f"{key} debe ser una fecha ISO 8601."
+            lookups[lookup] = value
+    if not lookups and str(params.get("all")).lower() not in ("1", "true"):
+        return None, "Indica ids, algún filtro (product, device, zone, severity, since, until) o all=true."
+    return qs.filter(**lookups), None
+
+
+@login_required
+@require_POST
+def resolve_events_bulk(request):
+    """
+    Resolución masiva de eventos pendientes.
+
+    POST JSON: {"ids": [1, 2, ...]} o filtros {"device": 3, "severity": "GRAVE",
+    "since": "2025-01-01T00:00:00", "until": ...} (o {"all": true}); responde
+    {"resolved": n}. Un POST de formulario (alert_list) redirige con un mensaje.
+    """
+    is_json = request.content_type == "application/json"
+    if is_json:
+        try:
+            params = json.loads(request.body or b"{}")
+            if not isinstance(params, dict):
+                raise TypeError
+        except (ValueError, TypeError):
+            return JsonResponse({"error": "Se espera un objeto JSON."}, status=400)
+    else:
+        params = request.POST.dict()
+        if "ids" in request.POST:
+            # varios checkboxes/select múltiple: todos los valores, no solo el último
+            params["ids"] = [int(pk) if pk.isdigit() else pk for pk in request.POST.getlist("ids")]
+
+    qs, error = _resolve_queryset(params)
+    if error:
+        if is_json:
+            return JsonResponse({"error": error}, status=400)
+        messages.error(request, error)
+        return redirect("dispositivos:alert_list")
+
+    resolved = resolve_events(qs)
+    if is_json:
+        return JsonResponse({"resolved": resolved})
+    messages.success(request, f"{resolved} alerta(s) marcadas como resueltas.")
+    return redirect("dispositivos:alert_list")
+
+
+# ------------------------ Ingesta masiva ------------------------
+def _parse_measurement_rows(items, valid_product_ids):
+    """Valida las filas del payload; retorna (rows, errors) con errores por índice."""
+    rows, errors = [], []
+    for i, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append({"index": i, "error": "Fila inválida."})
+            continue
+        try:
+            product_id = int(item.get("product"))
+            value = float(item.get("value"))
+        except (TypeError, ValueError):
+            errors.append({"index": i, "error": "product y value son obligatorios y numéricos."})
+            continue
+        measured_at = parse_datetime(str(item.get("measured_at") or ""))
+        if measured_at is None:
+            errors.append({"index": i, "error": "measured_at inválido (ISO 8601)."})
+        elif product_id not in valid_product_ids:
+            errors.append({"index": i, "error": f"Producto {product_id} no existe."})
+        elif not math.isfinite(value):
+            # float() acepta "nan"/"inf": romperían rollups (NaN) y rangos de reglas
+            errors.append({"index": i, "error": "value debe ser un número finito."})
+        elif value < 0:
+            errors.append({"index": i, "error": "value debe ser >= 0."})
+        else:
+            rows.append({
+                "product_id": product_id,
+                "value": value,
+                "unit": str(item.get("unit") or "")[:20],
+                "measured_at": measured_at,
+            })
+    return rows, errors
+
+
+def _ingest_auth_error(request):
+    """
+    None si la request puede ingerir: con "Authorization: Bearer
+    <MEASUREMENT_INGEST_TOKEN>" (clientes máquina, sin CSRF) o con sesión y
+    token CSRF (navegador). Si no, la respuesta de error.
+    """
+    if bearer_token_matches(request, getattr(settings, "MEASUREMENT_INGEST_TOKEN", None)):
+        return None
+    if not request.user.is_authenticated:
+        return JsonResponse({"error": "Se requiere sesión o token de ingesta."}, status=401)
+    # la vista es csrf_exempt por el camino con token; con sesión se valida igual
+    return CsrfViewMiddleware(lambda r: None).process_view(request, None, (), {})
+
+
+@csrf_exempt
+@require_POST
+def measurement_bulk_ingest(request):
+    """
+    POST JSON: {"measurements": [{"product": id, "value": 1.5, "unit": "kW",
+    "measured_at": "2025-01-01T10:00:00"}, ...]}
+
+    Todo o nada: si alguna fila es inválida no se inserta ninguna.
+    Autenticación: token de ingesta (Bearer) o sesión con CSRF.
+    """
+    error = _ingest_auth_error(request)
+    if error is not None:
+        return error
+    try:
+        payload = json.loads(request.body or b"{}")
+        items = payload["measurements"]
+        if not isinstance(items, list):
+            raise TypeError
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({"error": "Se espera un objeto con la lista 'measurements'."}, status=400)
+
+    max_rows = getattr(settings, "MEASUREMENT_BULK_MAX_ROWS", 5000)
+    if len(items) > max_rows:
+        return JsonResponse({"error": f"Máximo {max_rows} mediciones por lote."}, status=400)
+
+    requested_ids = set()
+    for item in items:
+        try:
+            requested_ids.add(int(item.get("product")))
+        except (AttributeError, TypeError, ValueError):
+            pass
+    valid_ids = set(Product.objects.filter(pk__in=requested_ids).values_list("pk", flat=True))
+
+    rows, errors = _parse_measurement_rows(items, valid_ids)
+    if errors:
+        return JsonResponse({"errors": errors}, status=400)
+
+    measurements, events = bulk_ingest_measurements(rows)
+    return JsonResponse({
+        "created": len(rows),             # incluye filas de meses particionados (sin id)
+        "events_created": len(events),
+        "ids": [m.pk for m in measurements],
+    }, status=201)
+
+
+# ------------------------ Exportación (CSV / NDJSON) ------------------------
+def _export_response(request, kind: str):
+    """
+    GET ?organization=&zone=&device=&product=&since=&until=&format=csv|ndjson&gzip=1.
+    Descarga en streaming (ver exports.py); un usuario con organización solo
+    exporta la suya.
+    """
+    filters, error = exports.parse_filters(request.GET)
+    fmt = request.GET.get("format") or "csv"
+    if not error and fmt not in exports.FORMATS:
+        error = f"format debe ser uno de: {', '.join(exports.FORMATS)}."
+    if error:
+        return JsonResponse({"error": error}, status=400)
+    org_id = getattr(request.user, "organization_id", None)
+    if org_id:
+        if filters.get("organization") not in (None, org_id):
+            return JsonResponse({"error": "Solo puedes exportar datos de tu organización."}, status=403)
+        filters["organization"] = org_id
+    compress = request.GET.get("gzip", "").lower() in ("1", "true")
+    response = StreamingHttpResponse(
+        exports.stream(kind, filters, fmt, compress),
+        content_type="application/gzip" if compress else f"{exports.FORMATS[fmt]}; charset=utf-8",
+    )
+    name = exports.filename(kind, fmt, compress, timezone.now())
+    response["Content-Disposition"] = f'attachment; filename="{name}"'
+    response["X-Accel-Buffering"] = "no"  # nginx: no acumular la descarga completa
+    return response
+
+
+@login_required
+def measurement_export(request):
+    return _export_response(request, "measurements")
+
+
+@login_required
+def alert_export(request):
+    return _export_response(request, "alerts")
+
+
+# ------------------------ Series para gráficos ------------------------
+def _series_params(request):
+    """since/until (ISO 8601, por defecto las últimas 24 h), points y mode; (params, error)."""
+    try:
+        until = parse_datetime(request.GET["until"]) if request.GET.get("until") else timezone.now()
+        since = parse_datetime(request.GET["since"]) if request.GET.get("since") else (
+            until - timedelta(hours=24) if until else None
+        )
+    except ValueError:
+        since = until = None
+    if since is None or until is None or since >= until:
+        return None, "since y until deben ser fechas ISO 8601 con since < until."
+    max_points = getattr(settings, "CHART_MAX_POINTS", 5000)
+    try:
+        points = int(request.GET.get("points") or getattr(settings, "CHART_DEFAULT_POINTS", 500))
+    except ValueError:
+        points = 0
+    if not 3 <= points <= max_points:
+        return None, f"points debe estar entre 3 y {max_points}."
+    mode = request.GET.get("mode") or "lttb"
+    if mode not in timeseries.MODES:
+        return None, f"mode debe ser uno de: {', '.join(timeseries.MODES)}."
+    return {"since": since, "until": until, "points": points, "mode": mode}, None
+
+
+def _stream_series(head: dict, product_ids, params):
+    """JSON por partes: {...head, "series": [{"product": id, "points": [[t, v], ...]}, ...]}."""
+    since, until = params["since"], params["until"]
+    granularity = timeseries.choose_source(since, until)
+    downsample = timeseries.DOWNSAMPLERS[params["mode"]]
+    head = dict(head, since=since.isoformat(), until=until.isoformat(), mode=params["mode"],
+                source="rollup" if granularity else "raw", granularity=granularity)
+    yield json.dumps(head)[:-1] + ', "series": ['
+    for i, (pid, rows) in enumerate(timeseries.rows_by_product(list(product_ids), since, until, granularity)):
+        yield ("," if i else "") + f'{{"product": {pid}, "points": ['
+        chunk = []
+        for n, (t, v) in enumerate(downsample(rows, since, until, params["points"])):
+            chunk.append(("," if n else "") + json.dumps([t.isoformat(), v]))
+            if len(chunk) >= 500:
+                yield "".join(chunk)
+                chunk = []
+        yield "".join(chunk) + "]}"
+    yield "]}"
+
+
+@login_required
+def product_series(request, pk):
+    """GET ?since=&until=&points=&mode=lttb|minmax. Serie reducida del producto."""
+    product = get_object_or_404(Product, pk=pk)
+    params, error = _series_params(request)
+    if error:
+        return JsonResponse({"error": error}, status=400)
+    return StreamingHttpResponse(
+        _stream_series({"product": product.pk}, [product.pk], params), content_type="application/json"
+    )
+
+
+@login_required
+def device_series(request, pk):
+    """Como product_series, una serie por producto del dispositivo (los sin datos en el rango se omiten)."""
+    device = get_object_or_404(Device, pk=pk)
+    params, error = _series_params(request)
+    if error:
+        return JsonResponse({"error": error}, status=400)
+    product_ids = device.products.order_by("pk").values_list("pk", flat=True)
+    return StreamingHttpResponse(
+        _stream_series({"device": device.pk}, product_ids, params), content_type="application/json"
+    )
+
+
+# ------------------------ Feed en vivo (SSE) ------------------------
+@login_required
+async def live_feed(request):
+    """
+    text/event-stream con eventos `alert` y `reading` de la organización del
+    usuario (todas si no tiene). Ver live.py; requiere servidor ASGI.
+    """
+    user = await request.auser()
+    key = user.organization_id or live.ALL
+    heartbeat = getattr(settings, "LIVE_FEED_HEARTBEAT", 15)
+
+    async def stream():
+        queue = live.broker.subscribe(key)
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"  # mantiene viva la conexión a través de proxies
+                    continue
+                yield f"event: {message['type']}\ndata: {json.dumps(message)}\n\n"
+        finally:
+            live.broker.unsubscribe(key, queue)
+
+    response = StreamingHttpResponse(stream(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # nginx: no bufferizar
+    return response
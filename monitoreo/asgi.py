@@ -5,6 +5,10 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+El feed en vivo (/dispositivos/live/, Server-Sent Events) necesita este
+punto de entrada, p. ej. `uvicorn monitoreo.asgi:application --workers 4`
+con LIVE_BROKER_DIR para repartir los mensajes entre workers.
 """
 
 import os
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+from datetime import timedelta
 from pathlib import Path
 
 AUTH_USER_MODEL = "usuarios.User"
@@ -43,6 +44,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.QueryStatsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -128,3 +130,115 @@ EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
 DEFAULT_FROM_EMAIL = "no-reply@ecoenergy.local"
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Ingesta masiva de mediciones (máximo de filas por request). Los clientes
+# máquina se autentican con "Authorization: Bearer <MEASUREMENT_INGEST_TOKEN>"
+# (sin sesión ni CSRF); sin token configurado solo se ingiere con sesión.
+MEASUREMENT_BULK_MAX_ROWS = 5000
+MEASUREMENT_INGEST_TOKEN = None
+
+# Índice de reglas de alerta en memoria: expiración (segundos) como respaldo
+# a la invalidación por señales cuando hay varios procesos.
+ALERT_RULE_INDEX_TTL = 300
+
+# Lotes con al menos esta cantidad de mediciones se evalúan con el motor
+# vectorizado (dispositivos/engine.py).
+ALERT_VECTORIZED_MIN_BATCH = 2000
+
+# Evaluación diferida de alertas: la señal solo encola y `manage.py alert_worker`
+# evalúa en lotes (ver dispositivos/alert_queue.py).
+ALERT_EVALUATION_ASYNC = False
+ALERT_WORKER_CONCURRENCY = 2
+ALERT_WORKER_BATCH_SIZE = 500
+ALERT_WORKER_CLAIM_TIMEOUT = 300  # segundos antes de reintentar una tarea reclamada
+ALERT_WORKER_MAX_ATTEMPTS = 5     # reclamos fallidos antes de marcar la tarea como fallida
+
+# Admin: los changelists de tablas grandes cuentan a lo más esta cantidad de
+# filas; sin filtros usan la estimación del motor (core/admin_utils.py).
+ADMIN_COUNT_CAP = 10_000
+
+# Selector de productos del dispositivo: resultados por página de la búsqueda.
+AUTOCOMPLETE_PAGE_SIZE = 20
+
+# Resolución masiva de alertas: filas por UPDATE (cada tramo en su transacción)
+# y máximo de ids por request (pk__in con más variables que las que acepta la
+# BD, 999 en SQLite antiguos, fallaría con un 500).
+ALERT_RESOLVE_CHUNK_SIZE = 5000
+ALERT_RESOLVE_MAX_IDS = 500
+
+# Modo incidente (dispositivos/incidents.py): un evento abierto por regla que
+# se extiende con cada lectura en vez de una fila por lectura. La histéresis
+# es una fracción de cada borde del rango; se cierra tras N lecturas fuera
+# de la banda o sin coincidencias durante ALERT_INCIDENT_CLOSE_AFTER.
+ALERT_INCIDENT_MODE = False
+ALERT_INCIDENT_HYSTERESIS = 0.02
+ALERT_INCIDENT_CLOSE_AFTER_MISSES = 3
+ALERT_INCIDENT_CLOSE_AFTER = timedelta(minutes=30)
+
+# Rollups de mediciones (dispositivos/rollups.py). Ventanas más largas que
+# ROLLUP_READ_MIN_WINDOW se leen de los rollups; desde ROLLUP_DAILY_MIN_WINDOW,
+# de los diarios.
+MEASUREMENT_ROLLUPS_ENABLED = True
+ROLLUP_READ_MIN_WINDOW = timedelta(hours=6)
+ROLLUP_DAILY_MIN_WINDOW = timedelta(days=31)
+
+# Retención (manage.py enforce_retention). None = sin límite.
+MEASUREMENT_RETENTION = {
+    "raw_days": 90,
+    "hourly_rollup_days": 730,
+    "daily_rollup_days": None,
+    # Meses completos más antiguos que esto pasan a tablas measurement_YYYY_MM
+    # (None = sin particionar). Debe ser menor que raw_days para que sirva.
+    "partition_after_days": 35,
+}
+
+# Archivo columnar de mediciones (dispositivos/archive.py, manage.py
+# archive_measurements): .npy por producto y mes, para leer con memmap.
+MEASUREMENT_ARCHIVE_DIR = BASE_DIR / "archive"
+
+# Caché (dashboard por sección, ver dispositivos/dashboard_cache.py).
+# En producción con varios procesos conviene un backend compartido
+# (file/Redis/Memcached); locmem es por proceso.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "ecoenergy",
+    }
+}
+DASHBOARD_CACHE_TTL = 30  # segundos
+
+# Series para gráficos (dispositivos/timeseries.py): puntos por defecto y tope.
+CHART_DEFAULT_POINTS = 500
+CHART_MAX_POINTS = 5000
+
+# Exportación de mediciones/alertas (dispositivos/exports.py): filas por
+# lectura del cursor y por bloque escrito en la respuesta.
+EXPORT_CHUNK_SIZE = 2000
+
+# Estadísticas de SQL por request (core/middleware.py): cabeceras X-Query-Stats
+# y Server-Timing, y log "core.query_stats" (WARNING sobre los umbrales).
+QUERY_STATS_ENABLED = DEBUG
+QUERY_STATS_SLOWEST = 3
+QUERY_STATS_WARN_COUNT = 30
+QUERY_STATS_WARN_MS = 200
+
+# Métricas Prometheus en /metrics (core/metrics.py, dispositivos/metrics.py).
+# Apagadas por defecto fuera de DEBUG. Se pide "Authorization: Bearer
+# <METRICS_TOKEN>" (bearer_token en el scrape de Prometheus) o una sesión de
+# staff; sin token configurado solo entra staff. METRICS_ALLOWED_IPS es un
+# filtro extra por REMOTE_ADDR (detrás de un proxy es la IP del proxy).
+# Con varios procesos, METRICS_MULTIPROC_DIR apunta a un directorio compartido
+# (vaciarlo al desplegar) donde cada proceso vuelca su estado.
+METRICS_ENABLED = DEBUG
+METRICS_TOKEN = None
+METRICS_ALLOWED_IPS = None  # p. ej. ["127.0.0.1", "::1"]; None = sin restricción
+METRICS_MULTIPROC_DIR = None
+METRICS_FLUSH_INTERVAL = 5  # segundos
+
+# Feed en vivo (dispositivos/live.py, /dispositivos/live/ por SSE bajo ASGI).
+# Con varios procesos, LIVE_BROKER_DIR es un directorio local compartido
+# donde cada proceso con suscriptores abre su socket Unix.
+LIVE_FEED_ENABLED = True
+LIVE_FEED_HEARTBEAT = 15  # segundos entre comentarios keep-alive
+LIVE_FEED_QUEUE_SIZE = 500  # mensajes en espera por cliente antes de descartar
+LIVE_BROKER_DIR = None
@@ -17,11 +17,13 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 from dispositivos import views as dispositivos_views
+from core import views as core_views
 from django.contrib.auth.decorators import login_required
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("usuarios/", include("usuarios.urls")),
     path("dispositivos/", include("dispositivos.urls")),
+    path("metrics", core_views.metrics, name="metrics"),  # interno (Prometheus)
     path("", login_required(dispositivos_views.dashboard), name="dashboard"), # Página principal requiere login
 ]
\ No newline at end of file
@@ -0,0 +1,90 @@
+// Selector de productos con búsqueda (forms.ProductAutocompleteWidget).
+// Solo pide al servidor lo que se escribe, de a una página por vez.
+(function () {
+  "use strict";
+
+  function init(root) {
+    var url = root.dataset.autocompleteUrl;
+    var select = root.querySelector("select");
+    var input = root.querySelector(".autocomplete-input");
+    var results = root.querySelector(".autocomplete-results");
+    var chips = root.querySelector(".autocomplete-chips");
+    var timer = null;
+    var pending = null;
+
+    function renderChips() {
+      chips.innerHTML = "";
+      Array.prototype.forEach.call(select.options, function (opt) {
+        var li = document.createElement("li");
+        li.className = "tag";
+        li.textContent = opt.textContent + " ";
+        var remove = document.createElement("button");
+        remove.type = "button";
+        remove.className = "btn btn-light";
+        remove.textContent = "×";
+        remove.title = "Quitar";
+        remove.addEventListener("click", function () {
+          opt.remove();
+          renderChips();
+        });
+        li.appendChild(remove);
+        chips.appendChild(li);
+      });
+    }
+
+    function add(item) {
+      if (select.querySelector('option[value="' + item.id + '"]')) return;
+      var opt = new Option(item.text, item.id, true, true);
+      select.appendChild(opt);
+      renderChips();
+    }
+
+    function fetchPage(cursor) {
+      var params = new URLSearchParams({ q: input.value.trim() });
+      if (cursor) params.set("cursor", cursor);
+      var full = url + (url.indexOf("?") === -1 ? "?" : "&") + params.toString();
+      if (pending) pending.abort();
+      pending = new AbortController();
+      fetch(full, { credentials: "same-origin", signal: pending.signal })
+        .then(function (r) { return r.json(); })
+        .then(function (data) { show(data, !!cursor); })
+        .catch(function () {});
+    }
+
+    function show(data, append) {
+      if (!append) results.innerHTML = "";
+      var more = results.querySelector(".autocomplete-more");
+      if (more) more.remove();
+      data.results.forEach(function (item) {
+        var li = document.createElement("li");
+        li.textContent = item.text;
+        li.addEventListener("click", function () { add(item); });
+        results.appendChild(li);
+      });
+      if (data.next) {
+        var li = document.createElement("li");
+        li.className = "autocomplete-more muted";
+        li.textContent = "Ver más…";
+        li.addEventListener("click", function () { fetchPage(data.next); });
+        results.appendChild(li);
+      }
+      results.hidden = !results.children.length;
+    }
+
+    input.addEventListener("input", function () {
+      clearTimeout(timer);
+      timer = setTimeout(function () { fetchPage(null); }, 200);
+    });
+    input.addEventListener("focus", function () {
+      if (!results.children.length) fetchPage(null);
+    });
+    document.addEventListener("click", function (e) {
+      if (!root.contains(e.target)) results.hidden = true;
+    });
+    renderChips();
+  }
+
+  document.addEventListener("DOMContentLoaded", function () {
+    Array.prototype.forEach.call(document.querySelectorAll(".autocomplete"), init);
+  });
+})();
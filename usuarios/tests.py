@@ -1,3 +1,37 @@
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from core.testing import QueryBudgetMixin, url_names
+
+
+class QueryBudgetTest(QueryBudgetMixin, TestCase):
+    """Presupuesto de consultas de cada ruta de usuarios/urls.py."""
+    BUDGETS = {
+        "signup": 0,
+        "login": 0,
+        "logout": 0,
+        "password_reset": 1,
+        "password_reset_done": 0,
+        "password_reset_confirm": 0,
+        "password_reset_complete": 0,
+    }
+
+    def test_budgets_cover_every_route(self):
+        from usuarios.urls import urlpatterns
+        self.assertEqual(url_names(urlpatterns), set(self.BUDGETS))
+
+    def test_views_within_budget(self):
+        get_user_model().objects.create_user(username="op", email="op@example.com", password="x")
+        requests = [
+            ("signup", (), {}),
+            ("login", (), {}),
+            ("password_reset", (), {"method": "post", "data": {"email": "op@example.com"}, "status": 302}),
+            ("password_reset_done", (), {}),
+            ("password_reset_confirm", ("x", "y"), {}),
+            ("password_reset_complete", (), {}),
+            ("logout", (), {"method": "post", "status": 302}),
+        ]
+        for name, args, kwargs in requests:
+            with self.subTest(name):
+                self.assertQueryBudget(self.BUDGETS[name], reverse(name, args=args), **kwargs)